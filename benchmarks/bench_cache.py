@@ -0,0 +1,81 @@
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clp_cache import ResultCache, cached_part, wab_key
+from clp_core import calculate_wab, default_settings
+from clp_viz import render_aircraft_png
+
+# Memoized W&B results under concurrent dispatcher use.
+#
+# Each thread plays a dispatcher session: most reruns repeat the previous
+# inputs (a view toggle or unrelated widget), some change one pax count. Every
+# rerun computes W&B and the side-view figure, once through the shared cache
+# and once uncached, and reports per-rerun latency and the cache hit rate.
+#
+# Run: python benchmarks/bench_cache.py
+
+SESSIONS = 6
+RERUNS = 10
+REPEAT_PROBABILITY = 0.8
+
+
+def rerun(settings, flight, cache):
+    tail, pax, bags, fuel = flight
+
+    def compute():
+        return {"result": calculate_wab(tail, pax, bags, fuel, settings), "parts": {}}
+
+    entry = cache.get(wab_key(tail, pax, bags, fuel, settings), compute) if cache is not None else compute()
+    result = entry["result"]
+    return cached_part(entry, "aircraft_side", lambda: render_aircraft_png(
+        settings["zone_arms"], settings["compartment_arms"], settings["fuel_arm"],
+        settings["aircraft_data"][tail]["OEW_ARM"], view="side",
+        cg=result["cg"], cg_min=settings["CG_MIN"], cg_max=settings["CG_MAX"]))
+
+
+def session(settings, cache, seed, latencies):
+    rng = random.Random(seed)
+    pax = {"A": {"adults": 30}, "B": {"adults": 40}, "C": {"adults": 20}}
+    for _ in range(RERUNS):
+        if rng.random() > REPEAT_PROBABILITY:
+            zone = rng.choice("ABC")
+            pax = {z: dict(c) for z, c in pax.items()}
+            pax[zone]["adults"] += rng.choice([-1, 1])
+        start = time.perf_counter()
+        rerun(settings, ("A220-1", pax, {"standard": 80, "heavy": 20}, 15000.0), cache)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def run(settings, cache):
+    latencies = []
+    threads = [threading.Thread(target=session, args=(settings, cache, seed, latencies))
+               for seed in range(SESSIONS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    settings = default_settings()
+    cache = ResultCache()
+    print(f"{SESSIONS} sessions x {RERUNS} reruns")
+    print(f"{'mode':>9} {'total s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, c in (("uncached", None), ("cached", cache)):
+        elapsed, p50, p95 = run(settings, c)
+        print(f"{label:>9} {elapsed:8.2f} {p50:8.2f} {p95:8.2f}")
+    stats = cache.stats()
+    print(f"hit rate {stats['hit_rate']:.0%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+
+if __name__ == "__main__":
+    main()
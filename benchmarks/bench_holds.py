@@ -0,0 +1,63 @@
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clp_core import base_load, default_settings
+from clp_holds import solve_hold_allocation
+
+# Solve time of the multi-compartment hold allocator against piece count.
+#
+# Run: python benchmarks/bench_holds.py
+
+PIECE_COUNTS = [25, 50, 100, 200, 400, 800]
+REPEATS = 5
+
+# Four-compartment layout with a ULD-capable aft hold (mock values)
+COMPARTMENT_ARMS = {"fwd1": 45.0, "fwd2": 55.0, "aft1": 75.0, "aft2": 85.0}
+COMPARTMENT_LIMITS = {
+    "fwd1": {"max_weight": 9000.0, "length": 12.0, "max_running_load": 800.0, "accepts": ["bag", "bulk"]},
+    "fwd2": {"max_weight": 9000.0, "length": 12.0, "max_running_load": 800.0, "accepts": ["bag", "bulk"]},
+    "aft1": {"max_weight": 12000.0, "length": 14.0, "max_running_load": 900.0, "accepts": ["bag", "bulk"],
+             "uld_positions": 4},
+    "aft2": {"max_weight": 8000.0, "length": 10.0, "max_running_load": 800.0, "accepts": ["bag", "bulk"]},
+}
+
+
+def make_pieces(n, rng):
+    pieces = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.02:
+            pieces.append({"weight": rng.uniform(300.0, 900.0), "kind": "uld"})
+        elif roll < 0.15:
+            pieces.append({"weight": rng.uniform(20.0, 150.0), "kind": "bulk"})
+        else:
+            pieces.append({"weight": rng.choice([50.0, 70.0]), "kind": "bag"})
+    return pieces
+
+
+def main():
+    settings = default_settings()
+    settings["compartment_arms"] = COMPARTMENT_ARMS
+    settings["compartment_limits"] = COMPARTMENT_LIMITS
+    pax = {"A": {"adults": 40}, "B": {"adults": 50}, "C": {"adults": 40}}
+    base_weight, base_moment = base_load("A220-1", pax, 15000.0, settings)
+    rng = random.Random(42)
+
+    print(f"{'pieces':>7} {'best ms':>9} {'mean ms':>9} {'cg':>8} {'unplaced':>9}")
+    for n in PIECE_COUNTS:
+        pieces = make_pieces(n, rng)
+        times = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            result = solve_hold_allocation(pieces, base_weight, base_moment, settings)
+            times.append((time.perf_counter() - start) * 1000)
+        print(f"{n:>7} {min(times):>9.2f} {sum(times) / len(times):>9.2f} "
+              f"{result['cg']:>8.3f} {result['unplaced']:>9}")
+
+
+if __name__ == "__main__":
+    main()
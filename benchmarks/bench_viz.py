@@ -0,0 +1,58 @@
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clp_core import default_settings
+from clp_viz import draw_aircraft_visualization, render_aircraft_png
+
+# Aircraft diagram render time and memory over many reruns.
+#
+# Compares a full redraw (draw_aircraft_visualization + savefig) with the
+# cached static layer (render_aircraft_png), then runs thousands of renders
+# at changing CGs and reports peak RSS to show memory stays flat.
+#
+# Run: python benchmarks/bench_viz.py
+
+REPEATS = 30
+SOAK_RENDERS = 2000
+
+
+def timed(render):
+    times = []
+    for i in range(REPEATS):
+        start = time.perf_counter()
+        render(60.0 + i * 0.1)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.95)]
+
+
+def main():
+    s = default_settings()
+    arms = (s["zone_arms"], s["compartment_arms"], s["fuel_arm"], s["aircraft_data"]["A220-1"]["OEW_ARM"])
+    limits = {"cg_min": s["CG_MIN"], "cg_max": s["CG_MAX"]}
+
+    def full(cg, view):
+        fig = draw_aircraft_visualization(*arms, view=view, cg=cg, **limits)
+        fig.savefig(os.devnull, format="png", dpi=100)
+
+    print(f"{'view':>5} {'mode':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for view in ("side", "top"):
+        render_aircraft_png(*arms, view=view, cg=62.0, **limits)  # build the static layer
+        for label, render in (("full", lambda cg: full(cg, view)),
+                              ("cached", lambda cg: render_aircraft_png(*arms, view=view, cg=cg, **limits))):
+            p50, p95 = timed(render)
+            print(f"{view:>5} {label:>7} {p50:8.1f} {p95:8.1f}")
+
+    print(f"\n{'renders':>8} {'max RSS MB':>11}")
+    for i in range(1, SOAK_RENDERS + 1):
+        render_aircraft_png(*arms, view="side" if i % 2 else "top", cg=60.0 + (i % 100) * 0.05, **limits)
+        if i % (SOAK_RENDERS // 4) == 0:
+            print(f"{i:8d} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
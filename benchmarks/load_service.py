@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clp_core import default_settings
+
+# Load generator for the W&B service (clp_service.py).
+#
+# Opens N keep-alive connections and has each send requests back to back for
+# the given duration: single-flight POST /wab by default, or POST /wab/bulk
+# with --bulk flights per request. Reports throughput and client-side latency
+# percentiles, then the service's own /stats (batch sizes, rejections).
+# Exits non-zero if the client p99 misses --p99-target-ms.
+#
+# Without --url a service is started on a free local port for the run.
+#
+# Run: python benchmarks/load_service.py --connections 64 --seconds 10
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_flight(rng, tails):
+    return {
+        "tail": rng.choice(tails),
+        "pax_zones": {zone: {"adults": rng.randint(10, 40), "children": rng.randint(0, 4),
+                             "infants": rng.randint(0, 2)} for zone in "ABC"},
+        "bags": {"standard": rng.randint(40, 110), "heavy": rng.randint(0, 30)},
+        "fuel": float(rng.randrange(8000, 22000, 100)),
+    }
+
+
+async def request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode() + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(host, port, path, make_payload, deadline, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, "POST", path, make_payload())
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            elif status == 503:
+                await asyncio.sleep(0.01)
+    finally:
+        writer.close()
+
+
+async def run(host, port, connections, seconds, bulk, seed):
+    rng = random.Random(seed)
+    tails = list(default_settings()["aircraft_data"])
+    if bulk:
+        path = "/wab/bulk"
+        make_payload = lambda: {"flights": [random_flight(rng, tails) for _ in range(bulk)]}
+    else:
+        path = "/wab"
+        make_payload = lambda: random_flight(rng, tails)
+
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, path, make_payload, start + seconds, latencies, statuses)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await request(reader, writer, host, "GET", "/stats")
+    writer.close()
+    return elapsed, sorted(latencies), statuses, stats
+
+
+def wait_for_port(host, port, process, timeout=30):
+    async def probe():
+        _, writer = await asyncio.open_connection(host, port)
+        writer.close()
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            sys.exit("service exited during startup")
+        try:
+            asyncio.run(probe())
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit("service did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="W&B service load generator")
+    parser.add_argument("--url", help="existing service (default: start one locally)")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--bulk", type=int, default=0, help="flights per /wab/bulk request (0: single /wab)")
+    parser.add_argument("--p99-target-ms", type=float, default=25.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args, service_args = parser.parse_known_args()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = "127.0.0.1", 18633
+        process = subprocess.Popen([sys.executable, os.path.join(ROOT, "clp_service.py"), "--host", host,
+                                    "--port", str(port), "--p99-target-ms", str(args.p99_target_ms),
+                                    *service_args])
+        wait_for_port(host, port, process)
+
+    try:
+        elapsed, latencies, statuses, stats = asyncio.run(
+            run(host, port, args.connections, args.seconds, args.bulk, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    flights = len(latencies) * (args.bulk or 1)
+    p50 = latencies[len(latencies) // 2] if latencies else float("nan")
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else float("nan")
+    print(f"{args.connections} connections, {args.seconds:.0f} s, {'bulk x' + str(args.bulk) if args.bulk else 'single'}")
+    print(f"{len(latencies) / elapsed:,.0f} req/s ({flights / elapsed:,.0f} flights/s), statuses {statuses}")
+    print(f"client latency p50 {p50:.2f} ms, p99 {p99:.2f} ms (target {args.p99_target_ms:.0f} ms)")
+    batches = stats["batches"]
+    print(f"service: {batches['mean_flights'] or 0:.1f} flights/batch (max {batches['max_flights']}), "
+          f"{stats['rejected']} rejected")
+    if not latencies or p99 > args.p99_target_ms:
+        sys.exit("FAIL: p99 above target")
+
+
+if __name__ == "__main__":
+    main()
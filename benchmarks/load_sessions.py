@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from streamlit.testing.v1 import AppTest
+
+from clp_cache import cached_wab
+from clp_config import fleet_config
+
+# Load test: many dispatcher sessions against one app process.
+#
+# Part 1 keeps N Streamlit sessions (AppTest instances of clp.py) open in
+# this process, so they share the module-level fleet config and result cache
+# exactly as browser sessions on one server do. Their reruns (pax edits, view
+# toggles) are interleaved round-robin - AppTest itself can only run one
+# script at a time per process. Halfway through, session 0 changes the adult
+# weight in the Settings tab and every session must show the new config
+# version on its next rerun. Resident memory is sampled as sessions open and
+# after all reruns.
+#
+# Part 2 runs the sessions' read path (fleet_config.current() + cached_wab)
+# from N threads truly concurrently while a writer publishes new versions,
+# and checks that no reader ever sees a half-applied publish.
+#
+# Run: python benchmarks/load_sessions.py --sessions 60 --reruns 4
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "clp.py")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def new_session():
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    return at
+
+
+def number_input(at, label):
+    return next(n for n in at.number_input if n.label == label)
+
+
+def rerun(at, i):
+    number_input(at, "Zone A Adults").set_value(30 + i % 5)
+    at.radio[0].set_value("Top View" if i % 2 else "Side View")
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def config_version(at):
+    caption = next(c.value for c in at.caption if c.value.startswith("Shared fleet configuration"))
+    return int(caption.split("version ")[1].split(".")[0])
+
+
+def sessions_test(n_sessions, reruns):
+    base = rss_mb()
+    new_session()  # warm imports and caches before measuring
+    warm = rss_mb()
+    print(f"baseline {base:.0f} MB, after first session {warm:.0f} MB")
+
+    sessions = []
+    for _ in range(n_sessions):
+        sessions.append(new_session())
+        if len(sessions) % max(1, n_sessions // 4) == 0:
+            print(f"{len(sessions):4d} sessions open  rss {rss_mb():6.0f} MB")
+    opened = rss_mb()
+
+    latencies = []
+    for i in range(reruns):
+        if i == reruns // 2:
+            # One dispatcher edits a setting; everyone else must see it
+            adult = number_input(sessions[0], "Adult Weight (lbs)")
+            adult.set_value(adult.value + 5).run()
+            print(f"session 0 published config version {fleet_config.current().version}")
+        latencies.extend(rerun(at, i) for at in sessions)
+    after = rss_mb()
+
+    latencies.sort()
+    versions = {config_version(at) for at in sessions}
+    print(f"{n_sessions} sessions x {reruns} reruns: rerun p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms")
+    print(f"rss {(opened - warm) / n_sessions:.2f} MB/session opened, {after - opened:+.0f} MB over all reruns")
+    print(f"config versions shown by sessions: {sorted(versions)} (current {fleet_config.current().version})")
+    return versions == {fleet_config.current().version}
+
+
+def concurrency_test(n_threads, publishes=200):
+    # Each publish moves adult and child weight together, so a reader that
+    # ever sees them out of step has observed a torn update
+    stop = threading.Event()
+    reads = [0] * n_threads
+    torn = []
+    pax = {"A": {"adults": 30}, "B": {"adults": 40}, "C": {"adults": 20}}
+    bags = {"standard": 80, "heavy": 20}
+
+    def reader(k):
+        while not stop.is_set():
+            snapshot = fleet_config.current()
+            s = snapshot.settings
+            if s["PAX_WEIGHT_ADULT"] - s["PAX_WEIGHT_CHILD"] != gap:
+                torn.append(snapshot.version)
+            cached_wab("A220-1", pax, bags, 15000.0 + k, s, version=snapshot.key)
+            reads[k] += 1
+
+    start_settings = fleet_config.current().settings
+    gap = start_settings["PAX_WEIGHT_ADULT"] - start_settings["PAX_WEIGHT_CHILD"]
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for i in range(publishes):
+        weight = start_settings["PAX_WEIGHT_CHILD"] + (i % 10)
+        fleet_config.publish({"PAX_WEIGHT_CHILD": weight, "PAX_WEIGHT_ADULT": weight + gap})
+        time.sleep(0.001)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"{n_threads} reader threads, {publishes} publishes: {sum(reads) / elapsed:,.0f} reads/s, "
+          f"{len(torn)} torn reads")
+    return not torn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent dispatcher session load test")
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--reruns", type=int, default=4)
+    args = parser.parse_args()
+
+    ok = sessions_test(args.sessions, args.reruns)
+    ok = concurrency_test(args.sessions) and ok
+    if not ok:
+        sys.exit("FAIL")
+
+
+if __name__ == "__main__":
+    main()
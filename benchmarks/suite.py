@@ -0,0 +1,340 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from clp_batch import calculate_wab_batch, optimize_bag_load_batch, synthetic_columns
+from clp_core import base_load, calculate_wab, default_settings, lookup_stab, optimize_bag_load
+from clp_perf import takeoff_performance_batch
+from clp_sweep import sweep
+from clp_tables import stab_trim_batch, tables_for
+from clp_viz import draw_aircraft_visualization, render_aircraft_png
+
+# Benchmark suite for the W&B hot path and the UI rerun cost.
+#
+# Every case runs on a seeded synthetic fleet and day of flights, so runs are
+# reproducible. On that day nearly every flight is already aft of the target
+# CG, so the bag cases also run on a forward-loaded copy of the fleet where
+# most flights need bags moved aft, exercising the optimizer's move search
+# (and, in the sweep case, per-flight bag weights).
+#
+# A case reports the median and minimum time per call (ms) over several repeats; cases that finish quickly keep repeating until MIN_MEASURE_S
+# has been spent. Results are written as JSON and compared with a stored
+# baseline (benchmarks/baseline.json): cases under SHORT_CASE_MS on their
+# minimum, since their medians mostly measure scheduler noise, and the rest on
+# their median. A case that is slower than its baseline by more than
+# --tolerance (a fraction, 0.5 = 50%) and by more than MIN_REGRESSION_MS fails
+# the run with a non-zero exit status.
+#
+# The baseline is per machine: after a deliberate change, or on new hardware,
+# rerun with --update-baseline and commit the new file.
+#
+# Run: python benchmarks/suite.py [--only batch] [--output results.json]
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "clp.py")
+
+FLEET_TAILS = 50
+BATCH_SIZES = (1_000, 100_000, 1_000_000)
+SCALAR_FLIGHTS = 200
+SWEEP_FLIGHTS = 200
+FORWARD_ARM_SHIFT = -5.8  # ft added to every OEW arm for the forward-loaded fleet
+MIN_MOVING = 0.5  # share of forward-fleet flights that must move bags aft
+MIN_REGRESSION_MS = 0.01
+SHORT_CASE_MS = 1.0  # cases faster than this are compared on min_ms
+MIN_MEASURE_S = 0.5  # quick cases repeat until this much time is spent...
+MAX_REPEATS = 200    # ...or this many repeats
+
+
+# Synthetic fleet generators
+
+
+def synthetic_fleet(settings, n_tails, seed=0):
+    # Settings with n_tails tails cloned from the configured ones, OEW and
+    # OEW arm perturbed a little so per-tail constants differ
+    rng = np.random.default_rng(seed)
+    s = copy.deepcopy(settings)
+    templates = list(s["aircraft_data"].values())
+    fleet = {}
+    for i in range(n_tails):
+        data = dict(templates[i % len(templates)])
+        data["OEW"] = round(data["OEW"] * rng.uniform(0.98, 1.02))
+        data["OEW_ARM"] = round(data["OEW_ARM"] + rng.uniform(-0.2, 0.2), 2)
+        fleet[f"SYN-{i:03d}"] = data
+    s["aircraft_data"] = fleet
+    return s
+
+
+def forward_fleet(settings):
+    # The fleet with every OEW arm moved forward by FORWARD_ARM_SHIFT
+    s = copy.deepcopy(settings)
+    for data in s["aircraft_data"].values():
+        data["OEW_ARM"] = round(data["OEW_ARM"] + FORWARD_ARM_SHIFT, 2)
+    return s
+
+
+def _check_moving(s, columns):
+    # A move-path case is only meaningful if most flights do move bags
+    moving = float((calculate_wab_batch(s, **columns)["bag_move"] > 0).mean())
+    if moving < MIN_MOVING:
+        raise RuntimeError(f"forward fleet: only {moving:.0%} of flights move bags aft")
+
+
+def synthetic_flights(n, settings, seed=0):
+    # Same flights as synthetic_columns, as calculate_wab arguments
+    columns = synthetic_columns(n, settings, seed)
+    tails = list(settings["aircraft_data"])
+    zones = list(settings["zone_arms"])
+    flights = []
+    for i in range(n):
+        pax_zones = {zone: {"adults": int(columns["adults"][i, j]),
+                            "children": int(columns["children"][i, j]),
+                            "infants": int(columns["infants"][i, j])}
+                     for j, zone in enumerate(zones)}
+        bags = {"standard": int(columns["standard_bags"][i]), "heavy": int(columns["heavy_bags"][i])}
+        flights.append((tails[columns["tail_idx"][i]], pax_zones, bags, float(columns["fuel"][i])))
+    return flights
+
+
+# Cases: name -> (callable, calls it makes per repeat, repeats)
+
+
+def bag_loads(flights, s):
+    # (bags, moment, weight) with every bag forward, as optimize_bag_load takes them
+    loads = []
+    for tail, pax_zones, bags, fuel in flights:
+        weight, moment = base_load(tail, pax_zones, fuel, s)
+        bag_weight = bags["standard"] * s["bag_weights"]["standard"] + bags["heavy"] * s["bag_weights"]["heavy"]
+        loads.append((bags, moment + bag_weight * s["compartment_arms"]["fwd"], weight + bag_weight))
+    return loads
+
+
+def scalar_cases(s):
+    flights = synthetic_flights(SCALAR_FLIGHTS, s)
+    loads = bag_loads(flights, s)
+    forward = forward_fleet(s)
+    _check_moving(forward, synthetic_columns(SCALAR_FLIGHTS, forward))
+    forward_loads = bag_loads(synthetic_flights(SCALAR_FLIGHTS, forward), forward)
+    cgs = [(60.0 + 4.0 * i / SCALAR_FLIGHTS, weight) for i, (_, _, weight) in enumerate(loads)]
+
+    def wab():
+        for flight in flights:
+            calculate_wab(*flight, s)
+
+    def bags():
+        for bags, moment, weight in loads:
+            optimize_bag_load(bags, moment, weight, s)
+
+    def bags_moving():
+        for bags, moment, weight in forward_loads:
+            optimize_bag_load(bags, moment, weight, forward)
+
+    def stab():
+        for cg, weight in cgs:
+            lookup_stab(s, cg, weight)
+
+    # Timed per flight: one repeat covers SCALAR_FLIGHTS flights
+    return {
+        "scalar.calculate_wab": (wab, SCALAR_FLIGHTS, 5),
+        "scalar.optimize_bag_load": (bags, SCALAR_FLIGHTS, 5),
+        "scalar.optimize_bag_load_moves": (bags_moving, SCALAR_FLIGHTS, 5),
+        "scalar.lookup_stab": (stab, SCALAR_FLIGHTS, 5),
+    }
+
+
+def batch_cases(s, sizes):
+    cases = {}
+    for n in sizes:
+        columns = synthetic_columns(n, s, seed=n)
+        cases[f"batch.calculate_wab_{n}"] = (lambda c=columns: calculate_wab_batch(s, **c), 1, 3 if n >= 1_000_000 else 5)
+
+    n = 100_000
+    columns = synthetic_columns(n, s, seed=1)
+    plan = calculate_wab_batch(s, **columns)
+    moment = plan["initial_cg"] * plan["total_weight"]
+    cases[f"batch.optimize_bag_load_{n}"] = (
+        lambda: optimize_bag_load_batch(columns["standard_bags"], columns["heavy_bags"], moment, plan["total_weight"], s),
+        1, 5)
+
+    forward = forward_fleet(s)
+    forward_columns = synthetic_columns(n, forward, seed=1)
+    _check_moving(forward, forward_columns)
+    forward_plan = calculate_wab_batch(forward, **forward_columns)
+    forward_moment = forward_plan["initial_cg"] * forward_plan["total_weight"]
+    cases[f"batch.optimize_bag_load_moves_{n}"] = (
+        lambda: optimize_bag_load_batch(forward_columns["standard_bags"], forward_columns["heavy_bags"],
+                                        forward_moment, forward_plan["total_weight"], forward),
+        1, 5)
+
+    n = 1_000_000
+    rng = np.random.default_rng(2)
+    cg = rng.uniform(60.0, 64.0, n)
+    weight = rng.uniform(100_000.0, 150_000.0, n)
+    tables = tables_for(s)
+    cases[f"batch.stab_trim_{n}"] = (lambda: stab_trim_batch(tables, cg, weight), 1, 5)
+
+    runway = rng.uniform(4000.0, 12000.0, n)
+    oat = rng.uniform(-20.0, 45.0, n)
+    altitude = rng.uniform(0.0, 8000.0, n)
+    cases[f"batch.takeoff_performance_{n}"] = (
+        lambda: takeoff_performance_batch(s, weight, cg, runway, oat, altitude), 1, 5)
+    return cases
+
+
+def sweep_cases(s):
+    # Bag weights swept over the forward-loaded fleet: per-flight bag weights
+    # through the optimizer's compaction
+    forward = forward_fleet(s)
+    columns = synthetic_columns(SWEEP_FLIGHTS, forward, seed=5)
+    _check_moving(forward, columns)
+    axes = {"bag_weights.heavy": np.linspace(60.0, 85.0, 20), "bag_weights.standard": np.linspace(40.0, 60.0, 20)}
+    evaluations = SWEEP_FLIGHTS * 20 * 20
+    return {f"sweep.bag_weights_{evaluations}": (lambda: sweep(forward, columns, axes), 1, 5)}
+
+
+def viz_cases(s):
+    arms = (s["zone_arms"], s["compartment_arms"], s["fuel_arm"], next(iter(s["aircraft_data"].values()))["OEW_ARM"])
+    limits = {"cg_min": s["CG_MIN"], "cg_max": s["CG_MAX"]}
+
+    def full():
+        import matplotlib.pyplot as plt
+        fig = draw_aircraft_visualization(*arms, view="side", cg=62.0, **limits)
+        fig.savefig(os.devnull, format="png", dpi=100)
+        plt.close(fig)
+
+    render_aircraft_png(*arms, view="side", cg=62.0, **limits)  # build the static layer
+    cg = iter(np.tile(np.linspace(60.0, 64.0, 50), 1000))
+    return {
+        "viz.draw_aircraft_visualization": (full, 1, 10),
+        "viz.render_aircraft_png": (lambda: render_aircraft_png(*arms, view="side", cg=next(cg), **limits), 1, 20),
+    }
+
+
+def app_cases():
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    adults = next(n for n in at.number_input if n.label == "Zone A Adults")
+    state = {"i": 0}
+
+    def rerun():
+        # An input edit, so the rerun recomputes rather than hitting the cache
+        state["i"] += 1
+        adults.set_value(30 + state["i"] % 7)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    return {"app.rerun": (rerun, 1, 7)}
+
+
+def measure(fn, calls, repeats):
+    fn()  # warm-up
+    times = []
+    started = time.perf_counter()
+    while len(times) < repeats or (time.perf_counter() - started < MIN_MEASURE_S and len(times) < MAX_REPEATS):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000 / calls)
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "repeats": len(times)}
+
+
+def compare(results, baseline, tolerance):
+    # Regressed case names, printing one line per case
+    regressions = []
+    print(f"\n{'case':<36} {'ms':>11} {'baseline':>11} {'change':>8}")
+    for name, result in results.items():
+        stored = baseline.get(name)
+        if stored is None:
+            print(f"{name:<36} {result['median_ms']:11.4f} {'-':>11} {'new':>8}")
+            continue
+        key = "min_ms" if stored["median_ms"] < SHORT_CASE_MS else "median_ms"
+        value, base = result[key], stored[key]
+        change = value / base - 1.0
+        flag = ""
+        if change > tolerance and value - base > MIN_REGRESSION_MS:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<36} {value:11.4f} {base:11.4f} {change:+8.0%}{flag}{'  (min)' if key == 'min_ms' else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="W&B benchmark suite")
+    parser.add_argument("--only", action="append", default=[],
+                        help="run only cases starting with this prefix (repeatable), e.g. batch, viz.render")
+    parser.add_argument("--quick", action="store_true", help="skip the 1M-flight W&B batch and the app rerun")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these results as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline as a fraction (default 0.5)")
+    args = parser.parse_args()
+
+    s = synthetic_fleet(default_settings(), FLEET_TAILS)
+    sizes = BATCH_SIZES[:-1] if args.quick else BATCH_SIZES
+
+    def wanted(name):
+        return not args.only or any(name.startswith(prefix) for prefix in args.only)
+
+    groups = [("scalar", lambda: scalar_cases(s)),
+              ("batch", lambda: batch_cases(s, sizes)),
+              ("sweep", lambda: sweep_cases(s)),
+              ("viz", lambda: viz_cases(s))]
+    if not args.quick:
+        groups.append(("app", app_cases))
+
+    results = {}
+    for group, build in groups:
+        if args.only and not any(group.startswith(p) or p.startswith(group) for p in args.only):
+            continue
+        for name, (fn, calls, repeats) in build().items():
+            if wanted(name):
+                results[name] = measure(fn, calls, repeats)
+                print(f"{name:<36} {results[name]['median_ms']:11.4f} ms")
+
+    report = {
+        "machine": {"python": platform.python_version(), "numpy": np.__version__,
+                    "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                stored = json.load(f)["results"]
+        report["results"] = {**stored, **results}
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} case(s) regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nOK: no regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,452 +1,40 @@
+import math
+import time
+
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 
-# Initialize session state for settings if not already done
-if 'settings' not in st.session_state:
-    st.session_state.settings = {
-        # A220 Data from real flight plan weight headers
-        "aircraft_data": {
-            "A220-1": {
-                "OEW": 87202.0,  # Dry Operating Weight
-                "OEW_ARM": 64.8,  # Using mock arm since real arm unknown
-                "ZFW_LIMIT": 123000.0,  # Zero Fuel Weight Structural Limit
-                "MTOW_LIMIT": 149000.0,  # Takeoff Weight Structural Limit
-                "LANDING_LIMIT": 129500.0,  # Landing Weight Structural Limit
-                "TAKEOFF_WEIGHT": 122484.0,  # From example - for reference
-                "LOAD": 20582.0  # Payload weight from header
-            },
-            "A220-2": {
-                "OEW": 87517.0,  # Dry Operating Weight
-                "OEW_ARM": 64.9,  # Using mock arm since real arm unknown
-                "ZFW_LIMIT": 123000.0,  # Zero Fuel Weight Structural Limit
-                "MTOW_LIMIT": 149000.0,  # Takeoff Weight Structural Limit 
-                "LANDING_LIMIT": 129500.0,  # Landing Weight Structural Limit
-                "TAKEOFF_WEIGHT": 139112.0,  # From example - for reference
-                "LOAD": 24395.0  # Payload weight from header
-            }
-        },
-        "zone_arms": {"A": 60.0, "B": 70.0, "C": 80.0},
-        "bag_weights": {"standard": 50.0, "heavy": 70.0},
-        "compartment_arms": {"fwd": 50.0, "aft": 80.0},
-        "MTOW": 149000.0,
-        "CG_MIN": 61.0, 
-        "CG_MAX": 63.0,
-        "stab_table": {61: 2.0, 62: 0.0, 63: -2.0},
-        "fuel_arm": 70.0,
-        "target_cg": 62.5,
-        
-        # Passenger weights
-        "PAX_WEIGHT_ADULT": 200.0,    # lbs
-        "PAX_WEIGHT_CHILD": 80.0,     # lbs
-        "PAX_WEIGHT_INFANT": 22.0     # lbs
-    }
+from clp_cache import cached_part, cached_wab, figure_png, wab_cache
+from clp_config import fleet_config
+from clp_core import default_fuel, landing_fuel_burn, lookup_stab
+from clp_loadsheet import row_from_result, template_for
+from clp_metrics import metrics, serve_metrics
+from clp_perf import performance_for
+from clp_registry import tail_record
+from clp_tables import envelope_limits, tables_for
+from clp_viz import render_aircraft_png
 
-# Access settings from session state
-s = st.session_state.settings
+# Per-stage timings (see clp_metrics); a profile of this rerun if one was
+# requested from the Diagnostics tab. A rerun interrupted before the end()
+# at the bottom leaves its capture running; begin() discards it next time
+rerun_start = time.perf_counter()
+profiling = metrics.profiler.begin()
+serve_metrics()
 
-# W&B and Optimization Logic
-def calculate_wab(tail, pax_zones, bags, fuel):
-    # Initialize values to store calculation steps for display
-    calculation_steps = {}
-    
-    # Aircraft base weights
-    weights = [s["aircraft_data"][tail]["OEW"], fuel]
-    arms = [s["aircraft_data"][tail]["OEW_ARM"], s["fuel_arm"]]
-    
-    # Calculate passenger weights by zone
-    pax_weights_by_zone = {}
-    for zone, counts in pax_zones.items():
-        adults = counts.get("adults", 0)
-        children = counts.get("children", 0)
-        infants = counts.get("infants", 0)
-        
-        # Store steps for display
-        pax_weights_by_zone[zone] = {
-            "adults": adults * s["PAX_WEIGHT_ADULT"],
-            "children": children * s["PAX_WEIGHT_CHILD"],
-            "infants": infants * s["PAX_WEIGHT_INFANT"]
-        }
-        
-        pax_weight = pax_weights_by_zone[zone]["adults"] + pax_weights_by_zone[zone]["children"] + pax_weights_by_zone[zone]["infants"]
-        weights.append(pax_weight)
-        arms.append(s["zone_arms"][zone])
-    
-    # Calculate bag weights
-    std_bag_weight = bags["standard"] * s["bag_weights"]["standard"]
-    heavy_bag_weight = bags["heavy"] * s["bag_weights"]["heavy"]
-    bag_weight = std_bag_weight + heavy_bag_weight
-    
-    # Calculate ZFW
-    zfw = sum(weights[:-1]) + bag_weight
-    
-    # Initial bag distribution (all forward)
-    distrib = {"fwd": bag_weight, "aft": 0}
-    weights.extend([distrib["fwd"], distrib["aft"]])
-    arms.extend([s["compartment_arms"]["fwd"], s["compartment_arms"]["aft"]])
-    
-    # Calculate total weight and initial CG
-    total_weight = sum(weights)
-    
-    # Calculate moments and store for display
-    moments = [w * a for w, a in zip(weights, arms)]
-    total_moment = sum(moments)
-    
-    # Calculate initial CG
-    initial_cg = total_moment / total_weight
-    
-    # CG optimization
-    cg = initial_cg
-    move = 0
-    if cg < s["target_cg"]:  # Optimize for target CG (fuel savings)
-        fwd_arm = s["compartment_arms"]["fwd"]
-        aft_arm = s["compartment_arms"]["aft"]
-        move = min(bag_weight, ((s["target_cg"] - cg) * total_weight) / (aft_arm - fwd_arm))
-        distrib["fwd"] -= move
-        distrib["aft"] += move
-        weights[-2:] = [distrib["fwd"], distrib["aft"]]
-        total_weight = sum(weights)
-        moments = [w * a for w, a in zip(weights, arms)]
-        total_moment = sum(moments)
-        cg = total_moment / total_weight
-    
-    # Lookup stab trim
-    stab = s["stab_table"].get(int(cg), 0)
-    
-    # Initialize additional checks
-    mtow_limit = s["MTOW"]
-    zfw_limit = None
-    landing_limit = None
-    
-    # If using real data aircraft, use its specific limits
-    if tail in s["aircraft_data"] and "ZFW_LIMIT" in s["aircraft_data"][tail]:
-        mtow_limit = s["aircraft_data"][tail]["MTOW_LIMIT"]
-        zfw_limit = s["aircraft_data"][tail]["ZFW_LIMIT"]
-        landing_limit = s["aircraft_data"][tail]["LANDING_LIMIT"]
-    
-    # Check if ZFW and Landing Weight are within limits for real data
-    zfw_ok = True
-    if zfw_limit and zfw > zfw_limit:
-        zfw_ok = False
-    
-    # Estimate landing weight as total weight minus 75% of fuel
-    landing_weight = total_weight - (fuel * 0.75)
-    landing_ok = True
-    if landing_limit and landing_weight > landing_limit:
-        landing_ok = False
-    
-    # Store calculation steps for display
-    calculation_steps = {
-        "pax_weights": pax_weights_by_zone,
-        "std_bag_weight": std_bag_weight,
-        "heavy_bag_weight": heavy_bag_weight,
-        "oew": s["aircraft_data"][tail]["OEW"],
-        "fuel": fuel,
-        "initial_cg": initial_cg,
-        "bag_move": move,
-        "moments": moments,
-        "total_moment": total_moment
-    }
-    
-    return {
-        "zfw": zfw, 
-        "total_weight": total_weight, 
-        "cg": cg, 
-        "stab": stab,
-        "distrib": distrib,
-        "landing_weight": landing_weight if landing_limit else None,
-        "safe": (total_weight <= mtow_limit and 
-                s["CG_MIN"] <= cg <= s["CG_MAX"] and 
-                zfw_ok and landing_ok),
-        "steps": calculation_steps  # Add calculation steps to result
-    }
-
-def draw_aircraft_visualization(zone_arms, compartment_arms, fuel_arm, oew_arm, view='side', cg=None, cg_min=None, cg_max=None):
-    # Create figure with a better aspect ratio
-    fig, ax = plt.subplots(figsize=(12, 5))
-    
-    # Set the datum point (at the nose)
-    datum_x = 0
-    
-    # Define a more stylized aircraft shape
-    if view == 'side':
-        # Simplified but recognizable side profile
-        fuselage_length = 100  # Use a standardized length for better visibility
-        
-        # Define points for a more stylized aircraft
-        nose_x = datum_x
-        nose_y = 0
-        
-        fuselage_bottom = [
-            (nose_x, nose_y),
-            (nose_x + 10, nose_y - 2),
-            (nose_x + 20, nose_y - 3),
-            (nose_x + fuselage_length - 20, nose_y - 3),
-            (nose_x + fuselage_length - 10, nose_y - 1),
-            (nose_x + fuselage_length, nose_y)
-        ]
-        
-        fuselage_top = [
-            (nose_x, nose_y),
-            (nose_x + 10, nose_y + 5),
-            (nose_x + 20, nose_y + 8),
-            (nose_x + fuselage_length - 50, nose_y + 8),
-            (nose_x + fuselage_length - 40, nose_y + 12),  # Tail height
-            (nose_x + fuselage_length - 25, nose_y + 12),  # Tail top
-            (nose_x + fuselage_length - 10, nose_y + 3),
-            (nose_x + fuselage_length, nose_y)
-        ]
-        
-        # Draw the fuselage as a polygon
-        fuselage_x_bottom, fuselage_y_bottom = zip(*fuselage_bottom)
-        fuselage_x_top, fuselage_y_top = zip(*fuselage_top)
-        
-        # Complete the fuselage polygon
-        fuselage_x = list(fuselage_x_top) + list(fuselage_x_bottom[::-1])
-        fuselage_y = list(fuselage_y_top) + list(fuselage_y_bottom[::-1])
-        
-        # Draw the main fuselage
-        ax.fill(fuselage_x, fuselage_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Draw the wing
-        wing_front = nose_x + 35
-        wing_length = 25
-        wing_height = -2
-        wing_thickness = 2
-        
-        wing_x = [wing_front, wing_front + wing_length, wing_front + wing_length, wing_front]
-        wing_y = [wing_height, wing_height - 1, wing_height + wing_thickness, wing_height + wing_thickness]
-        ax.fill(wing_x, wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Set axis limits for side view
-        ax.set_ylim(-10, 20)
-        
-    else:  # top view
-        # Simplified but recognizable top view
-        fuselage_length = 100  # Use a standardized length
-        
-        # Define key points
-        nose_x = datum_x
-        center_y = 0
-        
-        # Create fuselage shape - smoother curves for the top view
-        fuselage_width = 8
-        
-        # Create a stylized top view with curved fuselage and wings
-        fuselage_outline = []
-        
-        # Top half
-        fuselage_outline.append((nose_x, center_y))  # Nose tip
-        fuselage_outline.append((nose_x + 10, center_y + 2))  # Nose curve
-        fuselage_outline.append((nose_x + 20, center_y + 3.5))  # Forward fuselage
-        fuselage_outline.append((nose_x + 40, center_y + fuselage_width/2))  # Mid fuselage
-        fuselage_outline.append((nose_x + fuselage_length - 30, center_y + fuselage_width/2))  # Aft fuselage
-        fuselage_outline.append((nose_x + fuselage_length - 20, center_y + 3))  # Tail taper
-        fuselage_outline.append((nose_x + fuselage_length - 10, center_y + 1.5))  # Tail taper
-        fuselage_outline.append((nose_x + fuselage_length, center_y))  # Tail tip
-        
-        # Bottom half (mirror of top)
-        fuselage_outline.append((nose_x + fuselage_length - 10, center_y - 1.5))
-        fuselage_outline.append((nose_x + fuselage_length - 20, center_y - 3))
-        fuselage_outline.append((nose_x + fuselage_length - 30, center_y - fuselage_width/2))
-        fuselage_outline.append((nose_x + 40, center_y - fuselage_width/2))
-        fuselage_outline.append((nose_x + 20, center_y - 3.5))
-        fuselage_outline.append((nose_x + 10, center_y - 2))
-        fuselage_outline.append((nose_x, center_y))  # Back to nose tip
-        
-        fuselage_x, fuselage_y = zip(*fuselage_outline)
-        ax.fill(fuselage_x, fuselage_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Draw the wings
-        wing_root_x = nose_x + 40
-        wing_span = 45
-        wing_chord_root = 15
-        wing_chord_tip = 10
-        wing_sweep = 15  # Wing sweep angle for a more realistic shape
-        
-        # Left wing
-        left_wing = [
-            (wing_root_x, center_y - fuselage_width/2),
-            (wing_root_x + wing_sweep, center_y - wing_span),
-            (wing_root_x + wing_sweep + wing_chord_tip, center_y - wing_span),
-            (wing_root_x + wing_chord_root, center_y - fuselage_width/2)
-        ]
-        left_wing_x, left_wing_y = zip(*left_wing)
-        ax.fill(left_wing_x, left_wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Right wing
-        right_wing = [
-            (wing_root_x, center_y + fuselage_width/2),
-            (wing_root_x + wing_sweep, center_y + wing_span),
-            (wing_root_x + wing_sweep + wing_chord_tip, center_y + wing_span),
-            (wing_root_x + wing_chord_root, center_y + fuselage_width/2)
-        ]
-        right_wing_x, right_wing_y = zip(*right_wing)
-        ax.fill(right_wing_x, right_wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Horizontal stabilizer
-        h_stab_root_x = nose_x + fuselage_length - 25
-        h_stab_span = 20
-        h_stab_chord_root = 8
-        h_stab_chord_tip = 5
-        h_stab_sweep = 10
-        
-        # Left horizontal stabilizer
-        left_h_stab = [
-            (h_stab_root_x, center_y - fuselage_width/4),
-            (h_stab_root_x + h_stab_sweep, center_y - h_stab_span),
-            (h_stab_root_x + h_stab_sweep + h_stab_chord_tip, center_y - h_stab_span),
-            (h_stab_root_x + h_stab_chord_root, center_y - fuselage_width/4)
-        ]
-        left_h_stab_x, left_h_stab_y = zip(*left_h_stab)
-        ax.fill(left_h_stab_x, left_h_stab_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Right horizontal stabilizer
-        right_h_stab = [
-            (h_stab_root_x, center_y + fuselage_width/4),
-            (h_stab_root_x + h_stab_sweep, center_y + h_stab_span),
-            (h_stab_root_x + h_stab_sweep + h_stab_chord_tip, center_y + h_stab_span),
-            (h_stab_root_x + h_stab_chord_root, center_y + fuselage_width/4)
-        ]
-        right_h_stab_x, right_h_stab_y = zip(*right_h_stab)
-        ax.fill(right_h_stab_x, right_h_stab_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
-        
-        # Set axis limits for top view - wider to show the wings
-        ax.set_ylim(-wing_span - 5, wing_span + 5)
-    
-    # Mark datum point
-    datum_y = 0 if view == 'top' else 0
-    ax.plot(datum_x, datum_y, 'ro', markersize=8, label='Datum Point')
-    ax.text(datum_x, datum_y - 3, 'Datum', ha='center', va='top', fontweight='bold')
-    
-    # Set the x-axis range - use a standardized length with some padding
-    ax.set_xlim(-10, fuselage_length + 10)
-    
-    # Create reference scale for measurement
-    scale_positions = range(0, int(fuselage_length) + 20, 20)
-    ax.set_xticks(scale_positions)
-    ax.grid(True, linestyle='--', alpha=0.3)
-    
-    # Mark and label arm positions
-    arms = {
-        'OEW': oew_arm,
-        'Fuel': fuel_arm,
-        'Zone A': zone_arms['A'],
-        'Zone B': zone_arms['B'],
-        'Zone C': zone_arms['C'],
-        'Fwd Cargo': compartment_arms['fwd'],
-        'Aft Cargo': compartment_arms['aft']
-    }
-    
-    # Colors for different zones - use a more distinct color palette
-    colors = ['red', 'blue', 'green', 'purple', 'orange', 'brown', 'magenta']
-    
-    # Calculate adjusted arm positions - map actual arms to our standardized fuselage length
-    # This keeps all the important points visible while making the diagram more readable
-    max_real_arm = max(arms.values())
-    if max_real_arm > 0:
-        arm_scale_factor = (fuselage_length * 0.9) / max_real_arm
-    else:
-        arm_scale_factor = 1
-    
-    # Plot each arm position with scaled positions to fit our diagram
-    for (label, arm), color in zip(arms.items(), colors):
-        # Scale the arm position
-        scaled_arm = arm * arm_scale_factor
-        
-        # Draw vertical reference line
-        ax.axvline(x=scaled_arm, color=color, linestyle='--', alpha=0.6)
-        
-        # Plot point on aircraft
-        y_pos = 0 if view == 'top' else 2
-        ax.plot(scaled_arm, y_pos, 'o', color=color, markersize=8)
-        
-        # Add label - position differently for side vs top view
-        if view == 'side':
-            # On side view, stagger the labels to prevent overlap
-            vertical_offset = 12 + (list(arms.keys()).index(label) % 3) * 2
-            ax.text(scaled_arm, vertical_offset, label, ha='center', va='bottom', color=color, 
-                    fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.2'))
-            ax.text(scaled_arm, vertical_offset - 1.5, f"({arm} ft)", ha='center', va='top', color=color, 
-                    fontsize=8, bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.1'))
-        else:
-            # On top view, alternate labels above and below
-            if list(arms.keys()).index(label) % 2 == 0:
-                vertical_offset = wing_span * 0.6
-                va_align = 'bottom'
-            else:
-                vertical_offset = -wing_span * 0.6
-                va_align = 'top'
-            
-            ax.text(scaled_arm, vertical_offset, f"{label}\n({arm} ft)", ha='center', va=va_align, color=color, 
-                    fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
-    
-    # Add CG limits and current CG if provided
-    if cg_min is not None and cg_max is not None:
-        # Scale CG limits to match our diagram
-        scaled_cg_min = cg_min * arm_scale_factor
-        scaled_cg_max = cg_max * arm_scale_factor
-        
-        # Draw CG limit lines
-        ax.axvline(x=scaled_cg_min, color='red', linestyle=':', linewidth=2.5)
-        ax.axvline(x=scaled_cg_max, color='red', linestyle=':', linewidth=2.5)
-        
-        # Add labels for CG limits
-        min_limit_y = -5 if view == 'top' else -5
-        max_limit_y = -5 if view == 'top' else -5
-        
-        ax.text(scaled_cg_min, min_limit_y, f"Min CG\n{cg_min} ft", ha='center', va='top', color='red', 
-                fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
-        ax.text(scaled_cg_max, max_limit_y, f"Max CG\n{cg_max} ft", ha='center', va='top', color='red', 
-                fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
-        
-        # Fill the safe CG range
-        y_bottom = -wing_span if view == 'top' else -7
-        y_top = wing_span if view == 'top' else 15
-        ax.fill_between([scaled_cg_min, scaled_cg_max], [y_bottom, y_bottom], [y_top, y_top], 
-                       color='green', alpha=0.1)
-    
-    if cg is not None:
-        # Scale the CG position
-        scaled_cg = cg * arm_scale_factor
-        
-        # Draw current CG line
-        ax.axvline(x=scaled_cg, color='blue', linewidth=2.5)
-        
-        # Add a marker at the CG point
-        cg_y_pos = 0 if view == 'top' else 5
-        ax.plot(scaled_cg, cg_y_pos, 'o', color='blue', markersize=10)
-        
-        # Add CG label
-        cg_label_y = 10 if view == 'top' else 8
-        ax.text(scaled_cg, cg_label_y, f"Current CG\n{cg:.2f} ft", ha='center', va='center', color='blue', 
-                fontweight='bold', bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.3'))
-    
-    # Add a note about scaled representation
-    note_text = "Note: Arm positions are shown to scale relative to each other, but aircraft dimensions are stylized for clarity."
-    fig.text(0.5, 0.01, note_text, ha='center', fontsize=8, style='italic')
-    
-    # Add title and labels
-    view_title = 'Top' if view == 'top' else 'Side'
-    ax.set_title(f'A220-300 {view_title} View with Weight & Balance Points', pad=20, fontsize=14, fontweight='bold')
-    ax.set_xlabel('Distance from Datum (ft)', fontsize=12)
-    
-    if view == 'top':
-        ax.set_ylabel('Width (ft)', fontsize=12)
-    else:
-        ax.set_ylabel('Height (ft)', fontsize=12)
-    
-    # Remove the legend as we're now adding labels directly to the diagram
-    # This makes the visualization cleaner and more readable
-    
-    return fig
+# Settings come from the shared fleet config: every session reads the same
+# read-only snapshot, and edits in the Settings tab publish a new version
+# that all sessions pick up on their next rerun
+snapshot = fleet_config.current()
+s = snapshot.settings
 
 # App title
 st.title("A220 Central Load Planning PoC")
 
-# Create tabs
-tab1, tab2, tab3 = st.tabs(["Calculations", "Explanatory Notes", "Settings"])
+# Create tabs; Diagnostics is only shown with ?diagnostics=1 in the URL
+show_diagnostics = st.query_params.get("diagnostics") == "1"
+tabs = st.tabs(["Calculations", "Explanatory Notes", "Settings"] + (["Diagnostics"] if show_diagnostics else []))
+tab1, tab2, tab3 = tabs[:3]
 
 with tab1:
     # Main Tab - Inputs and Calculations
@@ -462,18 +50,18 @@ with tab1:
         st.success("Using actual A220 aircraft weight data. Note that arm positions still use mock values.")
     
     # Display selected aircraft data in a clean format
-    aircraft_data = s["aircraft_data"][tail]
+    record = tail_record(s, tail)
     col1, col2 = st.columns(2)
     with col1:
         st.write("**Aircraft Data Summary**")
-        st.write(f"**OEW**: {aircraft_data['OEW']:,.0f} lbs")
-        if "ZFW_LIMIT" in aircraft_data:
-            st.write(f"**ZFW Limit**: {aircraft_data['ZFW_LIMIT']:,.0f} lbs")
-        st.write(f"**MTOW**: {aircraft_data.get('MTOW_LIMIT', s['MTOW']):,.0f} lbs")
+        st.write(f"**OEW**: {record.oew:,.0f} lbs")
+        if record.zfw_limit:
+            st.write(f"**ZFW Limit**: {record.zfw_limit:,.0f} lbs")
+        st.write(f"**MTOW**: {record.mtow_limit:,.0f} lbs")
     with col2:
         st.write("**⠀**")  # Invisible character for alignment
-        if "LANDING_LIMIT" in aircraft_data:
-            st.write(f"**Landing Limit**: {aircraft_data['LANDING_LIMIT']:,.0f} lbs")
+        if record.landing_limit:
+            st.write(f"**Landing Limit**: {record.landing_limit:,.0f} lbs")
         st.write(f"**CG Limits**: {s['CG_MIN']} - {s['CG_MAX']} ft")
         st.write(f"**Target CG**: {s['target_cg']} ft")
     
@@ -507,21 +95,36 @@ with tab1:
         heavy_bags = st.number_input("Heavy Bags", min_value=0, value=20, step=1)
     bags = {"standard": standard_bags, "heavy": heavy_bags}
 
-    # Set default fuel based on selected aircraft
-    default_fuel = 27000.0
-    if tail in ["A220-1", "A220-2"] and "TAKEOFF_WEIGHT" in s["aircraft_data"][tail] and "LOAD" in s["aircraft_data"][tail]:
-        # Calculate fuel consistently for both aircraft: TOW - (OEW + Load)
-        default_fuel = s["aircraft_data"][tail]["TAKEOFF_WEIGHT"] - (s["aircraft_data"][tail]["OEW"] + s["aircraft_data"][tail]["LOAD"])
-        
-    fuel = st.number_input("Fuel (lbs)", min_value=0.0, value=default_fuel, step=100.0)
+    # Set default fuel based on selected aircraft: TOW - (OEW + Load)
+    fuel = st.number_input("Fuel (lbs)", min_value=0.0, value=default_fuel(s, tail), step=100.0)
+
+    # Optional takeoff conditions; when checked, the performance-limited TOW
+    # is part of the safety check (see clp_perf)
+    conditions = None
+    if st.checkbox("Check takeoff performance"):
+        perf_tables = performance_for(s)
+        perf_cols = st.columns(4)
+        with perf_cols[0]:
+            runway_length = st.number_input("Runway Length (ft)", min_value=0.0, value=8000.0, step=100.0)
+        with perf_cols[1]:
+            oat = st.number_input("OAT (°C)", value=15.0, step=1.0)
+        with perf_cols[2]:
+            pressure_altitude = st.number_input("Pressure Altitude (ft)", value=0.0, step=100.0)
+        with perf_cols[3]:
+            flap = st.selectbox("Takeoff Flap", perf_tables["flaps"],
+                                index=perf_tables["flaps"].index(perf_tables["default_flap"]))
+        conditions = {"runway_length": runway_length, "oat": oat,
+                      "pressure_altitude": pressure_altitude, "flap": flap}
 
     st.markdown("---")
 
-    # Calculate and Display Results
-    result = calculate_wab(tail, pax_zones, bags, fuel)
+    # Calculate and Display Results (memoized across reruns and sessions)
+    with metrics.stage("wab"):
+        entry = cached_wab(tail, pax_zones, bags, fuel, s, version=snapshot.key, conditions=conditions)
+    result = entry["result"]
     
     # Determine MTOW limit based on aircraft selected
-    mtow_limit = s["aircraft_data"][tail].get("MTOW_LIMIT", s["MTOW"])
+    mtow_limit = record.mtow_limit
     
     # Extract calculation steps for display
     steps = result["steps"]
@@ -544,8 +147,8 @@ with tab1:
     st.code(zfw_formula + "\n" + zfw_calc)
     
     # Show ZFW limit check if available
-    if "ZFW_LIMIT" in s["aircraft_data"][tail]:
-        zfw_limit = s["aircraft_data"][tail]["ZFW_LIMIT"]
+    if record.zfw_limit:
+        zfw_limit = record.zfw_limit
         zfw_status = "✓" if result['zfw'] <= zfw_limit else "!"
         st.write(f"**ZFW Limit Check**: {result['zfw']:,.0f} ≤ {zfw_limit:,.0f} lbs {zfw_status}")
     
@@ -562,20 +165,35 @@ with tab1:
     # Show MTOW limit check
     mtow_status = "✓" if result['total_weight'] <= mtow_limit else "!"
     st.write(f"**MTOW Limit Check**: {result['total_weight']:,.0f} ≤ {mtow_limit:,.0f} lbs {mtow_status}")
+
+    # Takeoff performance for the entered runway and conditions
+    performance = result["performance"]
+    if performance:
+        st.markdown("#### Takeoff Performance")
+        st.markdown("*The heaviest weight the runway allows at this temperature, pressure altitude, flap setting and CG, interpolated from the takeoff performance tables, and the shortest runway the current weight needs.*")
+        perf_status = "✓" if performance["takeoff_ok"] else "!"
+        st.write(f"**Performance-Limited TOW (Flap {performance['flap']})**: "
+                 f"{result['total_weight']:,.0f} ≤ {performance['tow_limit']:,.0f} lbs {perf_status}")
+        required = performance["required_runway"]
+        st.write(f"**Required Runway**: " + (f"{required:,.0f} ft" if required != float("inf") else "beyond the table"))
+        if not performance["in_table"]:
+            st.warning("Conditions are outside the takeoff performance tables.")
     
     # Landing Weight Estimation
     if result['landing_weight']:
         st.markdown("#### Estimated Landing Weight")
         st.markdown("*The projected weight of the aircraft at landing, calculated by subtracting estimated fuel burn from takeoff weight, must remain below maximum landing weight limits to prevent structural damage.*")
-        landing_formula = "Landing Weight = Total Weight - (Fuel × 0.75)"
+        burn_fraction = landing_fuel_burn(s)
+        burn_phases = " + ".join(f"{phase} {fraction:.1%}" for phase, fraction in s["fuel_burn"].items())
+        landing_formula = f"Landing Weight = Total Weight - (Fuel × Burn Fraction)\nBurn Fraction = {burn_phases} = {burn_fraction:.1%}"
         landing_calc = f"""
-        Landing Weight = {result['total_weight']:,.0f} - ({steps['fuel']:,.0f} × 0.75)
+        Landing Weight = {result['total_weight']:,.0f} - ({steps['fuel']:,.0f} × {burn_fraction:.4f})
         Landing Weight = {result['landing_weight']:,.0f} lbs
         """
         st.code(landing_formula + "\n" + landing_calc)
         
         # Show Landing Weight limit check
-        landing_limit = s["aircraft_data"][tail]["LANDING_LIMIT"]
+        landing_limit = record.landing_limit
         landing_status = "✓" if result['landing_weight'] <= landing_limit else "!"
         st.write(f"**Landing Weight Limit Check**: {result['landing_weight']:,.0f} ≤ {landing_limit:,.0f} lbs {landing_status}")
     
@@ -590,42 +208,49 @@ with tab1:
     st.code(cg_formula + "\n" + cg_calc)
     
     # Show CG limit check
-    cg_status = "✓" if s["CG_MIN"] <= result['cg'] <= s["CG_MAX"] else "!"
-    st.write(f"**CG Limit Check**: {s['CG_MIN']} ≤ {result['cg']:.2f} ≤ {s['CG_MAX']} ft {cg_status}")
+    # Limits come from the CG envelope at this takeoff weight
+    cg_fwd, cg_aft = envelope_limits(tables_for(s), result['total_weight'])
+    cg_status = "✓" if cg_fwd <= result['cg'] <= cg_aft else "!"
+    st.write(f"**CG Limit Check**: {cg_fwd:.2f} ≤ {result['cg']:.2f} ≤ {cg_aft:.2f} ft {cg_status}")
+
+    # In-flight CG travel as fuel burns from the tanks
+    st.markdown("#### In-Flight CG Travel")
+    st.markdown("*Fuel burns from the tanks in reverse fill order, so the CG moves during the flight. Weight and CG at the end of each burn phase must also stay within the CG envelope.*")
+    trajectory_df = pd.DataFrame([{
+        "Point": point["phase"].title(),
+        "Fuel (lbs)": f"{point['fuel']:,.0f}",
+        "Weight (lbs)": f"{point['weight']:,.0f}",
+        "CG (ft)": f"{point['cg']:.2f}",
+        "Within Envelope": "✓" if point["in_envelope"] else "!",
+    } for point in result["trajectory"]])
+    st.dataframe(trajectory_df, hide_index=True)
     
     # Bag Movement Optimization (if any)
     if steps["bag_move"] > 0:
         st.markdown("#### Bag Movement Optimization")
         st.markdown("*The process of shifting bags between forward and aft compartments to adjust the aircraft's CG toward a target value, typically an aft position for improved fuel efficiency.*")
-        bag_move_formula = "Move = (Target CG - Initial CG) × Total Weight / (Aft Arm - Fwd Arm)"
+        bag_move_formula = "Ideal Move = (Target CG - Initial CG) × Total Weight / (Aft Arm - Fwd Arm)"
         bag_move_calc = f"""
-        Move = ({s['target_cg']} - {steps['initial_cg']:.2f}) × {result['total_weight']:,.0f} / ({s['compartment_arms']['aft']} - {s['compartment_arms']['fwd']})
-        Move = {steps['bag_move']:,.0f} lbs
+        Ideal Move = ({s['target_cg']} - {steps['initial_cg']:.2f}) × {result['total_weight']:,.0f} / ({s['compartment_arms']['aft']} - {s['compartment_arms']['fwd']})
+        Ideal Move = {steps['ideal_move']:,.0f} lbs
+        
+        Whole bags loaded aft = {steps['heavy_aft']} heavy × {s['bag_weights']['heavy']:.0f} + {steps['std_aft']} standard × {s['bag_weights']['standard']:.0f}
+        Actual Move = {steps['bag_move']:,.0f} lbs → CG = {result['cg']:.2f} ft
         """
         st.code(bag_move_formula + "\n" + bag_move_calc)
         
-        # Calculate bag distribution by type
-        # Calculate how many bags to move from forward to aft
-        std_bag_weight = s["bag_weights"]["standard"]
-        heavy_bag_weight = s["bag_weights"]["heavy"]
-        total_std_bags = bags["standard"]
-        total_heavy_bags = bags["heavy"]
-        
-        # Prioritize moving heavy bags first for efficiency (fewer bags to move)
-        move_weight_remaining = steps["bag_move"]
-        heavy_bags_to_move = min(total_heavy_bags, move_weight_remaining // heavy_bag_weight)
-        move_weight_remaining -= heavy_bags_to_move * heavy_bag_weight
-        std_bags_to_move = min(total_std_bags, move_weight_remaining // std_bag_weight)
-        
-        # Calculate remaining bags in forward compartment
-        fwd_heavy_bags = total_heavy_bags - heavy_bags_to_move
-        fwd_std_bags = total_std_bags - std_bags_to_move
+        # Bag distribution by type from the integer load optimizer
+        allocation = result["bag_allocation"]
+        fwd_heavy_bags = allocation["fwd"]["heavy"]
+        fwd_std_bags = allocation["fwd"]["standard"]
+        heavy_bags_to_move = allocation["aft"]["heavy"]
+        std_bags_to_move = allocation["aft"]["standard"]
         
         # Calculate weights for display
-        fwd_heavy_weight = fwd_heavy_bags * heavy_bag_weight
-        fwd_std_weight = fwd_std_bags * std_bag_weight
-        aft_heavy_weight = heavy_bags_to_move * heavy_bag_weight
-        aft_std_weight = std_bags_to_move * std_bag_weight
+        fwd_heavy_weight = allocation["fwd"]["heavy_weight"]
+        fwd_std_weight = allocation["fwd"]["standard_weight"]
+        aft_heavy_weight = allocation["aft"]["heavy_weight"]
+        aft_std_weight = allocation["aft"]["standard_weight"]
         
         # Show bag distribution with counts and weights
         st.markdown("#### Load Instructions for Ground Handlers")
@@ -670,83 +295,108 @@ with tab1:
     # Stabilizer Trim
     st.markdown("#### Stabilizer Trim Setting")
     st.markdown("*The angle setting for the horizontal stabilizer that provides the correct aerodynamic force to balance the aircraft at its current CG position, ensuring level flight.*")
-    st.write(f"**Stab Trim**: {result['stab']}° (lookup from {int(result['cg'])})")
+    st.write(f"**Stab Trim**: {result['stab']:.2f}° (interpolated at CG {result['cg']:.2f} ft)")
     
     # Display the mock stab trim table for reference
-    st.markdown("**Stabilizer Trim Lookup Table (MOCK DATA)**")
+    st.markdown(f"**Stabilizer Trim at {result['total_weight']:,.0f} lbs (MOCK DATA)**")
     st.markdown("*Note: This is mock data for demonstration purposes only. Real A220 stabilizer trim values should be obtained from the Flight Crew Operating Manual (FCOM).*")
     
-    # Create a DataFrame for the mock stab trim table
-    stab_data = []
-    for cg in range(60, 65):  # Covering a range slightly beyond our CG limits
-        stab_data.append({"CG Position (ft)": cg, "Stab Trim Setting (°)": float(s["stab_table"].get(cg, 0))})
+    # Trim over the table's CG range in half-foot steps, interpolated at this
+    # takeoff weight with the same lookup as the stab check
+    stab_lo, stab_hi = tables_for(s)["stab"][tables_for(s)["default_flap"]]["cg_range"]
+    stab_cgs = [math.floor(stab_lo) + 0.5 * i for i in range(int(2 * (math.ceil(stab_hi) - math.floor(stab_lo))) + 1)]
+
+    def build_stab_df():
+        stab_data = []
+        for cg in stab_cgs:
+            stab_data.append({"CG Position (ft)": cg,
+                              "Stab Trim Setting (°)": lookup_stab(s, cg, result["total_weight"])})
+        return pd.DataFrame(stab_data)
     
-    # Highlight the row corresponding to the current CG position
-    current_int_cg = int(result["cg"])
-    stab_df = pd.DataFrame(stab_data)
+    # Highlight the row nearest the current CG position
+    current_row_cg = min(stab_cgs, key=lambda cg: abs(cg - result["cg"]))
+    stab_df = cached_part(entry, "stab_df", build_stab_df)
     
     # Function to highlight the row with the current CG
     def highlight_current_cg(row):
-        if row["CG Position (ft)"] == current_int_cg:
+        if row["CG Position (ft)"] == current_row_cg:
             return ['background-color: rgba(144, 238, 144, 0.5)'] * len(row)
         return [''] * len(row)
     
     # Apply styling and display table
-    styled_df = stab_df.style.apply(highlight_current_cg, axis=1)
-    st.dataframe(styled_df, use_container_width=True)
+    with metrics.stage("stab_table"):
+        styled_df = stab_df.style.apply(highlight_current_cg, axis=1)
+        st.dataframe(styled_df, use_container_width=True)
     
     # Overall Safety Check
     st.markdown("#### Overall Safety Check")
     st.markdown("*A comprehensive verification that all aircraft weight and balance parameters (ZFW, Total Weight, Landing Weight, CG) are within operational limits for safe flight.*")
     st.write(f"**Safe to Fly**: {result['safe']}")
 
+    # Load sheet documents for this flight (see clp_loadsheet for bulk mode)
+    with metrics.stage("load_sheet"):
+        sheet_row = row_from_result(tail, pax_zones, fuel, result, conditions)
+        sheet_row["date"] = time.strftime("%Y-%m-%d")
+        sheet = template_for(s).render(sheet_row, s, issued=time.strftime("%Y-%m-%d %H:%MZ", time.gmtime()),
+                                       status="PRELIM")
+    sheet_cols = st.columns(2)
+    with sheet_cols[0]:
+        st.download_button("Download Load Sheet (PDF)", sheet["pdf"], file_name=f"loadsheet_{tail}.pdf",
+                           mime="application/pdf")
+    with sheet_cols[1]:
+        st.download_button("Download ACARS Load Sheet", sheet["txt"], file_name=f"loadsheet_{tail}.txt",
+                           mime="text/plain")
+
     # CG Plot
     st.subheader("CG Visualization")
-    fig, ax = plt.subplots(figsize=(8, 4))
-    
-    # Plot CG line
-    ax.plot([0, 1], [result["cg"], result["cg"]], label="CG", color="blue", linewidth=2)
-    
-    # Plot limit lines
-    ax.axhline(s["CG_MIN"], color="r", ls="--", label="Min Limit", linewidth=1.5)
-    ax.axhline(s["CG_MAX"], color="r", ls="--", label="Max Limit", linewidth=1.5)
-    
-    # Set y-axis range to ensure CG is visible even if outside limits
-    # Add padding above and below to ensure visibility
-    cg_value = result["cg"]
-    min_limit = s["CG_MIN"]
-    max_limit = s["CG_MAX"]
-    
-    # Calculate appropriate y-axis range with padding
-    padding = 0.5  # Half a foot padding
-    y_min = min(cg_value, min_limit) - padding
-    y_max = max(cg_value, max_limit) + padding
-    
-    # Set axis limits and labels
-    ax.set_ylim(y_min, y_max)
-    ax.set_xlim(-0.1, 1.1)
-    ax.set_xlabel("Position", fontsize=10)
-    ax.set_ylabel("Center of Gravity (ft)", fontsize=10)
-    ax.set_title(f"CG Position: {cg_value:.2f} ft (Limits: {min_limit}-{max_limit} ft)", fontsize=12)
-    
-    # Remove x-ticks as they don't represent anything meaningful
-    ax.set_xticks([])
-    
-    # Add a grid for better readability
-    ax.grid(True, linestyle='--', alpha=0.7)
-    
-    # Add status indicator
-    cg_in_limits = min_limit <= cg_value <= max_limit
-    status_color = "green" if cg_in_limits else "red"
-    status_text = "✓ Within Limits" if cg_in_limits else "! Outside Limits"
-    ax.text(0.5, y_min + 0.2, status_text, ha='center', color=status_color, fontsize=11, 
-            bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.5'))
-    
-    # Improve legend
-    ax.legend(loc='upper right', framealpha=0.9)
-    
-    # Show the plot
-    st.pyplot(fig)
+    def draw_cg_plot():
+        fig, ax = plt.subplots(figsize=(8, 4))
+    
+        # Plot CG line
+        ax.plot([0, 1], [result["cg"], result["cg"]], label="CG", color="blue", linewidth=2)
+    
+        # Plot limit lines (the envelope at the current takeoff weight)
+        ax.axhline(cg_fwd, color="r", ls="--", label="Min Limit", linewidth=1.5)
+        ax.axhline(cg_aft, color="r", ls="--", label="Max Limit", linewidth=1.5)
+    
+        # Set y-axis range to ensure CG is visible even if outside limits
+        # Add padding above and below to ensure visibility
+        cg_value = result["cg"]
+        min_limit = cg_fwd
+        max_limit = cg_aft
+    
+        # Calculate appropriate y-axis range with padding
+        padding = 0.5  # Half a foot padding
+        y_min = min(cg_value, min_limit) - padding
+        y_max = max(cg_value, max_limit) + padding
+    
+        # Set axis limits and labels
+        ax.set_ylim(y_min, y_max)
+        ax.set_xlim(-0.1, 1.1)
+        ax.set_xlabel("Position", fontsize=10)
+        ax.set_ylabel("Center of Gravity (ft)", fontsize=10)
+        ax.set_title(f"CG Position: {cg_value:.2f} ft (Limits: {min_limit:.2f}-{max_limit:.2f} ft)", fontsize=12)
+    
+        # Remove x-ticks as they don't represent anything meaningful
+        ax.set_xticks([])
+    
+        # Add a grid for better readability
+        ax.grid(True, linestyle='--', alpha=0.7)
+    
+        # Add status indicator
+        cg_in_limits = min_limit <= cg_value <= max_limit
+        status_color = "green" if cg_in_limits else "red"
+        status_text = "✓ Within Limits" if cg_in_limits else "! Outside Limits"
+        ax.text(0.5, y_min + 0.2, status_text, ha='center', color=status_color, fontsize=11, 
+                bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.5'))
+    
+        # Improve legend
+        ax.legend(loc='upper right', framealpha=0.9)
+        return fig
+    
+    # Show the plot (rendered once per flight and settings version)
+    with metrics.stage("cg_plot"):
+        st.image(cached_part(entry, "cg_plot", lambda: figure_png(draw_cg_plot)), width="stretch")
 
     # Add aircraft visualization after the CG plot
     st.subheader("Aircraft Visualization")
@@ -756,17 +406,21 @@ with tab1:
     view = st.radio("Select View", ["Side View", "Top View"], horizontal=True)
     
     # Create the visualization
-    fig = draw_aircraft_visualization(
-        s["zone_arms"],
-        s["compartment_arms"],
-        s["fuel_arm"],
-        s["aircraft_data"][tail]["OEW_ARM"],
-        view='top' if view == "Top View" else 'side',
-        cg=result["cg"],
-        cg_min=s["CG_MIN"],
-        cg_max=s["CG_MAX"]
-    )
-    st.pyplot(fig, use_container_width=True)
+    view_key = 'top' if view == "Top View" else 'side'
+    with metrics.stage("aircraft_figure"):
+        aircraft_png = cached_part(entry, f"aircraft_{view_key}", lambda: render_aircraft_png(
+            s["zone_arms"],
+            s["compartment_arms"],
+            s["fuel_arm"],
+            record.oew_arm,
+            view=view_key,
+            cg=result["cg"],
+            # Envelope at this TOW, rounded so the cached static layers
+            # (keyed by limits) stay few with a sloped envelope
+            cg_min=round(cg_fwd, 2),
+            cg_max=round(cg_aft, 2)
+        ))
+        st.image(aircraft_png, width="stretch")
 
 with tab2:
     # Explanatory Notes Tab
@@ -884,7 +538,7 @@ with tab2:
     2. **CG envelope limits** (min/max CG) for safe operation
     3. **Stabilizer trim table** that accurately maps CG to trim settings
     4. **Airline-specific standard weights** for passengers and baggage
-    5. **Fuel burn profiles** for more accurate landing weight estimation
+    5. **Fuel burn profiles** and tank arms/capacities for accurate landing weight and in-flight CG
     """)
     
     st.markdown("**Potential Data Sources:**")
@@ -953,6 +607,7 @@ with tab3:
     # Settings Tab
     st.header("Settings")
     st.write("Adjust parameters used in the calculations.")
+    st.caption(f"Shared fleet configuration, version {snapshot.version}. Changes apply to every dispatcher session.")
     
     st.subheader("Passenger Weights")
     col1, col2, col3 = st.columns(3)
@@ -967,28 +622,26 @@ with tab3:
     if (new_adult_weight != s["PAX_WEIGHT_ADULT"] or 
         new_child_weight != s["PAX_WEIGHT_CHILD"] or 
         new_infant_weight != s["PAX_WEIGHT_INFANT"]):
-        s["PAX_WEIGHT_ADULT"] = new_adult_weight
-        s["PAX_WEIGHT_CHILD"] = new_child_weight
-        s["PAX_WEIGHT_INFANT"] = new_infant_weight
+        fleet_config.publish({
+            "PAX_WEIGHT_ADULT": new_adult_weight,
+            "PAX_WEIGHT_CHILD": new_child_weight,
+            "PAX_WEIGHT_INFANT": new_infant_weight,
+        })
         st.success("Passenger weights updated!")
     
     st.subheader("Aircraft Parameters")
-    col1, col2 = st.columns(2)
-    with col1:
-        new_target_cg = st.number_input("Target CG (ft)", min_value=float(s["CG_MIN"]), max_value=float(s["CG_MAX"]), value=float(s["target_cg"]), step=0.1)
-    with col2:
-        new_fuel_arm = st.number_input("Fuel Arm (ft)", min_value=0.0, value=float(s["fuel_arm"]), step=0.1)
+    # Fuel is booked at the fuel_tanks arms, so there is no single fuel arm to edit
+    new_target_cg = st.number_input("Target CG (ft)", min_value=float(s["CG_MIN"]), max_value=float(s["CG_MAX"]), value=float(s["target_cg"]), step=0.1)
     
     # Update session state if values changed
-    if new_target_cg != s["target_cg"] or new_fuel_arm != s["fuel_arm"]:
-        s["target_cg"] = new_target_cg
-        s["fuel_arm"] = new_fuel_arm
+    if new_target_cg != s["target_cg"]:
+        fleet_config.publish({"target_cg": new_target_cg})
         st.success("Aircraft parameters updated!")
     
     st.subheader("Weight Limits")
     new_mtow = st.number_input("Maximum Takeoff Weight (lbs)", min_value=1.0, value=float(s["MTOW"]), step=100.0)
     if new_mtow != s["MTOW"]:
-        s["MTOW"] = new_mtow
+        fleet_config.publish({"MTOW": new_mtow})
         st.success("MTOW updated!")
     
     col1, col2 = st.columns(2)
@@ -999,6 +652,56 @@ with tab3:
     
     # Update session state if values changed
     if new_cg_min != s["CG_MIN"] or new_cg_max != s["CG_MAX"]:
-        s["CG_MIN"] = new_cg_min
-        s["CG_MAX"] = new_cg_max
+        fleet_config.publish({"CG_MIN": new_cg_min, "CG_MAX": new_cg_max})
         st.success("CG limits updated!")
+    
+    # Result cache (shared by all sessions on this server)
+    with st.expander("Result Cache Statistics"):
+        stats = wab_cache.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+        col2.metric("Entries", f"{stats['entries']} / {stats['maxsize']}")
+        col3.metric("Evictions", stats["evictions"])
+        st.write(f"**Hits**: {stats['hits']} (p50 {stats['hit_ms_p50'] or 0:.3f} ms, p95 {stats['hit_ms_p95'] or 0:.3f} ms)")
+        st.write(f"**Misses**: {stats['misses']} (p50 {stats['miss_ms_p50'] or 0:.1f} ms, p95 {stats['miss_ms_p95'] or 0:.1f} ms)")
+        st.caption("Settings edits change the settings version in the cache key, so earlier results are not reused.")
+
+if show_diagnostics:
+    with tabs[3]:
+        st.header("Diagnostics")
+        st.write("Per-stage timings for every session on this server, as histograms since the last reset.")
+
+        metrics.enabled = st.toggle("Instrumentation enabled", value=metrics.enabled)
+        snap = metrics.snapshot()
+        if snap["stages"]:
+            st.dataframe(pd.DataFrame([
+                {"Stage": name, "Count": h["count"], "Mean (ms)": h["mean_ms"], "p50 ≤ (ms)": h["p50_ms"],
+                 "p95 ≤ (ms)": h["p95_ms"], "p99 ≤ (ms)": h["p99_ms"], "Total (ms)": h["sum_ms"]}
+                for name, h in sorted(snap["stages"].items())
+            ]), width="stretch", hide_index=True)
+        else:
+            st.info("No timings recorded yet.")
+        if snap["counters"]:
+            st.write("  \n".join(f"**{name}**: {n:,}" for name, n in sorted(snap["counters"].items())))
+        st.caption("Percentiles are histogram bucket upper bounds. "
+                   "Prometheus text format is served on CLP_METRICS_PORT at /metrics when that variable is set.")
+
+        col1, col2 = st.columns(2)
+        if col1.button("Profile next rerun"):
+            metrics.profiler.arm()
+            st.rerun()
+        if col2.button("Reset timings"):
+            metrics.reset()
+            st.rerun()
+        # Filled in at the end of the script, once a profiled rerun has finished
+        profile_slot = st.empty()
+
+metrics.count("reruns")
+if metrics.enabled:
+    metrics.observe("rerun", (time.perf_counter() - rerun_start) * 1000)
+if profiling:
+    metrics.profiler.end()
+if show_diagnostics and metrics.profiler.last_report:
+    with profile_slot.container():
+        with st.expander("Last rerun profile (cProfile, cumulative time)", expanded=profiling):
+            st.code(metrics.profiler.last_report)
@@ -0,0 +1,256 @@
+import copy
+import glob
+import os
+import re
+import xml.etree.ElementTree as ET
+
+# Streaming ARINC 633 flight-plan ingestion.
+#
+# Reads a single plan file, a directory of plan files, or a stream of
+# concatenated plans, and yields one record per plan with the weight header
+# (DOW, payload, ZFW/TOW/landing estimates and structural limits) and fuel.
+# Plans are parsed with iterparse and cleared as soon as they are read, so
+# memory stays flat regardless of how many plans a file drop contains.
+#
+# Only the elements below are read; namespaces are ignored so different
+# ARINC 633 schema versions parse the same way.
+
+LBS_PER_KG = 2.20462
+
+# record field -> path of the weight element inside the plan
+WEIGHT_FIELDS = {
+    "dow": "DryOperatingWeight/{*}EstimatedWeight",
+    "payload": "Load/{*}EstimatedWeight",
+    "zfw": "ZeroFuelWeight/{*}EstimatedWeight",
+    "zfw_limit": "ZeroFuelWeight/{*}StructuralLimit",
+    "tow": "TakeoffWeight/{*}EstimatedWeight",
+    "mtow_limit": "TakeoffWeight/{*}StructuralLimit",
+    "landing_weight": "LandingWeight/{*}EstimatedWeight",
+    "landing_limit": "LandingWeight/{*}StructuralLimit",
+    "takeoff_fuel": "TakeOffFuel/{*}EstimatedWeight",
+    "trip_fuel": "TripFuel/{*}EstimatedWeight",
+}
+REQUIRED_FIELDS = ("dow", "payload", "takeoff_fuel", "zfw_limit", "mtow_limit", "landing_limit")
+
+_XML_DECLARATION = re.compile(rb"<\?xml[^>]*\?>")
+
+
+class _PlanStream:
+    # File-like wrapper that joins concatenated plan documents under one
+    # synthetic root so a single iterparse pass can read them all
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._buffer = b"<Plans>"
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size < 0 or len(self._buffer) < size):
+            line = next(self._lines, None)
+            if line is None:
+                self._buffer += b"</Plans>"
+                self._done = True
+            else:
+                self._buffer += _XML_DECLARATION.sub(b"", line)
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _weight(plan, path):
+    element = plan.find(".//{*}" + path + "/{*}Value")
+    if element is None or not (element.text or "").strip():
+        return None
+    value = float(element.text)
+    if element.get("unit", "LB").upper() in ("KG", "KGS"):
+        value *= LBS_PER_KG
+    return value
+
+
+def _text(plan, path):
+    element = plan.find(".//{*}" + path)
+    return element.text.strip() if element is not None and element.text else None
+
+
+def _attr(plan, path, name):
+    element = plan.find(".//{*}" + path)
+    return element.get(name) if element is not None else None
+
+
+def plan_record(plan, source=None):
+    # Extract the fields the W&B engine needs from one FlightPlan element
+    record = {
+        "source": source,
+        "flight": _text(plan, "FlightIdentification/{*}FlightIdentifier"),
+        "date": _attr(plan, "Flight", "flightOriginDate"),
+        "tail": _attr(plan, "Aircraft", "aircraftRegistration"),
+        "origin": _text(plan, "DepartureAirport/{*}AirportICAOCode"),
+        "destination": _text(plan, "ArrivalAirport/{*}AirportICAOCode"),
+    }
+    for field, path in WEIGHT_FIELDS.items():
+        record[field] = _weight(plan, path)
+
+    missing = [f for f in REQUIRED_FIELDS + ("tail",) if record[f] is None]
+    if missing:
+        raise ValueError(f"Flight plan {record['flight'] or '?'} in {source or 'stream'} is missing {', '.join(missing)}")
+    return record
+
+
+def iter_plans_from_stream(stream, source=None):
+    # Yield a record per FlightPlan in a binary stream of one or more plans
+    depth = 0
+    root = None
+    for event, element in ET.iterparse(_PlanStream(stream), events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = element
+            continue
+        depth -= 1
+        if depth == 1 and _local(element.tag) == "FlightPlan":
+            yield plan_record(element, source)
+            # Drop the parsed plan so memory stays constant
+            root.clear()
+
+
+def iter_plans(path):
+    # Yield plan records from a file, a directory of *.xml files, or a binary stream
+    if hasattr(path, "read"):
+        yield from iter_plans_from_stream(path)
+        return
+    files = sorted(glob.glob(os.path.join(path, "*.xml"))) if os.path.isdir(path) else [path]
+    for file_path in files:
+        with open(file_path, "rb") as f:
+            yield from iter_plans_from_stream(f, file_path)
+
+
+def plan_aircraft_data(record, settings):
+    # aircraft_data entry built from the plan header; arms come from settings
+    known = settings["aircraft_data"].get(record["tail"])
+    if known is not None:
+        oew_arm = known["OEW_ARM"]
+    else:
+        arms = [data["OEW_ARM"] for data in settings["aircraft_data"].values()]
+        oew_arm = sum(arms) / len(arms)
+    return {
+        "OEW": record["dow"],
+        "OEW_ARM": oew_arm,
+        "ZFW_LIMIT": record["zfw_limit"],
+        "MTOW_LIMIT": record["mtow_limit"],
+        "LANDING_LIMIT": record["landing_limit"],
+        "TAKEOFF_WEIGHT": record["tow"] if record["tow"] is not None else record["dow"] + record["payload"] + record["takeoff_fuel"],
+        "LOAD": record["payload"],
+    }
+
+
+def plan_flight(record, settings):
+    # First-estimate flight input from the plan payload: passengers spread
+    # evenly over the zones, each with one standard bag
+    per_pax = settings["PAX_WEIGHT_ADULT"] + settings["bag_weights"]["standard"]
+    pax = int(record["payload"] // per_pax)
+    zones = list(settings["zone_arms"])
+    share, extra = divmod(pax, len(zones))
+    pax_zones = {zone: {"adults": share + (1 if i < extra else 0)} for i, zone in enumerate(zones)}
+    return {
+        "tail": record["tail"],
+        "pax_zones": pax_zones,
+        "bags": {"standard": pax, "heavy": 0},
+        "fuel": record["takeoff_fuel"],
+    }
+
+
+def evaluate_plans(path, settings):
+    # Parse every plan under path and run the batch W&B engine over them.
+    # Returns (records, result arrays); per-plan DOW and limits override the
+    # settings for that tail.
+    from clp_batch import calculate_wab_batch, flights_to_columns
+
+    records = list(iter_plans(path))
+    plan_settings = copy.copy(settings)
+    plan_settings["aircraft_data"] = dict(settings["aircraft_data"])
+
+    # Plans for the same tail may carry different DOWs, so each plan gets
+    # its own aircraft_data key
+    flights = []
+    for i, record in enumerate(records):
+        key = f"{record['tail']}#{i}"
+        plan_settings["aircraft_data"][key] = plan_aircraft_data(record, settings)
+        flight = plan_flight(record, settings)
+        flight["tail"] = key
+        flights.append(flight)
+
+    tails = [flight["tail"] for flight in flights]
+    columns = flights_to_columns(flights, plan_settings, tails)
+    return records, calculate_wab_batch(plan_settings, tails=tails, **columns)
+
+
+def write_synthetic_plans(directory, count=200, seed=0, date="2026-10-17", per_file=1):
+    # Generate mock ARINC 633 plans for local testing (per_file > 1 writes
+    # concatenated documents into each file)
+    import random
+
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    airports = ["KBOS", "KJFK", "KLGA", "KDCA", "KORD", "KATL", "KMCO", "KDEN", "KSFO", "KSEA"]
+    documents = []
+    for i in range(count):
+        tail = f"A220-{rng.randint(1, 40)}"
+        dow = rng.uniform(86500.0, 88000.0)
+        payload = rng.uniform(14000.0, 26000.0)
+        fuel = rng.uniform(9000.0, 30000.0)
+        trip = fuel * rng.uniform(0.6, 0.8)
+        origin, destination = rng.sample(airports, 2)
+        documents.append(SYNTHETIC_PLAN.format(
+            flight=f"XX{100 + i}", date=date, tail=tail, origin=origin, destination=destination,
+            dow=dow, payload=payload, zfw=dow + payload, tow=dow + payload + fuel,
+            landing=dow + payload + fuel - trip, fuel=fuel, trip=trip))
+
+    paths = []
+    for start in range(0, count, per_file):
+        path = os.path.join(directory, f"plan_{start:04d}.xml")
+        with open(path, "w") as f:
+            f.write("".join(documents[start:start + per_file]))
+        paths.append(path)
+    return paths
+
+
+SYNTHETIC_PLAN = """<?xml version="1.0" encoding="UTF-8"?>
+<FlightPlan xmlns="http://aeec.aero/633/2007/4">
+  <M633Header timestamp="{date}T05:00:00Z" versionNumber="1"/>
+  <M633SupplementaryHeader>
+    <Flight flightOriginDate="{date}">
+      <FlightIdentification><FlightIdentifier>{flight}</FlightIdentifier></FlightIdentification>
+      <DepartureAirport airportFunction="DepartureAirport"><AirportICAOCode>{origin}</AirportICAOCode></DepartureAirport>
+      <ArrivalAirport airportFunction="ArrivalAirport"><AirportICAOCode>{destination}</AirportICAOCode></ArrivalAirport>
+    </Flight>
+    <Aircraft aircraftRegistration="{tail}"><AircraftModel airlineSpecificSubType="A220-300"/></Aircraft>
+  </M633SupplementaryHeader>
+  <FlightPlanHeader>
+    <WeightHeader>
+      <DryOperatingWeight><EstimatedWeight><Value unit="LB">{dow:.0f}</Value></EstimatedWeight></DryOperatingWeight>
+      <Load><EstimatedWeight><Value unit="LB">{payload:.0f}</Value></EstimatedWeight></Load>
+      <ZeroFuelWeight>
+        <EstimatedWeight><Value unit="LB">{zfw:.0f}</Value></EstimatedWeight>
+        <StructuralLimit><Value unit="LB">123000</Value></StructuralLimit>
+      </ZeroFuelWeight>
+      <TakeoffWeight>
+        <EstimatedWeight><Value unit="LB">{tow:.0f}</Value></EstimatedWeight>
+        <StructuralLimit><Value unit="LB">149000</Value></StructuralLimit>
+      </TakeoffWeight>
+      <LandingWeight>
+        <EstimatedWeight><Value unit="LB">{landing:.0f}</Value></EstimatedWeight>
+        <StructuralLimit><Value unit="LB">129500</Value></StructuralLimit>
+      </LandingWeight>
+    </WeightHeader>
+    <FuelHeader>
+      <TakeOffFuel><EstimatedWeight><Value unit="LB">{fuel:.0f}</Value></EstimatedWeight></TakeOffFuel>
+      <TripFuel><EstimatedWeight><Value unit="LB">{trip:.0f}</Value></EstimatedWeight></TripFuel>
+    </FuelHeader>
+  </FlightPlanHeader>
+</FlightPlan>
+"""
@@ -0,0 +1,268 @@
+import numpy as np
+
+from clp_fuel import fuel_trajectory_batch, landing_fuel_burn, tank_moments_batch
+from clp_perf import takeoff_performance_batch
+from clp_registry import registry_for, tail_array
+from clp_tables import envelope_limits_batch, in_envelope_batch, stab_trim_batch, tables_for
+
+# Vectorized fleet-batch W&B engine.
+#
+# Mirrors calculate_wab in clp_core.py, but takes a whole day of flights as columnar
+# arrays and evaluates every flight in one pass. Operations are applied in the
+# same order as the scalar path so both produce identical floating point results.
+
+
+def tail_constants(settings, tails=None):
+    # Per-tail constant arrays indexed by tail index, from the compiled
+    # registry (see clp_registry). tails reorders or subsets them; by default
+    # the index is the tail's position in aircraft_data. Missing ZFW/landing
+    # limits are NaN so comparisons against them never fail.
+    registry = registry_for(settings)
+    array = tail_array(registry)
+    if tails is None:
+        tails = registry["tails"]
+    else:
+        array = array[[registry["index"][tail] for tail in tails]]
+    consts = {name: np.ascontiguousarray(array[name]) for name in array.dtype.names}
+    consts["tails"] = tails
+    return consts
+
+
+def flights_to_columns(flights, settings, tails=None):
+    # Pack a list of {"tail", "pax_zones", "bags", "fuel"} dicts into columnar arrays
+    if tails is None:
+        tails = list(settings["aircraft_data"].keys())
+    tail_index = {tail: i for i, tail in enumerate(tails)}
+    zones = list(settings["zone_arms"].keys())
+
+    n = len(flights)
+    columns = {
+        "tail_idx": np.empty(n, dtype=np.int64),
+        "adults": np.zeros((n, len(zones))),
+        "children": np.zeros((n, len(zones))),
+        "infants": np.zeros((n, len(zones))),
+        "standard_bags": np.empty(n),
+        "heavy_bags": np.empty(n),
+        "fuel": np.empty(n),
+    }
+    for i, flight in enumerate(flights):
+        columns["tail_idx"][i] = tail_index[flight["tail"]]
+        for j, zone in enumerate(zones):
+            counts = flight["pax_zones"].get(zone, {})
+            columns["adults"][i, j] = counts.get("adults", 0)
+            columns["children"][i, j] = counts.get("children", 0)
+            columns["infants"][i, j] = counts.get("infants", 0)
+        columns["standard_bags"][i] = flight["bags"]["standard"]
+        columns["heavy_bags"][i] = flight["bags"]["heavy"]
+        columns["fuel"][i] = flight["fuel"]
+    return columns
+
+
+def optimize_bag_load_batch(standard_bags, heavy_bags, total_moment, total_weight, settings):
+    # Vectorized optimize_bag_load: the loop runs over heavy-bag counts, each
+    # step evaluating every flight at once with the same ranking as the scalar
+    # search (CG limit violation, distance from ideal move, bags moved).
+    std_w = settings["bag_weights"]["standard"]
+    heavy_w = settings["bag_weights"]["heavy"]
+    arm_delta = settings["compartment_arms"]["aft"] - settings["compartment_arms"]["fwd"]
+    n_std = np.asarray(standard_bags, dtype=float)
+    n_heavy = np.asarray(heavy_bags, dtype=float)
+
+    # Ideal move and the aft-weight window that keeps the CG within limits
+    ideal_move = (settings["target_cg"] * total_weight - total_moment) / arm_delta
+    cg_fwd, cg_aft = envelope_limits_batch(tables_for(settings), total_weight)
+    min_move = (cg_fwd * total_weight - total_moment) / arm_delta
+    max_move = (cg_aft * total_weight - total_moment) / arm_delta
+
+    # Same early stop as the scalar search: no flight needs more heavy bags
+    # than the first count covering its ideal move
+    heavy_stop = np.minimum(n_heavy, np.maximum(0.0, np.ceil(ideal_move / heavy_w)))
+
+    n = total_weight.shape[0]
+    out_heavy = np.zeros(n)
+    out_std = np.zeros(n)
+    # Most flights stop after a few heavy-bag counts while a few need dozens,
+    # so the working arrays are compacted to the flights still searching
+    # whenever that set halves; idx maps working rows back to flights
+    # Bag weights may be per-flight arrays (see clp_sweep), so they are
+    # compacted with the rest
+    idx = np.arange(n)
+    ideal_move, min_move, max_move, n_std, heavy_stop, std_w, heavy_w = (
+        np.broadcast_to(a, (n,)) for a in (ideal_move, min_move, max_move, n_std, heavy_stop, std_w, heavy_w))
+    work_ideal, work_min, work_max, work_std, work_stop, work_std_w, work_heavy_w = (
+        ideal_move, min_move, max_move, n_std, heavy_stop, std_w, heavy_w)
+    best_viol = np.full(n, np.inf)
+    best_err = np.full(n, np.inf)
+    best_count = np.full(n, np.inf)
+    best_heavy = np.zeros(n)
+    best_std = np.zeros(n)
+
+    max_heavy = int(heavy_stop.max()) if n else 0
+    for heavy_aft in range(max_heavy + 1):
+        valid = heavy_aft <= work_stop
+        if 2 * np.count_nonzero(valid) < len(idx):
+            out_heavy[idx] = best_heavy
+            out_std[idx] = best_std
+            keep = np.flatnonzero(valid)
+            idx = idx[keep]
+            work_ideal, work_min, work_max, work_std, work_stop, work_std_w, work_heavy_w = (
+                a[keep] for a in (work_ideal, work_min, work_max, work_std, work_stop, work_std_w, work_heavy_w))
+            best_viol, best_err, best_count, best_heavy, best_std = (
+                a[keep] for a in (best_viol, best_err, best_count, best_heavy, best_std))
+            valid = valid[keep]
+        remaining = (work_ideal - heavy_aft * work_heavy_w) / work_std_w
+        floor_std = np.minimum(work_std, np.maximum(0.0, np.floor(remaining)))
+        ceil_std = np.minimum(work_std, floor_std + 1)
+        for std_aft in (floor_std, ceil_std):
+            aft_weight = heavy_aft * work_heavy_w + std_aft * work_std_w
+            viol = np.maximum(np.maximum(0.0, work_min - aft_weight), aft_weight - work_max)
+            err = np.abs(aft_weight - work_ideal)
+            count = heavy_aft + std_aft
+            better = valid & ((viol < best_viol)
+                              | ((viol == best_viol) & ((err < best_err)
+                                                        | ((err == best_err) & (count < best_count)))))
+            np.copyto(best_viol, viol, where=better)
+            np.copyto(best_err, err, where=better)
+            np.copyto(best_count, count, where=better)
+            np.copyto(best_heavy, heavy_aft, where=better)
+            np.copyto(best_std, std_aft, where=better)
+    out_heavy[idx] = best_heavy
+    out_std[idx] = best_std
+    best_heavy, best_std = out_heavy, out_std
+
+    aft_weight = best_heavy * heavy_w + best_std * std_w
+    return {
+        "heavy_aft": best_heavy,
+        "std_aft": best_std,
+        "aft_weight": aft_weight,
+        "ideal_move": np.maximum(0.0, ideal_move),
+        "cg": (total_moment + aft_weight * arm_delta) / total_weight,
+    }
+
+
+def calculate_wab_batch(settings, tail_idx, adults, children, infants,
+                        standard_bags, heavy_bags, fuel, tails=None,
+                        runway_length=None, oat=None, pressure_altitude=None, flap=None, tank_moments=None):
+    # tail_idx, standard_bags, heavy_bags, fuel: shape (n,)
+    # adults, children, infants: shape (n, zones), zones ordered as settings["zone_arms"]
+    # runway_length, oat, pressure_altitude, flap: optional takeoff conditions,
+    # shape (n,) or scalar; when given, takeoff performance is part of safe
+    # tank_moments: clp_fuel.tank_moments_batch for these flights, if already known
+    consts = tail_constants(settings, tails)
+    tail_idx = np.asarray(tail_idx, dtype=np.int64)
+    adults = np.asarray(adults, dtype=float)
+    children = np.asarray(children, dtype=float)
+    infants = np.asarray(infants, dtype=float)
+    fuel = np.asarray(fuel, dtype=float)
+
+    # Per-tail constants gathered with one fancy-index each
+    oew = consts["oew"][tail_idx]
+    dow_moment = consts["dow_moment"][tail_idx]
+    mtow_limit = consts["mtow_limit"][tail_idx]
+    zfw_limit = consts["zfw_limit"][tail_idx]
+    landing_limit = consts["landing_limit"][tail_idx]
+
+    zone_arms = list(settings["zone_arms"].values())
+    # Loaded fuel at its tank-table arm, as in calculate_wab
+    if tank_moments is None:
+        tank_moments = tank_moments_batch(settings, tail_idx, fuel, consts["tails"])
+    fuel_arm = np.divide(tank_moments[:, 0], fuel, out=np.zeros_like(fuel), where=fuel != 0)
+    fwd_arm = settings["compartment_arms"]["fwd"]
+    aft_arm = settings["compartment_arms"]["aft"]
+
+    # Passenger weights by zone. Scalar settings may also be per-flight
+    # arrays of shape (n,) (see clp_sweep), hence the trailing zone axis.
+    pax_weights = (adults * np.asarray(settings["PAX_WEIGHT_ADULT"], dtype=float)[..., None]
+                   + children * np.asarray(settings["PAX_WEIGHT_CHILD"], dtype=float)[..., None]
+                   + infants * np.asarray(settings["PAX_WEIGHT_INFANT"], dtype=float)[..., None])
+
+    # Bag weights
+    bag_weight = (np.asarray(standard_bags, dtype=float) * settings["bag_weights"]["standard"]
+                  + np.asarray(heavy_bags, dtype=float) * settings["bag_weights"]["heavy"])
+
+    # Payload and moments accumulated zone by zone, matching the scalar summation order
+    pax_total = np.zeros_like(fuel)
+    weight = oew + fuel
+    moment = dow_moment + fuel * fuel_arm
+    for j, arm in enumerate(zone_arms):
+        pax_total = pax_total + pax_weights[:, j]
+        weight = weight + pax_weights[:, j]
+        moment = moment + pax_weights[:, j] * arm
+    zfw = oew + pax_total + bag_weight
+
+    # Initial distribution: all bags forward
+    weight_no_bags = weight
+    moment_no_bags = moment
+    total_weight = weight_no_bags + bag_weight + 0.0
+    total_moment = moment_no_bags + bag_weight * fwd_arm + 0.0 * aft_arm
+    initial_cg = total_moment / total_weight
+
+    # CG optimization: whole bags loaded aft (fuel savings)
+    load = optimize_bag_load_batch(standard_bags, heavy_bags, total_moment, total_weight, settings)
+    move = load["aft_weight"]
+    needs_move = move > 0
+    fwd = bag_weight - move
+    aft = 0.0 + move
+    moved_weight = weight_no_bags + fwd + aft
+    moved_moment = moment_no_bags + fwd * fwd_arm + aft * aft_arm
+    total_weight = np.where(needs_move, moved_weight, total_weight)
+    total_moment = np.where(needs_move, moved_moment, total_moment)
+    cg = np.where(needs_move, moved_moment / moved_weight, initial_cg)
+
+    tables = tables_for(settings)
+    stab, stab_ok = stab_trim_batch(tables, cg, total_weight)
+
+    # Limit checks; NaN limits (tails without real data) never fail
+    zfw_ok = ~(zfw > zfw_limit)
+    landing_weight = total_weight - (fuel * landing_fuel_burn(settings))
+    landing_ok = ~(landing_weight > landing_limit)
+    trajectory = fuel_trajectory_batch(settings, tail_idx, total_weight, total_moment, fuel, consts["tails"],
+                                       tank_moments)
+    safe = ((total_weight <= mtow_limit)
+            & in_envelope_batch(tables, cg, total_weight)
+            & stab_ok & zfw_ok & landing_ok & trajectory["ok"])
+    if runway_length is not None:
+        performance = takeoff_performance_batch(settings, total_weight, cg, runway_length, oat,
+                                                pressure_altitude, flap)
+        safe = safe & performance["takeoff_ok"]
+
+    result = {
+        "zfw": zfw,
+        "total_weight": total_weight,
+        "landing_weight": np.where(np.isnan(landing_limit), np.nan, landing_weight),
+        "initial_cg": initial_cg,
+        "cg": cg,
+        "ideal_move": load["ideal_move"],
+        "bag_move": move,
+        "heavy_aft": load["heavy_aft"],
+        "std_aft": load["std_aft"],
+        "fwd": fwd,
+        "aft": aft,
+        "stab": stab,
+        "trajectory_weight": trajectory["weight"],
+        "trajectory_cg": trajectory["cg"],
+        "trajectory_ok": trajectory["ok"],
+        "safe": safe,
+    }
+    if runway_length is not None:
+        result["tow_limit"] = performance["tow_limit"]
+        result["required_runway"] = performance["required_runway"]
+        result["takeoff_ok"] = performance["takeoff_ok"]
+    return result
+
+
+def synthetic_columns(n, settings, seed=0, tails=None):
+    # Random but plausible day of flights in calculate_wab_batch's column format
+    rng = np.random.default_rng(seed)
+    if tails is None:
+        tails = list(settings["aircraft_data"].keys())
+    zones = len(settings["zone_arms"])
+    return {
+        "tail_idx": rng.integers(0, len(tails), n),
+        "adults": rng.integers(15, 50, (n, zones)).astype(float),
+        "children": rng.integers(0, 6, (n, zones)).astype(float),
+        "infants": rng.integers(0, 3, (n, zones)).astype(float),
+        "standard_bags": rng.integers(20, 120, n).astype(float),
+        "heavy_bags": rng.integers(0, 40, n).astype(float),
+        "fuel": rng.uniform(8000.0, 30000.0, n).round(-2),
+    }
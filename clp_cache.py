@@ -0,0 +1,151 @@
+import collections
+import hashlib
+import io
+import json
+import threading
+import time
+
+from clp_core import calculate_wab, settings_version
+from clp_metrics import metrics
+
+# Memoized W&B results for the Streamlit app.
+#
+# Streamlit reruns clp.py on every widget change, even when the flight inputs
+# are unchanged (e.g. toggling the Side/Top view). Entries are keyed on a
+# canonical hash of (tail, pax_zones, bags, fuel, settings version) and hold
+# the calculate_wab result plus derived parts (rendered figures, tables) built
+# on first use. Any Settings edit changes settings_version, so results for the
+# old settings are simply never looked up again and age out of the LRU.
+#
+# The cache is process-wide and shared by every session. That is safe because
+# entries are treated as read-only: figures are stored as PNG bytes rather
+# than live matplotlib objects, and callers must not mutate cached results.
+
+PAX_CLASSES = ("adults", "children", "infants")
+
+
+def wab_key(tail, pax_zones, bags, fuel, settings, version=None, conditions=None):
+    # Canonical key: zero-filled pax counts for every zone, whole bag counts
+    # and float fuel, so equivalent inputs (missing vs 0, 20000 vs 20000.0)
+    # share an entry
+    canonical = {
+        "tail": tail,
+        "pax": [[int(pax_zones.get(zone, {}).get(c, 0)) for c in PAX_CLASSES] for zone in settings["zone_arms"]],
+        "bags": [int(bags.get("standard", 0)), int(bags.get("heavy", 0))],
+        "fuel": float(fuel),
+        "settings": version or settings_version(settings),
+        "conditions": conditions and {key: str(value) for key, value in conditions.items()},
+    }
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    # Thread-safe bounded LRU with hit/miss counters and recent latencies
+
+    def __init__(self, maxsize=256, samples=1000):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._hit_ms = collections.deque(maxlen=samples)
+        self._miss_ms = collections.deque(maxlen=samples)
+
+    def get(self, key, compute):
+        # Cached value for key, computing (outside the lock) on a miss
+        start = time.perf_counter()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._hit_ms.append((time.perf_counter() - start) * 1000)
+                return entry
+
+        entry = compute()
+        with self._lock:
+            # Another session may have filled the key meanwhile; keep theirs
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self.misses += 1
+            self._miss_ms.append((time.perf_counter() - start) * 1000)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            hit_ms = sorted(self._hit_ms)
+            miss_ms = sorted(self._miss_ms)
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "hit_ms_p50": _percentile(hit_ms, 50),
+                "hit_ms_p95": _percentile(hit_ms, 95),
+                "miss_ms_p50": _percentile(miss_ms, 50),
+                "miss_ms_p95": _percentile(miss_ms, 95),
+            }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+# Process-wide cache shared by all sessions
+wab_cache = ResultCache()
+
+# pyplot keeps global state, so figures are rendered one at a time
+_render_lock = threading.Lock()
+
+
+def cached_wab(tail, pax_zones, bags, fuel, settings, version=None, conditions=None):
+    # Cache entry {"result": calculate_wab(...), "parts": {...}} for this
+    # flight; version is the settings' content hash if already known (e.g. a
+    # config Snapshot key), saving a re-hash of the settings
+    key = wab_key(tail, pax_zones, bags, fuel, settings, version, conditions)
+
+    def compute():
+        with metrics.stage("calculate_wab"):
+            return {"result": calculate_wab(tail, pax_zones, bags, fuel, settings, conditions), "parts": {}}
+
+    return wab_cache.get(key, compute)
+
+
+def cached_part(entry, name, build):
+    # Derived value stored with the entry, built on first use (timed as
+    # stage "build.<name>")
+    parts = entry["parts"]
+    if name not in parts:
+        with metrics.stage(f"build.{name}"):
+            parts[name] = build()
+    return parts[name]
+
+
+def figure_png(draw, dpi=100):
+    # Render the figure returned by draw() to PNG bytes and close it
+    import matplotlib.pyplot as plt
+
+    with _render_lock:
+        fig = draw()
+        try:
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=dpi, bbox_inches="tight")
+        finally:
+            plt.close(fig)
+    return buffer.getvalue()
@@ -0,0 +1,251 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from clp_batch import calculate_wab_batch
+from clp_config import apply_changes, load_settings_file, parse_overrides
+from clp_core import default_settings
+
+# Fleet replanning from the command line.
+#
+# Reads a day's flights (CSV, Parquet or JSONL), runs the batch W&B engine and
+# integer bag optimizer over them in chunks across a process pool, and writes
+# results plus load instructions in input order.
+#
+#   python clp_cli.py flights.csv -o results.parquet --workers 8
+#   python clp_cli.py flights.csv -o what_if.csv --set PAX_WEIGHT_ADULT=205
+#   python clp_cli.py flights.csv -o results.csv --store results/ --date 2026-10-17
+#   python clp_cli.py flights.csv -o margins.csv --uncertainty 100000
+#   python clp_cli.py flights.csv -o fuel.csv --optimize-fuel --reseat
+#
+# Input columns: tail, {zone}_adults, {zone}_children, {zone}_infants for each
+# zone in settings["zone_arms"] (missing counts default to 0), standard_bags,
+# heavy_bags, fuel. Optional takeoff conditions runway_length, oat,
+# pressure_altitude and flap add the performance-limited TOW and required
+# runway to the results and to the safe flag (see clp_perf). Any other
+# columns (e.g. flight number) are passed through.
+
+RESULT_COLUMNS = ["zfw", "total_weight", "landing_weight", "initial_cg", "cg",
+                  "bag_move", "fwd", "aft", "stab", "safe"]
+TAKEOFF_COLUMNS = ["runway_length", "oat", "pressure_altitude", "flap"]
+PERFORMANCE_COLUMNS = ["tow_limit", "required_runway", "takeoff_ok"]
+
+# Worker process state, set once by _init_worker
+_settings = None
+_tails = None
+
+
+def read_flights(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(path)
+    if ext in (".jsonl", ".ndjson"):
+        return pd.read_json(path, lines=True)
+    return pd.read_csv(path)
+
+
+def write_results(frame, path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".parquet":
+        frame.to_parquet(path, index=False)
+    elif ext in (".jsonl", ".ndjson"):
+        frame.to_json(path, orient="records", lines=True)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def frame_to_columns(frame, settings, tails, takeoff=True):
+    # Convert the input table into calculate_wab_batch's columnar arrays;
+    # takeoff=False leaves out the takeoff condition columns
+    tail_index = {tail: i for i, tail in enumerate(tails)}
+    unknown = sorted(set(frame["tail"]) - set(tail_index))
+    if unknown:
+        raise ValueError(f"Unknown tails: {', '.join(map(str, unknown))}")
+
+    def counts(kind):
+        return np.column_stack([
+            frame[f"{zone}_{kind}"].to_numpy(dtype=float) if f"{zone}_{kind}" in frame else np.zeros(len(frame))
+            for zone in settings["zone_arms"]
+        ])
+
+    columns = {
+        "tail_idx": frame["tail"].map(tail_index).to_numpy(dtype=np.int64),
+        "adults": counts("adults"),
+        "children": counts("children"),
+        "infants": counts("infants"),
+        "standard_bags": frame["standard_bags"].to_numpy(dtype=float),
+        "heavy_bags": frame["heavy_bags"].to_numpy(dtype=float),
+        "fuel": frame["fuel"].to_numpy(dtype=float),
+    }
+    if takeoff and "runway_length" in frame:
+        missing = [name for name in TAKEOFF_COLUMNS[1:3] if name not in frame]
+        if missing:
+            raise ValueError(f"runway_length also needs column(s): {', '.join(missing)}")
+        for name in TAKEOFF_COLUMNS[:3]:
+            columns[name] = frame[name].to_numpy(dtype=float)
+        if "flap" in frame:
+            columns["flap"] = frame["flap"].to_numpy()
+    return columns
+
+
+def _init_worker(settings, tails):
+    global _settings, _tails
+    _settings = settings
+    _tails = tails
+
+
+def _run_chunk(columns):
+    result = calculate_wab_batch(_settings, tails=_tails, **columns)
+    # Load instructions per hold from the optimizer's bag counts
+    result["fwd_heavy"] = columns["heavy_bags"] - result["heavy_aft"]
+    result["fwd_standard"] = columns["standard_bags"] - result["std_aft"]
+    result["aft_heavy"] = result["heavy_aft"]
+    result["aft_standard"] = result["std_aft"]
+    keep = RESULT_COLUMNS + ["fwd_heavy", "fwd_standard", "aft_heavy", "aft_standard"]
+    keep += [key for key in PERFORMANCE_COLUMNS if key in result]
+    return {key: result[key] for key in keep}
+
+
+def replan(frame, settings, workers=None, chunk_size=2000):
+    # Evaluate every flight in frame; returns frame with result columns appended
+    tails = list(settings["aircraft_data"])
+    columns = frame_to_columns(frame, settings, tails)
+    n = len(frame)
+    chunks = [{key: value[start:start + chunk_size] for key, value in columns.items()}
+              for start in range(0, n, chunk_size)]
+
+    if workers == 1 or len(chunks) <= 1:
+        _init_worker(settings, tails)
+        parts = [_run_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(settings, tails)) as pool:
+            # map keeps chunk order, so output rows line up with input rows
+            parts = list(pool.map(_run_chunk, chunks))
+
+    out = frame.reset_index(drop=True).copy()
+    for key in parts[0] if parts else RESULT_COLUMNS:
+        out[key] = np.concatenate([part[key] for part in parts]) if parts else []
+    for key in ("fwd_heavy", "fwd_standard", "aft_heavy", "aft_standard"):
+        if key in out:
+            out[key] = out[key].astype(np.int64)
+    return out
+
+
+def add_uncertainty(results, settings, draws, seed=0):
+    # Monte Carlo CG/TOW percentiles and breach probabilities per flight
+    # (see clp_montecarlo), appended as cg_p{q}, tow_p{q} and p_* columns
+    from clp_montecarlo import MonteCarlo
+
+    tails = list(settings["aircraft_data"])
+    columns = frame_to_columns(results, settings, tails, takeoff=False)
+    plan = {"total_weight": results["total_weight"].to_numpy(), "cg": results["cg"].to_numpy(),
+            "std_aft": results["aft_standard"].to_numpy(dtype=float),
+            "heavy_aft": results["aft_heavy"].to_numpy(dtype=float)}
+    mc = MonteCarlo(draws, seed)
+    margins = mc.run(settings, tails=tails, plan=plan, **columns)
+    out = results.copy()
+    for j, q in enumerate(mc.percentiles):
+        out[f"cg_p{q}"] = margins["cg_pct"][:, j]
+        out[f"tow_p{q}"] = margins["tow_pct"][:, j]
+    for key, value in margins.items():
+        if key.startswith("p_"):
+            out[key] = value
+    return out
+
+
+def add_fuel_savings(results, settings, reseat=False):
+    # Fuel-optimal loading per flight (see clp_savings), appended as opt_*
+    # columns plus fuel_saved / fuel_saved_vs_plan; returns (frame, day totals).
+    # opt_safe covers the W&B limits only, not takeoff performance.
+    from clp_savings import optimize_fuel_batch, savings_summary
+
+    tails = list(settings["aircraft_data"])
+    columns = frame_to_columns(results, settings, tails, takeoff=False)
+    plan = calculate_wab_batch(settings, tails=tails, **columns)
+    optimized = optimize_fuel_batch(settings, tails=tails, reseat=reseat, plan=plan, **columns)
+    out = results.copy()
+    out["opt_aft_heavy"] = optimized["heavy_aft"].astype(np.int64)
+    out["opt_aft_standard"] = optimized["std_aft"].astype(np.int64)
+    out["opt_reseat_aft"] = optimized["reseat_aft"].astype(np.int64)
+    for key in ("cg", "trip_fuel", "safe"):
+        out[f"opt_{key}"] = optimized[key]
+    out["fuel_saved"] = optimized["fuel_saved"]
+    out["fuel_saved_vs_plan"] = optimized["fuel_saved_vs_plan"]
+    return out, savings_summary(optimized)
+
+
+def store_results(results, settings, root, date=None):
+    # Append replanned flights to the result store as planned load sheets;
+    # the date comes from a "date" column when there is one
+    from clp_store import ResultStore
+
+    tail_idx, tails = pd.factorize(results["tail"])
+    arrays = {key: results[key].to_numpy() for key in RESULT_COLUMNS}
+    arrays["heavy_aft"] = results["aft_heavy"].to_numpy()
+    arrays["std_aft"] = results["aft_standard"].to_numpy()
+    if date is None:
+        date = results["date"].astype(str).tolist() if "date" in results else time.strftime("%Y-%m-%d")
+    flights = results["flight"].astype(str).tolist() if "flight" in results else None
+    return ResultStore(root).append_batch(arrays, list(tails), tail_idx, date, settings, flights=flights)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet-wide W&B replanning")
+    parser.add_argument("flights", help="input flights (.csv, .parquet, .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="output path (.csv, .parquet, .jsonl)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="flights per worker task")
+    parser.add_argument("--settings", help="JSON settings (or shared config store file) to merge over the defaults")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting, e.g. PAX_WEIGHT_ADULT=205 (repeatable)")
+    parser.add_argument("--store", help="also append results to the Parquet result store at this directory")
+    parser.add_argument("--date", help="flight date for --store (default: date column, else today)")
+    parser.add_argument("--uncertainty", type=int, metavar="DRAWS",
+                        help="add Monte Carlo CG/TOW percentiles and breach probabilities (e.g. 100000 draws)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for --uncertainty")
+    parser.add_argument("--optimize-fuel", action="store_true",
+                        help="add the fuel-optimal bag loading and estimated fuel saved per flight")
+    parser.add_argument("--reseat", action="store_true", help="let --optimize-fuel also move adults between zones")
+    args = parser.parse_args(argv)
+
+    settings = default_settings()
+    if args.settings:
+        settings.update(load_settings_file(args.settings))
+    settings = apply_changes(settings, parse_overrides(args.overrides))
+
+    start = time.perf_counter()
+    frame = read_flights(args.flights)
+    results = replan(frame, settings, workers=args.workers, chunk_size=args.chunk_size)
+    if args.uncertainty:
+        results = add_uncertainty(results, settings, args.uncertainty, args.seed)
+    savings = None
+    if args.optimize_fuel:
+        results, savings = add_fuel_savings(results, settings, args.reseat)
+    write_results(results, args.output)
+    if args.store:
+        store_results(results, settings, args.store, args.date)
+    elapsed = time.perf_counter() - start
+
+    unsafe = int((~results["safe"].astype(bool)).sum()) if len(results) else 0
+    print(f"{len(results)} flights replanned in {elapsed:.2f} s ({unsafe} not safe) -> {args.output}",
+          file=sys.stderr)
+    if savings is not None:
+        print(f"fuel-optimal loading: {savings['fuel_saved']:,.0f} lbs saved vs all-forward, "
+              f"{savings['fuel_saved_vs_plan']:,.0f} lbs vs target-CG plan "
+              f"({savings['feasible']} of {savings['flights']} flights feasible, {savings['pax_moves']} pax moves)",
+              file=sys.stderr)
+        if savings["infeasible_plan_safe"]:
+            print(f"{savings['infeasible_plan_safe']} flights safe by the standard plan have no loading within "
+                  f"the hold caps (no savings; fuel_saved is empty)",
+                  file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import json
+import os
+import threading
+import time
+
+from clp_core import default_settings, settings_version
+from clp_registry import registry_for
+
+# Shared, versioned fleet configuration.
+#
+# One ConfigStore per process holds the current settings as an immutable
+# Snapshot. Readers (every Streamlit session, batch workers) just take
+# store.current() - a single reference read, no lock - and use that snapshot
+# for the whole rerun or job. Writers call publish(), which builds the next
+# settings dict copy-on-write (only the dicts along each changed key path are
+# copied; everything else is shared with the previous version) and swaps it
+# in with one assignment, so readers see either the old or the new version,
+# never a mix.
+#
+# Snapshot settings are shared by every reader and must not be mutated; use
+# publish() (or default_settings()/copy.deepcopy for a private copy).
+# Every snapshot's aircraft data is validated and compiled (clp_registry)
+# when it is created, so a publish with a missing tail field fails with
+# RegistryError and the current version stays in place.
+#
+# With a path, each publish is also written to a JSON file (temp file +
+# rename, so the file is always complete) and current() picks up versions
+# published by other processes when the file changes.
+
+
+class VersionConflict(RuntimeError):
+    pass
+
+
+class Snapshot:
+    __slots__ = ("version", "settings", "key", "published_at")
+
+    def __init__(self, version, settings, published_at=None):
+        self.version = version
+        self.settings = settings
+        registry_for(settings)
+        # Content hash, usable as a cache key (see clp_cache.wab_key)
+        self.key = settings_version(settings)
+        self.published_at = published_at or time.time()
+
+
+def _settings_from_json(settings):
+    # JSON object keys are strings; the stab table is keyed by integer CG
+    if "stab_table" in settings:
+        settings["stab_table"] = {int(k): v for k, v in settings["stab_table"].items()}
+    return settings
+
+
+def load_settings_file(path):
+    # Settings from a JSON file: a plain settings dict, or a ConfigStore
+    # file (whose current settings are used)
+    with open(path) as f:
+        loaded = json.load(f)
+    if "settings" in loaded and "version" in loaded:
+        loaded = loaded["settings"]
+    return _settings_from_json(loaded)
+
+
+def parse_overrides(overrides):
+    # KEY=VALUE strings -> {dotted key: value}; values are parsed as JSON
+    # where possible (PAX_WEIGHT_ADULT=205, bag_weights.standard=55)
+    changes = {}
+    for override in overrides:
+        key, _, raw = override.partition("=")
+        if not raw:
+            raise ValueError(f"Override {override!r} must look like KEY=VALUE")
+        try:
+            changes[key] = json.loads(raw)
+        except json.JSONDecodeError:
+            changes[key] = raw
+    return changes
+
+
+def apply_changes(settings, changes):
+    # New settings dict with {dotted key: value} applied copy-on-write; the
+    # input is left untouched and unchanged subtrees are shared
+    updated = dict(settings)
+    copied = set()
+    for key, value in changes.items():
+        *parents, leaf = key.split(".")
+        target = updated
+        path = ""
+        for parent in parents:
+            path = f"{path}.{parent}" if path else parent
+            if parent not in target:
+                raise KeyError(f"Unknown setting {key!r}")
+            if path not in copied:
+                target[parent] = dict(target[parent])
+                copied.add(path)
+            target = target[parent]
+        if leaf not in target:
+            raise KeyError(f"Unknown setting {key!r}")
+        target[leaf] = value
+    return updated
+
+
+class ConfigStore:
+
+    def __init__(self, settings=None, path=None):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._file_mtime = None
+        if settings is None and path and os.path.exists(path):
+            self._current = self._load_file()
+        else:
+            self._current = Snapshot(1, settings if settings is not None else default_settings())
+            if path:
+                self._write_file(self._current)
+
+    def current(self):
+        # Latest snapshot; lock-free unless another process has published
+        if self.path and self._file_changed():
+            with self._write_lock:
+                if self._file_changed():
+                    self._current = self._load_file()
+        return self._current
+
+    def publish(self, changes, expected_version=None):
+        # Apply {dotted key: value} on top of the latest version and make it
+        # current. With expected_version, fail instead of overwriting a
+        # version the caller has not seen.
+        with self._write_lock:
+            if self.path and self._file_changed():
+                self._current = self._load_file()
+            base = self._current
+            if expected_version is not None and expected_version != base.version:
+                raise VersionConflict(f"Settings are at version {base.version}, not {expected_version}")
+            snapshot = Snapshot(base.version + 1, apply_changes(base.settings, changes))
+            if self.path:
+                self._write_file(snapshot)
+            self._current = snapshot
+            return snapshot
+
+    # File persistence
+
+    def _file_changed(self):
+        try:
+            return os.stat(self.path).st_mtime_ns != self._file_mtime
+        except FileNotFoundError:
+            return False
+
+    def _load_file(self):
+        with open(self.path) as f:
+            document = json.load(f)
+        self._file_mtime = os.stat(self.path).st_mtime_ns
+        return Snapshot(document["version"], _settings_from_json(document["settings"]), document["published_at"])
+
+    def _write_file(self, snapshot):
+        document = {"version": snapshot.version, "published_at": snapshot.published_at,
+                    "settings": snapshot.settings}
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(document, f, indent=2)
+        os.replace(temp_path, self.path)
+        self._file_mtime = os.stat(self.path).st_mtime_ns
+
+
+# Process-wide store used by the Streamlit app. Set CLP_CONFIG_PATH to share
+# it with other processes (e.g. several app servers or batch jobs).
+fleet_config = ConfigStore(path=os.environ.get("CLP_CONFIG_PATH"))
@@ -0,0 +1,345 @@
+import copy
+import hashlib
+import json
+import math
+
+from clp_fuel import fuel_trajectory, landing_fuel_burn, loaded_fuel_arm
+from clp_perf import takeoff_performance
+from clp_registry import tail_record
+from clp_tables import envelope_limits, in_envelope, stab_trim, tables_for
+
+# Headless CLP core: W&B math, settings defaults, limit checks and bag allocation.
+#
+# Only the standard library is imported here so workers, batch jobs and
+# benchmarks can load the math without Streamlit or matplotlib. Heavier
+# modules (e.g. the NumPy batch engine) are imported lazily on first use.
+
+DEFAULT_SETTINGS = {
+    # A220 Data from real flight plan weight headers
+    "aircraft_data": {
+        "A220-1": {
+            "OEW": 87202.0,  # Dry Operating Weight
+            "OEW_ARM": 64.8,  # Using mock arm since real arm unknown
+            "ZFW_LIMIT": 123000.0,  # Zero Fuel Weight Structural Limit
+            "MTOW_LIMIT": 149000.0,  # Takeoff Weight Structural Limit
+            "LANDING_LIMIT": 129500.0,  # Landing Weight Structural Limit
+            "TAKEOFF_WEIGHT": 122484.0,  # From example - for reference
+            "LOAD": 20582.0  # Payload weight from header
+        },
+        "A220-2": {
+            "OEW": 87517.0,  # Dry Operating Weight
+            "OEW_ARM": 64.9,  # Using mock arm since real arm unknown
+            "ZFW_LIMIT": 123000.0,  # Zero Fuel Weight Structural Limit
+            "MTOW_LIMIT": 149000.0,  # Takeoff Weight Structural Limit
+            "LANDING_LIMIT": 129500.0,  # Landing Weight Structural Limit
+            "TAKEOFF_WEIGHT": 139112.0,  # From example - for reference
+            "LOAD": 24395.0  # Payload weight from header
+        }
+    },
+    "zone_arms": {"A": 60.0, "B": 70.0, "C": 80.0},
+    # Seat map for the seat-level model (mock): 28 rows in a 2-3 layout,
+    # row arms spaced evenly from the first row; zones given as row ranges
+    "seat_layout": {
+        "rows": 28,
+        "seat_letters": ["A", "C", "D", "E", "F"],
+        "first_row_arm": 56.0,
+        "row_pitch": 1.0,
+        "zones": {"A": [1, 9], "B": [10, 19], "C": [20, 28]}
+    },
+    "bag_weights": {"standard": 50.0, "heavy": 70.0},
+    "compartment_arms": {"fwd": 50.0, "aft": 80.0},
+    # Hold limits used by the multi-compartment allocator (mock values);
+    # effective cap is min(max_weight, max_running_load × length)
+    "compartment_limits": {
+        "fwd": {"max_weight": 6000.0, "length": 18.0, "max_running_load": 350.0,
+                "accepts": ["bag", "bulk"], "uld_positions": 0},
+        "aft": {"max_weight": 7500.0, "length": 22.0, "max_running_load": 350.0,
+                "accepts": ["bag", "bulk"], "uld_positions": 0}
+    },
+    "MTOW": 149000.0,
+    "CG_MIN": 61.0,
+    "CG_MAX": 63.0,
+    "stab_table": {61: 2.0, 62: 0.0, 63: -2.0},
+    "fuel_arm": 70.0,  # fuel position in the aircraft diagram; W&B uses the fuel_tanks arms
+    # Fuel tanks in fill order, burned in reverse (mock arms/capacities)
+    "fuel_tanks": {
+        "wing": {"arm": 68.5, "capacity": 14000.0},
+        "center": {"arm": 73.0, "capacity": 24000.0}
+    },
+    # Fraction of loaded fuel burned per flight phase, in order; the rest is
+    # the reserve at landing
+    "fuel_burn": {"taxi": 0.03125, "climb": 0.15625, "cruise": 0.5, "descent": 0.0625},
+    # Trip fuel factor by takeoff CG (mock): aft CG means less trim drag.
+    # Alternatively {"reference_cg": ..., "coefficients": [...]} (see clp_savings)
+    "fuel_cg_model": {"cgs": [58.0, 60.0, 62.0, 64.0, 66.0],
+                      "trip_fuel_factor": [1.012, 1.006, 1.0, 0.995, 0.991]},
+    "target_cg": 62.5,
+
+    # Passenger weights
+    "PAX_WEIGHT_ADULT": 200.0,    # lbs
+    "PAX_WEIGHT_CHILD": 80.0,     # lbs
+    "PAX_WEIGHT_INFANT": 22.0     # lbs
+}
+
+# Attributes served lazily from heavier modules: name -> module
+_LAZY_ATTRS = {
+    "calculate_wab_batch": "clp_batch",
+    "flights_to_columns": "clp_batch",
+}
+
+
+def __getattr__(name):
+    # Import the NumPy-backed modules only when one of their names is requested
+    if name in _LAZY_ATTRS:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def default_settings():
+    # Fresh, independent copy of the defaults (safe to mutate)
+    return copy.deepcopy(DEFAULT_SETTINGS)
+
+
+def settings_version(settings):
+    # Short content hash identifying a settings snapshot; equal settings give
+    # equal versions, so stored and cached results can be tied to the exact
+    # weights, arms and limits that produced them
+    canonical = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+
+def aircraft_limits(settings, tail):
+    # Returns (mtow_limit, zfw_limit, landing_limit); tails without their own
+    # structural limits get the fleet MTOW and None (see clp_registry)
+    record = tail_record(settings, tail)
+    return record.mtow_limit, record.zfw_limit, record.landing_limit
+
+
+def default_fuel(settings, tail):
+    # Fuel implied by the flight plan header: TOW - (OEW + Load)
+    data = settings["aircraft_data"][tail]
+    if "TAKEOFF_WEIGHT" in data and "LOAD" in data:
+        return data["TAKEOFF_WEIGHT"] - (data["OEW"] + data["LOAD"])
+    return 27000.0
+
+
+def lookup_stab(settings, cg, weight, flap=None):
+    # Stab trim at this CG and takeoff weight, interpolated from the compiled
+    # trim tables (see clp_tables)
+    return stab_trim(tables_for(settings), cg, weight, flap)[0]
+
+
+def check_limits(settings, tail, zfw, total_weight, landing_weight, cg, trajectory=None, performance=None):
+    # Individual limit checks plus the overall safe flag; with a fuel
+    # trajectory (see clp_fuel), every in-flight point must be in the envelope;
+    # with takeoff performance (see clp_perf), the TOW must be within its limit
+    mtow_limit, zfw_limit, landing_limit = aircraft_limits(settings, tail)
+    tables = tables_for(settings)
+    checks = {
+        "mtow_ok": total_weight <= mtow_limit,
+        "cg_ok": in_envelope(tables, cg, total_weight),
+        "stab_ok": stab_trim(tables, cg, total_weight)[1],
+        "zfw_ok": not (zfw_limit and zfw > zfw_limit),
+        "landing_ok": not (landing_limit and landing_weight > landing_limit),
+    }
+    if trajectory is not None:
+        checks["trajectory_ok"] = all(point["in_envelope"] for point in trajectory)
+    if performance is not None:
+        checks["takeoff_ok"] = performance["takeoff_ok"]
+    checks["safe"] = all(checks.values())
+    return checks
+
+
+def base_load(tail, pax_zones, fuel, settings):
+    # Weight and moment of everything except bags/cargo (OEW, fuel, pax)
+    s = settings
+    record = tail_record(s, tail)
+    weight = record.oew + fuel
+    moment = record.dow_moment + fuel * loaded_fuel_arm(s, tail, fuel)
+    for zone, counts in pax_zones.items():
+        pax_weight = (counts.get("adults", 0) * s["PAX_WEIGHT_ADULT"]
+                      + counts.get("children", 0) * s["PAX_WEIGHT_CHILD"]
+                      + counts.get("infants", 0) * s["PAX_WEIGHT_INFANT"])
+        weight += pax_weight
+        moment += pax_weight * s["zone_arms"][zone]
+    return weight, moment
+
+
+# W&B and Optimization Logic
+def calculate_wab(tail, pax_zones, bags, fuel, settings, conditions=None):
+    # conditions: optional takeoff conditions {"runway_length", "oat",
+    # "pressure_altitude", "flap"}; when given, the performance-limited TOW
+    # is part of the safe flag
+    s = settings
+
+    # Aircraft base weights
+    record = tail_record(s, tail)
+    weights = [record.oew, fuel]
+    arms = [record.oew_arm, loaded_fuel_arm(s, tail, fuel)]
+
+    # Calculate passenger weights by zone
+    pax_weights_by_zone = {}
+    for zone, counts in pax_zones.items():
+        adults = counts.get("adults", 0)
+        children = counts.get("children", 0)
+        infants = counts.get("infants", 0)
+
+        # Store steps for display
+        pax_weights_by_zone[zone] = {
+            "adults": adults * s["PAX_WEIGHT_ADULT"],
+            "children": children * s["PAX_WEIGHT_CHILD"],
+            "infants": infants * s["PAX_WEIGHT_INFANT"]
+        }
+
+        pax_weight = pax_weights_by_zone[zone]["adults"] + pax_weights_by_zone[zone]["children"] + pax_weights_by_zone[zone]["infants"]
+        weights.append(pax_weight)
+        arms.append(s["zone_arms"][zone])
+
+    # Calculate bag weights
+    std_bag_weight = bags["standard"] * s["bag_weights"]["standard"]
+    heavy_bag_weight = bags["heavy"] * s["bag_weights"]["heavy"]
+    bag_weight = std_bag_weight + heavy_bag_weight
+
+    # Calculate ZFW (OEW + pax + bags, excluding the fuel entry at index 1)
+    zfw = weights[0] + sum(weights[2:]) + bag_weight
+
+    # Initial bag distribution (all forward)
+    distrib = {"fwd": bag_weight, "aft": 0}
+    weights.extend([distrib["fwd"], distrib["aft"]])
+    arms.extend([s["compartment_arms"]["fwd"], s["compartment_arms"]["aft"]])
+
+    # Calculate total weight and initial CG
+    total_weight = sum(weights)
+
+    # Calculate moments and store for display
+    moments = [w * a for w, a in zip(weights, arms)]
+    total_moment = sum(moments)
+
+    # Calculate initial CG
+    initial_cg = total_moment / total_weight
+
+    # CG optimization: pick whole bags to load aft (fuel savings)
+    load = optimize_bag_load(bags, total_moment, total_weight, s)
+    move = load["aft_weight"]
+    cg = initial_cg
+    if move > 0:
+        distrib["fwd"] -= move
+        distrib["aft"] += move
+        weights[-2:] = [distrib["fwd"], distrib["aft"]]
+        total_weight = sum(weights)
+        moments = [w * a for w, a in zip(weights, arms)]
+        total_moment = sum(moments)
+        cg = total_moment / total_weight
+
+    # Interpolated stab trim at this CG and takeoff weight
+    stab = lookup_stab(s, cg, total_weight)
+
+    # Landing weight and in-flight CG from the phase burn schedule
+    landing_weight = total_weight - (fuel * landing_fuel_burn(s))
+    trajectory = fuel_trajectory(s, tail, total_weight, total_moment, fuel)
+    landing_limit = record.landing_limit
+    performance = takeoff_performance(s, conditions, total_weight, cg) if conditions else None
+    checks = check_limits(s, tail, zfw, total_weight, landing_weight, cg, trajectory, performance)
+
+    # Store calculation steps for display
+    calculation_steps = {
+        "pax_weights": pax_weights_by_zone,
+        "std_bag_weight": std_bag_weight,
+        "heavy_bag_weight": heavy_bag_weight,
+        "oew": record.oew,
+        "fuel": fuel,
+        "initial_cg": initial_cg,
+        "ideal_move": load["ideal_move"],
+        "bag_move": move,
+        "heavy_aft": load["heavy_aft"],
+        "std_aft": load["std_aft"],
+        "moments": moments,
+        "total_moment": total_moment
+    }
+
+    return {
+        "zfw": zfw,
+        "total_weight": total_weight,
+        "cg": cg,
+        "stab": stab,
+        "distrib": distrib,
+        "bag_allocation": allocate_bags(bags, load["heavy_aft"], load["std_aft"], s),
+        "landing_weight": landing_weight if landing_limit else None,
+        "trajectory": trajectory,
+        "performance": performance,
+        "safe": checks["safe"],
+        "steps": calculation_steps  # Add calculation steps to result
+    }
+
+
+def optimize_bag_load(bags, total_moment, total_weight, settings):
+    # Choose how many whole heavy and standard bags to load aft (all start
+    # forward). Candidates are ranked by how far the CG falls outside the
+    # envelope limits at this weight, then distance from target_cg, then number of bags moved. Both
+    # CG terms are measured in pounds of aft load, which is equivalent since
+    # CG is linear in the aft weight. For each heavy count only the two
+    # standard counts bracketing the ideal move are tried, so the search is
+    # O(heavy bags) using fixed per-bag moment deltas. Assumes target_cg lies
+    # within the CG limits.
+    std_w = settings["bag_weights"]["standard"]
+    heavy_w = settings["bag_weights"]["heavy"]
+    arm_delta = settings["compartment_arms"]["aft"] - settings["compartment_arms"]["fwd"]
+    n_std = int(bags["standard"])
+    n_heavy = int(bags["heavy"])
+
+    # Ideal (continuous) move that puts the CG on target, and the aft-weight
+    # window that keeps the CG within limits
+    ideal_move = (settings["target_cg"] * total_weight - total_moment) / arm_delta
+    cg_fwd, cg_aft = envelope_limits(tables_for(settings), total_weight)
+    min_move = (cg_fwd * total_weight - total_moment) / arm_delta
+    max_move = (cg_aft * total_weight - total_moment) / arm_delta
+
+    # Past the first heavy count that covers the ideal move, every extra bag
+    # only pushes the CG further beyond target, so the search can stop there
+    heavy_stop = min(n_heavy, max(0, math.ceil(ideal_move / heavy_w)))
+
+    best = None
+    for heavy_aft in range(heavy_stop + 1):
+        remaining = (ideal_move - heavy_aft * heavy_w) / std_w
+        floor_std = min(n_std, max(0, int(remaining // 1)))
+        ceil_std = min(n_std, floor_std + 1)
+        for std_aft in (floor_std, ceil_std):
+            aft_weight = heavy_aft * heavy_w + std_aft * std_w
+            viol = max(0.0, min_move - aft_weight, aft_weight - max_move)
+            key = (viol, abs(aft_weight - ideal_move), heavy_aft + std_aft)
+            if best is None or key < best[0]:
+                best = (key, heavy_aft, std_aft)
+
+    _, heavy_aft, std_aft = best
+    aft_weight = heavy_aft * heavy_w + std_aft * std_w
+    return {
+        "heavy_aft": heavy_aft,
+        "std_aft": std_aft,
+        "aft_weight": aft_weight,
+        "ideal_move": max(0.0, ideal_move),
+        "cg": (total_moment + aft_weight * arm_delta) / total_weight,
+    }
+
+
+def allocate_bags(bags, heavy_aft, std_aft, settings):
+    # Bag counts and weights per compartment for the load instructions
+    std_bag_weight = settings["bag_weights"]["standard"]
+    heavy_bag_weight = settings["bag_weights"]["heavy"]
+    fwd_heavy_bags = bags["heavy"] - heavy_aft
+    fwd_std_bags = bags["standard"] - std_aft
+
+    return {
+        "fwd": {
+            "heavy": fwd_heavy_bags,
+            "standard": fwd_std_bags,
+            "heavy_weight": fwd_heavy_bags * heavy_bag_weight,
+            "standard_weight": fwd_std_bags * std_bag_weight,
+        },
+        "aft": {
+            "heavy": heavy_aft,
+            "standard": std_aft,
+            "heavy_weight": heavy_aft * heavy_bag_weight,
+            "standard_weight": std_aft * std_bag_weight,
+        },
+    }
@@ -0,0 +1,144 @@
+import time
+
+from clp_core import (aircraft_limits, base_load, check_limits, fuel_trajectory, landing_fuel_burn,
+                      lookup_stab, optimize_bag_load)
+from clp_fuel import loaded_fuel_arm
+
+# Incremental W&B for a single flight between first estimate and closeout.
+#
+# FlightLoad keeps running totals of weight and moment, so each load-sheet
+# delta (a late pax, a gate-checked bag, a fuel change) is applied in O(1).
+# Limits and stab trim are re-checked after every change. Every change is
+# appended to an event log so the final load sheet can be audited.
+
+PAX_CLASSES = ("adults", "children", "infants")
+PAX_WEIGHT_KEYS = {"adults": "PAX_WEIGHT_ADULT", "children": "PAX_WEIGHT_CHILD", "infants": "PAX_WEIGHT_INFANT"}
+
+
+class FlightLoad:
+
+    def __init__(self, tail, pax_zones, bags, fuel, settings):
+        self.tail = tail
+        self.settings = settings
+        self.limits = aircraft_limits(settings, tail)
+        self.pax = {zone: {c: pax_zones.get(zone, {}).get(c, 0) for c in PAX_CLASSES}
+                    for zone in settings["zone_arms"]}
+        self.fuel = fuel
+        self.events = []
+
+        # Everything except bags, then bags planned with the integer optimizer
+        self.total_weight, self.total_moment = base_load(tail, self.pax, fuel, settings)
+        bag_weight = (bags["standard"] * settings["bag_weights"]["standard"]
+                      + bags["heavy"] * settings["bag_weights"]["heavy"])
+        self.total_weight += bag_weight
+        self.total_moment += bag_weight * settings["compartment_arms"]["fwd"]
+        load = optimize_bag_load(bags, self.total_moment, self.total_weight, settings)
+        self.holds = {hold: {"standard": 0, "heavy": 0} for hold in settings["compartment_arms"]}
+        self.holds["fwd"] = {"standard": bags["standard"] - load["std_aft"], "heavy": bags["heavy"] - load["heavy_aft"]}
+        self.holds["aft"] = {"standard": load["std_aft"], "heavy": load["heavy_aft"]}
+        arm_delta = settings["compartment_arms"]["aft"] - settings["compartment_arms"]["fwd"]
+        self.total_moment += load["aft_weight"] * arm_delta
+
+        self._record("plan", tail=tail, pax_zones={zone: dict(c) for zone, c in self.pax.items()},
+                     bags=dict(bags), fuel=fuel)
+
+    @property
+    def zfw(self):
+        return self.total_weight - self.fuel
+
+    @property
+    def cg(self):
+        return self.total_moment / self.total_weight
+
+    def _apply(self, weight, arm):
+        self.total_weight += weight
+        self.total_moment += weight * arm
+
+    def _record(self, event, **details):
+        snapshot = self.state()
+        self.events.append({
+            "seq": len(self.events),
+            "time": time.time(),
+            "event": event,
+            "details": details,
+            "total_weight": snapshot["total_weight"],
+            "cg": snapshot["cg"],
+            "stab": snapshot["stab"],
+            "safe": snapshot["safe"],
+        })
+        return snapshot
+
+    def add_pax(self, zone, pax_class="adults", count=1):
+        # Negative counts remove passengers
+        if self.pax[zone][pax_class] + count < 0:
+            raise ValueError(f"Zone {zone} has only {self.pax[zone][pax_class]} {pax_class}")
+        self.pax[zone][pax_class] += count
+        self._apply(count * self.settings[PAX_WEIGHT_KEYS[pax_class]], self.settings["zone_arms"][zone])
+        return self._record("pax", zone=zone, pax_class=pax_class, count=count)
+
+    def remove_pax(self, zone, pax_class="adults", count=1):
+        return self.add_pax(zone, pax_class, -count)
+
+    def add_bag(self, hold, bag_type="standard", count=1):
+        # Negative counts remove bags
+        if self.holds[hold][bag_type] + count < 0:
+            raise ValueError(f"Hold {hold} has only {self.holds[hold][bag_type]} {bag_type} bags")
+        self.holds[hold][bag_type] += count
+        self._apply(count * self.settings["bag_weights"][bag_type], self.settings["compartment_arms"][hold])
+        return self._record("bag", hold=hold, bag_type=bag_type, count=count)
+
+    def remove_bag(self, hold, bag_type="standard", count=1):
+        return self.add_bag(hold, bag_type, -count)
+
+    def move_bag(self, from_hold, to_hold, bag_type="standard", count=1):
+        if self.holds[from_hold][bag_type] < count:
+            raise ValueError(f"Hold {from_hold} has only {self.holds[from_hold][bag_type]} {bag_type} bags")
+        self.holds[from_hold][bag_type] -= count
+        self.holds[to_hold][bag_type] += count
+        arms = self.settings["compartment_arms"]
+        self.total_moment += count * self.settings["bag_weights"][bag_type] * (arms[to_hold] - arms[from_hold])
+        return self._record("bag_move", from_hold=from_hold, to_hold=to_hold, bag_type=bag_type, count=count)
+
+    def set_fuel(self, fuel):
+        # Loaded fuel sits at its tank-table arm, which moves with the quantity
+        s = self.settings
+        self.total_weight += fuel - self.fuel
+        self.total_moment += (fuel * loaded_fuel_arm(s, self.tail, fuel)
+                              - self.fuel * loaded_fuel_arm(s, self.tail, self.fuel))
+        previous, self.fuel = self.fuel, fuel
+        return self._record("fuel", previous=previous, fuel=fuel)
+
+    def state(self):
+        # Current figures and limit checks; O(1)
+        s = self.settings
+        cg = self.cg
+        zfw = self.zfw
+        landing_weight = self.total_weight - self.fuel * landing_fuel_burn(s)
+        trajectory = fuel_trajectory(s, self.tail, self.total_weight, self.total_moment, self.fuel)
+        checks = check_limits(s, self.tail, zfw, self.total_weight, landing_weight, cg, trajectory)
+        return {
+            "zfw": zfw,
+            "total_weight": self.total_weight,
+            "cg": cg,
+            "stab": lookup_stab(s, cg, self.total_weight),
+            "landing_weight": landing_weight if self.limits[2] else None,
+            "trajectory": trajectory,
+            "checks": checks,
+            "safe": checks["safe"],
+        }
+
+    def lmc_window(self, band=None):
+        # Last-minute-change window for the current load (see clp_lmc)
+        from clp_lmc import LMC_BAND, lmc_window
+        return lmc_window(self.load_sheet(), self.settings, LMC_BAND if band is None else band)
+
+    def load_sheet(self):
+        # Final figures with the current pax/bag/fuel breakdown and audit trail
+        return {
+            "tail": self.tail,
+            "pax": {zone: dict(counts) for zone, counts in self.pax.items()},
+            "holds": {hold: dict(counts) for hold, counts in self.holds.items()},
+            "fuel": self.fuel,
+            **self.state(),
+            "events": list(self.events),
+        }
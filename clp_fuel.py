@@ -0,0 +1,194 @@
+import math
+
+from clp_tables import in_envelope, in_envelope_batch, tables_for
+
+# Fuel tanks and phase-based fuel burn.
+#
+#   settings["fuel_tanks"] = {"wing": {"arm": 68.5, "capacity": 14000.0}, ...}
+#       tanks in fill order; fuel is burned in reverse (last filled, first used).
+#       A tail may carry its own "fuel_tanks" in aircraft_data.
+#   settings["fuel_burn"] = {"taxi": 0.03125, "climb": 0.15625, ...}
+#       fraction of the loaded fuel burned in each phase, in flight order; what
+#       is left after the last phase is the reserve at landing.
+#
+# Because burn order is the reverse of fill order, the fuel still on board is
+# always distributed exactly as if only that much had been loaded, so the
+# moment of any fuel quantity is one lookup in a per-tail table of
+# "moment of F lbs loaded in tank order". compile_tank_tables samples that
+# piecewise-linear curve on a regular fuel grid shared by every tail (beyond a
+# tail's capacity it continues at the last tank's arm), storing each grid
+# point's moment and the slope to the next, so a lookup is index arithmetic
+# plus one multiply-add.
+#
+# The takeoff CG books the loaded fuel at its tank-table arm (loaded_fuel_arm),
+# and a trajectory point takes out the moment of the fuel burned so far (tank
+# moment of the loaded fuel minus that of the fuel left), so the ramp point is
+# exactly the takeoff CG and every CG uses the tank arms. settings["fuel_arm"]
+# only places the fuel in the aircraft diagram.
+# The scalar and *_batch functions apply the same formulas and give identical results.
+
+FUEL_STEP = 100.0  # lbs between tank table grid points
+
+_cache = {}
+
+
+def landing_fuel_burn(settings):
+    # Fraction of the loaded fuel burned before landing
+    return sum(settings["fuel_burn"].values())
+
+
+def _tank_curve(tanks):
+    # Breakpoints (fuel, moment) of fuel loaded in tank order, plus the last arm
+    fuels, moments = [0.0], [0.0]
+    for tank in tanks.values():
+        fuels.append(fuels[-1] + tank["capacity"])
+        moments.append(moments[-1] + tank["capacity"] * tank["arm"])
+    return fuels, moments, list(tanks.values())[-1]["arm"]
+
+
+def _curve_moment(curve, fuel):
+    fuels, moments, last_arm = curve
+    if fuel >= fuels[-1]:
+        return moments[-1] + (fuel - fuels[-1]) * last_arm
+    k = 0
+    while fuels[k + 1] < fuel:
+        k += 1
+    t = (fuel - fuels[k]) / (fuels[k + 1] - fuels[k])
+    return moments[k] + (moments[k + 1] - moments[k]) * t
+
+
+def compile_tank_tables(settings):
+    tails = list(settings["aircraft_data"])
+    curves = [_tank_curve(settings["aircraft_data"][tail].get("fuel_tanks") or settings["fuel_tanks"])
+              for tail in tails]
+    capacity = max(curve[0][-1] for curve in curves)
+    n = int(math.ceil(capacity / FUEL_STEP)) + 1
+    moments = [[_curve_moment(curve, g * FUEL_STEP) for g in range(n)] for curve in curves]
+    # Slope per grid cell (moment per step); past the last point, the last tank's arm
+    slopes = [[row[g + 1] - row[g] for g in range(n - 1)] + [curve[2] * FUEL_STEP]
+              for row, curve in zip(moments, curves)]
+    return {
+        "index": {tail: k for k, tail in enumerate(tails)},
+        "step": FUEL_STEP,
+        "n": n,
+        "moments": moments,
+        "slopes": slopes,
+    }
+
+
+def tank_tables_for(settings):
+    # Compiled tank tables for these settings, rebuilt only when tanks change
+    key = repr((settings["fuel_tanks"],
+                [(tail, data.get("fuel_tanks")) for tail, data in settings["aircraft_data"].items()]))
+    tables = _cache.get(key)
+    if tables is None:
+        if len(_cache) > 32:
+            _cache.clear()
+        tables = _cache[key] = compile_tank_tables(settings)
+    return tables
+
+
+def fuel_capacity(settings, tail):
+    # Total capacity of the tail's tanks (lbs)
+    tanks = settings["aircraft_data"][tail].get("fuel_tanks") or settings["fuel_tanks"]
+    return sum(tank["capacity"] for tank in tanks.values())
+
+
+def tank_moment(tables, k, fuel):
+    # Moment of `fuel` lbs in tail k's tanks
+    f = max(fuel, 0.0) / tables["step"]
+    i = min(int(f), tables["n"] - 1)
+    return tables["moments"][k][i] + tables["slopes"][k][i] * (f - i)
+
+
+def loaded_fuel_arm(settings, tail, fuel):
+    # Arm of `fuel` lbs loaded in the tail's tanks (tank moment / fuel); 0 with no fuel
+    tables = tank_tables_for(settings)
+    moment = tank_moment(tables, tables["index"][tail], fuel)
+    return moment / fuel if fuel else 0.0
+
+
+def burn_schedule(settings):
+    # [(point, cumulative fraction burned)]: ramp, then the end of each phase
+    schedule = [("ramp", 0.0)]
+    burned = 0.0
+    for phase, fraction in settings["fuel_burn"].items():
+        burned = burned + fraction
+        schedule.append((phase, burned))
+    return schedule
+
+
+def fuel_trajectory(settings, tail, total_weight, total_moment, fuel):
+    # Weight and CG at the ramp and at the end of each burn phase, each
+    # checked against the CG envelope at that weight
+    tables = tank_tables_for(settings)
+    envelope = tables_for(settings)
+    k = tables["index"][tail]
+    loaded = tank_moment(tables, k, fuel)
+    points = []
+    for phase, burned in burn_schedule(settings):
+        remaining = fuel - fuel * burned
+        weight = total_weight - fuel * burned
+        # Less the moment of the fuel burned so far, out of the tanks it came from
+        cg = (total_moment - (loaded - tank_moment(tables, k, remaining))) / weight
+        points.append({"phase": phase, "fuel": remaining, "weight": weight, "cg": cg,
+                       "in_envelope": in_envelope(envelope, cg, weight)})
+    return points
+
+
+# Vectorized trajectories
+
+
+def _arrays(tables):
+    arrays = tables.get("_arrays")
+    if arrays is None:
+        import numpy as np
+        # Flattened so a lookup is a single gather at tail * n + cell
+        arrays = tables["_arrays"] = {"moments": np.array(tables["moments"]).ravel(),
+                                      "slopes": np.array(tables["slopes"]).ravel()}
+    return arrays
+
+
+def tank_moment_batch(tables, tail_k, fuel):
+    # tank_moment for arrays; tail_k indexes the settings' aircraft_data order.
+    # The cell index is clamped before the integer cast, so huge fuel values
+    # extrapolate at the last arm and NaN fuel gives a NaN moment
+    import numpy as np
+    arrays = _arrays(tables)
+    f = np.maximum(fuel, 0.0) / tables["step"]
+    i = np.fmin(f, tables["n"] - 1).astype(np.int64)
+    cell = tail_k * tables["n"] + i
+    return arrays["moments"][cell] + arrays["slopes"][cell] * (f - i)
+
+
+def tank_moments_batch(settings, tail_idx, fuel, tails=None):
+    # Tank moment of the fuel left at each burn_schedule point, shape
+    # (flights, points); the first column (ramp) is the loaded fuel's moment.
+    # Depends only on tail and fuel, so callers evaluating the same flights
+    # many times (clp_sweep) can compute it once
+    import numpy as np
+    tables = tank_tables_for(settings)
+    tail_k = np.asarray(tail_idx, dtype=np.int64)
+    if tails is not None:
+        # Map the caller's tail order onto the compiled (aircraft_data) order
+        tail_k = np.array([tables["index"][tail] for tail in tails], dtype=np.int64)[tail_k]
+    fuel = np.asarray(fuel, dtype=float)[:, None]
+    burned = np.array([b for _, b in burn_schedule(settings)])
+    return tank_moment_batch(tables, tail_k[:, None], fuel - fuel * burned)
+
+
+def fuel_trajectory_batch(settings, tail_idx, total_weight, total_moment, fuel, tails=None, tank_moments=None):
+    # Columns of shape (flights, points) for the points in burn_schedule:
+    # fuel, weight, cg and in_envelope, plus ok (every point in the envelope).
+    # tank_moments: tank_moments_batch for these flights, if already known
+    import numpy as np
+    if tank_moments is None:
+        tank_moments = tank_moments_batch(settings, tail_idx, fuel, tails)
+    fuel = np.asarray(fuel, dtype=float)[:, None]
+    burned = np.array([b for _, b in burn_schedule(settings)])
+
+    remaining = fuel - fuel * burned
+    weight = total_weight[:, None] - fuel * burned
+    cg = (total_moment[:, None] - (tank_moments[:, :1] - tank_moments)) / weight
+    ok = in_envelope_batch(tables_for(settings), cg, weight)
+    return {"fuel": remaining, "weight": weight, "cg": cg, "in_envelope": ok, "ok": ok.all(axis=1)}
@@ -0,0 +1,181 @@
+import numpy as np
+
+from clp_core import base_load
+from clp_tables import in_envelope, tables_for
+
+# Multi-compartment cargo and bulk-hold allocation.
+#
+# Bags and cargo pieces are assigned to N compartments so the aircraft CG lands
+# as close to target_cg as possible while every compartment stays within its
+# weight cap, running-load cap and ULD position count. Compartments come from
+# settings["compartment_arms"] and settings["compartment_limits"].
+#
+# The solver places pieces heaviest-first, steering the running moment toward
+# the target, then improves the result with best-improvement single moves and
+# pairwise swaps evaluated as NumPy arrays.
+
+PIECE_KINDS = ("bag", "bulk", "uld")
+
+
+def compartment_table(settings, compartments=None):
+    # Compile compartment definitions into arrays
+    if compartments is None:
+        compartments = list(settings["compartment_arms"].keys())
+    limits = settings["compartment_limits"]
+
+    arms = np.array([settings["compartment_arms"][c] for c in compartments], dtype=float)
+    caps = np.empty(len(compartments))
+    uld_positions = np.empty(len(compartments))
+    accepts = np.zeros((len(PIECE_KINDS), len(compartments)), dtype=bool)
+    for j, name in enumerate(compartments):
+        limit = limits[name]
+        caps[j] = min(limit["max_weight"], limit["max_running_load"] * limit["length"])
+        uld_positions[j] = limit.get("uld_positions", 0)
+        for k, kind in enumerate(PIECE_KINDS):
+            accepts[k, j] = kind in limit["accepts"] or (kind == "uld" and uld_positions[j] > 0)
+
+    return {"names": compartments, "arms": arms, "caps": caps,
+            "uld_positions": uld_positions, "accepts": accepts}
+
+
+def pieces_from_bags(bags, settings):
+    # Expand standard/heavy bag counts into individual pieces
+    pieces = []
+    for bag_type in ("heavy", "standard"):
+        for _ in range(int(bags[bag_type])):
+            pieces.append({"weight": settings["bag_weights"][bag_type], "kind": "bag"})
+    return pieces
+
+
+def _greedy_place(weights, kinds, table, target_moment):
+    # Heaviest first; each piece goes where the cumulative moment best tracks
+    # the target moment pro-rated by the weight placed so far
+    arms = table["arms"]
+    remaining = table["caps"].copy()
+    uld_free = table["uld_positions"].copy()
+    assignment = np.full(weights.shape[0], -1)
+
+    total = weights.sum()
+    placed_weight = 0.0
+    placed_moment = 0.0
+    for i in np.argsort(-weights, kind="stable"):
+        w = weights[i]
+        ok = table["accepts"][kinds[i]] & (remaining >= w)
+        if kinds[i] == PIECE_KINDS.index("uld"):
+            ok &= uld_free > 0
+        if not ok.any():
+            continue
+        goal = target_moment * (placed_weight + w) / total
+        miss = np.where(ok, np.abs(placed_moment + w * arms - goal), np.inf)
+        j = int(np.argmin(miss))
+        assignment[i] = j
+        remaining[j] -= w
+        if kinds[i] == PIECE_KINDS.index("uld"):
+            uld_free[j] -= 1
+        placed_weight += w
+        placed_moment += w * arms[j]
+    return assignment
+
+
+def _improve(weights, kinds, assignment, table, target_moment, tolerance, max_iterations):
+    arms = table["arms"]
+    caps = table["caps"]
+    n_comp = arms.shape[0]
+    is_uld = kinds == PIECE_KINDS.index("uld")
+    compat = table["accepts"][kinds]  # (pieces, compartments)
+    placed = assignment >= 0
+    idx = np.flatnonzero(placed)
+    w = weights[idx]
+    uld = is_uld[idx]
+    comp_ok = compat[idx]
+    a = assignment[idx].copy()
+
+    for _ in range(max_iterations):
+        loads = np.bincount(a, weights=w, minlength=n_comp)
+        uld_used = np.bincount(a, weights=uld.astype(float), minlength=n_comp)
+        err = float(np.dot(w, arms[a])) - target_moment
+        if abs(err) <= tolerance:
+            break
+
+        # Single moves: piece i to compartment c
+        move_delta = w[:, None] * (arms[None, :] - arms[a][:, None])
+        move_ok = (comp_ok & (loads[None, :] + w[:, None] <= caps[None, :])
+                   & (np.arange(n_comp)[None, :] != a[:, None]))
+        move_ok &= ~uld[:, None] | (uld_used < table["uld_positions"])[None, :]
+        move_err = np.where(move_ok, np.abs(err + move_delta), np.inf)
+        mi, mc = np.unravel_index(np.argmin(move_err), move_err.shape)
+        best_move = move_err[mi, mc]
+
+        # Pairwise swaps between one representative piece per
+        # (compartment, weight, kind) group; identical pieces swap to no effect
+        _, reps = np.unique(np.stack([a, w, uld]), axis=1, return_index=True)
+        rw, ra, ru = w[reps], a[reps], uld[reps]
+        swap_delta = (rw[:, None] - rw[None, :]) * (arms[ra][None, :] - arms[ra][:, None])
+        uld_shift = ru[:, None].astype(int) - ru[None, :].astype(int)
+        swap_ok = (comp_ok[reps][:, ra] & comp_ok[reps][:, ra].T
+                   & (ra[:, None] != ra[None, :])
+                   & (loads[ra][None, :] - rw[None, :] + rw[:, None] <= caps[ra][None, :])
+                   & (loads[ra][:, None] - rw[:, None] + rw[None, :] <= caps[ra][:, None])
+                   & (uld_used[ra][None, :] + uld_shift <= table["uld_positions"][ra][None, :])
+                   & (uld_used[ra][:, None] - uld_shift <= table["uld_positions"][ra][:, None]))
+        swap_err = np.where(swap_ok, np.abs(err + swap_delta), np.inf)
+        si, sj = np.unravel_index(np.argmin(swap_err), swap_err.shape)
+        best_swap = swap_err[si, sj]
+
+        if min(best_move, best_swap) >= abs(err):
+            break
+        if best_move <= best_swap:
+            a[mi] = mc
+        else:
+            i, j = reps[si], reps[sj]
+            a[i], a[j] = a[j], a[i]
+
+    assignment = assignment.copy()
+    assignment[idx] = a
+    return assignment
+
+
+def solve_hold_allocation(pieces, base_weight, base_moment, settings, compartments=None,
+                          max_iterations=500):
+    # pieces: list of {"weight": lbs, "kind": "bag" | "bulk" | "uld"}
+    # base_weight / base_moment: everything else on board (see clp_core.base_load)
+    table = compartment_table(settings, compartments)
+    weights = np.array([p["weight"] for p in pieces], dtype=float)
+    kinds = np.array([PIECE_KINDS.index(p.get("kind", "bag")) for p in pieces], dtype=np.int64)
+
+    total_weight = base_weight + weights.sum()
+    # Moment the pieces should contribute for the CG to sit on target
+    target_moment = settings["target_cg"] * total_weight - base_moment
+    # Stop once the CG is within a thousandth of a foot of target
+    tolerance = 0.001 * total_weight
+
+    assignment = _greedy_place(weights, kinds, table, target_moment)
+    if weights.shape[0]:
+        assignment = _improve(weights, kinds, assignment, table, target_moment,
+                              tolerance, max_iterations)
+
+    placed = assignment >= 0
+    n_comp = len(table["names"])
+    loads = np.bincount(assignment[placed], weights=weights[placed], minlength=n_comp)
+    counts = np.bincount(assignment[placed], minlength=n_comp)
+    # Unplaced pieces are offloaded and do not count toward weight or CG
+    loaded_weight = base_weight + float(weights[placed].sum())
+    cg = (base_moment + float(np.dot(loads, table["arms"]))) / loaded_weight
+
+    return {
+        "assignment": [table["names"][j] if j >= 0 else None for j in assignment],
+        "loads": dict(zip(table["names"], loads.tolist())),
+        "pieces": dict(zip(table["names"], counts.tolist())),
+        "unplaced": int((~placed).sum()),
+        "total_weight": loaded_weight,
+        "cg": cg,
+        "cg_ok": bool(in_envelope(tables_for(settings), cg, loaded_weight)),
+        "feasible": bool(placed.all()),
+    }
+
+
+def solve_flight_holds(tail, pax_zones, bags, fuel, settings, cargo=(), compartments=None):
+    # Allocate a flight's bags plus any extra cargo pieces
+    base_weight, base_moment = base_load(tail, pax_zones, fuel, settings)
+    pieces = pieces_from_bags(bags, settings) + list(cargo)
+    return solve_hold_allocation(pieces, base_weight, base_moment, settings, compartments)
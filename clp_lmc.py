@@ -0,0 +1,208 @@
+import math
+
+from clp_core import aircraft_limits, base_load, landing_fuel_burn
+from clp_fuel import burn_schedule, tank_moment, tank_tables_for
+from clp_holds import compartment_table
+from clp_seats import zone_capacity
+from clp_tables import envelope_limits, tables_for
+
+# Last-minute-change (LMC) tolerance windows.
+#
+# Once a load sheet is issued, every late change is a count of some item:
+# passengers of one class in one zone, or bags of one type in one hold. Each
+# item has a fixed weight and arm, so any set of changes moves the flight by
+# (dW, dM) = sum(count x weight, count x weight x arm). Every limit that
+# decides whether the sheet must be reissued is linear in (dW, dM):
+#   MTOW, ZFW, landing     dW <= limit - current
+#   CG at takeoff          fwd (W + dW) <= M + dM <= aft (W + dW), the CG
+#                          also within the stab trim table's CG range
+#   CG at every fuel point fwd_k (W_k + dW) <= M_k + dM <= aft_k (W_k + dW)
+#                          for the ramp and the end of each burn phase
+#   LMC band               |dW| <= band
+# plus per-group sums: hold weight caps and free seats per zone.
+#
+# The envelope limits depend on weight, so over the band they are replaced by
+# their tightest values (most aft forward limit, most forward aft limit). With
+# the flat CG_MIN/CG_MAX limits this is exact; with a sloped envelope the
+# window is conservative and never accepts a change calculate_wab would
+# reject. The fuel burned before each point doesn't depend on the payload, so
+# the in-flight rows are exact.
+#
+# LMCWindow stores those rows as (a, b, c) with a dW + b dM <= c. check() is a
+# few multiply-adds per row, a handful of microseconds in pure Python.
+# max_add/max_remove give, per item, the largest change of that item alone
+# that stays inside.
+
+LMC_BAND = 2000.0  # lbs of payload change covered without reissuing (mock)
+PAX_CLASSES = ("adults", "children", "infants")
+PAX_WEIGHT_KEYS = {"adults": "PAX_WEIGHT_ADULT", "children": "PAX_WEIGHT_CHILD", "infants": "PAX_WEIGHT_INFANT"}
+BAG_TYPES = ("standard", "heavy")
+EPSILON = 1e-9  # lbs / lb-ft of slack so exact-boundary changes count as inside
+
+
+def _tightest_limits(tables, w_lo, w_hi):
+    # Most aft forward limit and most forward aft limit over [w_lo, w_hi]:
+    # the band ends plus every envelope grid point between them
+    env = tables["envelope"]
+    weights = [w_lo, w_hi] + [env["w0"] + k * env["w_step"] for k in range(env["n_w"])
+                              if w_lo < env["w0"] + k * env["w_step"] < w_hi]
+    limits = [envelope_limits(tables, w) for w in weights]
+    return max(fwd for fwd, _ in limits), min(aft for _, aft in limits)
+
+
+class LMCWindow:
+
+    def __init__(self, tail, pax_zones, holds, fuel, settings, band=LMC_BAND):
+        # pax_zones: {zone: {class: count}}; holds: {hold: {bag type: count}},
+        # as in FlightLoad.load_sheet()
+        s = settings
+        self.tail = tail
+        self.band = band
+        zones = list(s["zone_arms"])
+        hold_names = list(s["compartment_arms"])
+
+        # Items, their weight and moment per unit, and current counts
+        self.items = []
+        self.weights = []
+        self.moments = []
+        self.booked = []
+        self._groups = []  # per item: (hold or seat group, weight or seats per unit)
+        for zone in zones:
+            for pax_class in PAX_CLASSES:
+                weight = s[PAX_WEIGHT_KEYS[pax_class]]
+                self.items.append(f"{zone}.{pax_class}")
+                self.weights.append(weight)
+                self.moments.append(weight * s["zone_arms"][zone])
+                self.booked.append(pax_zones.get(zone, {}).get(pax_class, 0))
+                # Lap infants don't take a seat
+                self._groups.append((f"seats.{zone}", 0 if pax_class == "infants" else 1))
+        for hold in hold_names:
+            for bag_type in BAG_TYPES:
+                weight = s["bag_weights"][bag_type]
+                self.items.append(f"{hold}.{bag_type}")
+                self.weights.append(weight)
+                self.moments.append(weight * s["compartment_arms"][hold])
+                self.booked.append(holds.get(hold, {}).get(bag_type, 0))
+                self._groups.append((f"hold.{hold}", weight))
+        self.index = {item: i for i, item in enumerate(self.items)}
+
+        # Current state
+        weight, moment = base_load(tail, pax_zones, fuel, s)
+        for hold, counts in holds.items():
+            for bag_type, count in counts.items():
+                weight += count * s["bag_weights"][bag_type]
+                moment += count * s["bag_weights"][bag_type] * s["compartment_arms"][hold]
+        zfw = weight - fuel
+        self.total_weight = weight
+        self.cg = moment / weight
+
+        rows = [("band_add", 1.0, 0.0, band), ("band_remove", -1.0, 0.0, band)]
+        mtow_limit, zfw_limit, landing_limit = aircraft_limits(s, tail)
+        rows.append(("mtow", 1.0, 0.0, mtow_limit - weight))
+        if zfw_limit:
+            rows.append(("zfw", 1.0, 0.0, zfw_limit - zfw))
+        if landing_limit:
+            rows.append(("landing", 1.0, 0.0, landing_limit - (weight - fuel * landing_fuel_burn(s))))
+
+        # CG rows at takeoff, as calculate_wab checks it (envelope and stab
+        # trim range), then at the ramp and after each burn phase (see clp_fuel)
+        tables = tables_for(s)
+        tanks = tank_tables_for(s)
+        k = tanks["index"][tail]
+        loaded = tank_moment(tanks, k, fuel)
+        stab_lo, stab_hi = tables["stab"][tables["default_flap"]]["cg_range"]
+        fwd, aft = _tightest_limits(tables, weight - band, weight + band)
+        fwd, aft = max(fwd, stab_lo), min(aft, stab_hi)
+        rows.append(("cg_fwd.takeoff", fwd, -1.0, moment - fwd * weight))
+        rows.append(("cg_aft.takeoff", -aft, 1.0, aft * weight - moment))
+        for phase, burned in burn_schedule(s):
+            w_k = weight - fuel * burned
+            m_k = moment - (loaded - tank_moment(tanks, k, fuel - fuel * burned))
+            fwd, aft = _tightest_limits(tables, w_k - band, w_k + band)
+            rows.append((f"cg_fwd.{phase}", fwd, -1.0, m_k - fwd * w_k))
+            rows.append((f"cg_aft.{phase}", -aft, 1.0, aft * w_k - m_k))
+        self.rows = rows
+
+        # Group rows: remaining hold capacity (lbs) and free seats; a group
+        # already over its cap just takes no more
+        caps = compartment_table(s, hold_names)["caps"]
+        capacity = zone_capacity(s)
+        self.group_room = {}
+        for j, hold in enumerate(hold_names):
+            used = sum(holds.get(hold, {}).get(t, 0) * s["bag_weights"][t] for t in BAG_TYPES)
+            self.group_room[f"hold.{hold}"] = max(float(caps[j]) - used, 0.0)
+        for j, zone in enumerate(zones):
+            seated = pax_zones.get(zone, {}).get("adults", 0) + pax_zones.get(zone, {}).get("children", 0)
+            self.group_room[f"seats.{zone}"] = max(float(capacity[j]) - seated, 0.0)
+
+        # An issued sheet outside its limits has no window
+        self.valid = all(c >= -EPSILON for _, _, _, c in rows)
+        self.max_add = {}
+        self.max_remove = {}
+        for i, item in enumerate(self.items):
+            self.max_add[item] = self._single_item_limit(i, 1)
+            self.max_remove[item] = min(self.booked[i], self._single_item_limit(i, -1))
+
+    def _single_item_limit(self, i, sign):
+        # Largest count of item i alone (added for sign 1, removed for -1)
+        if not self.valid:
+            return 0
+        w, m = sign * self.weights[i], sign * self.moments[i]
+        limit = math.inf
+        for _, a, b, c in self.rows:
+            coef = a * w + b * m
+            if coef > 0:
+                limit = min(limit, (c + EPSILON) / coef)
+        group, per_unit = self._groups[i]
+        if sign * per_unit > 0:
+            limit = min(limit, (self.group_room[group] + EPSILON) / per_unit)
+        return int(limit) if limit != math.inf else None
+
+    def _deltas(self, changes):
+        dw = dm = 0.0
+        groups = {}
+        for item, count in changes.items():
+            i = self.index[item]
+            if self.booked[i] + count < 0:
+                return None
+            dw += count * self.weights[i]
+            dm += count * self.moments[i]
+            group, per_unit = self._groups[i]
+            groups[group] = groups.get(group, 0.0) + count * per_unit
+        return dw, dm, groups
+
+    def check(self, changes):
+        # True if {item: count} (negative to remove) stays inside the window
+        deltas = self._deltas(changes)
+        if deltas is None or not self.valid:
+            return False
+        dw, dm, groups = deltas
+        for _, a, b, c in self.rows:
+            if a * dw + b * dm > c + EPSILON:
+                return False
+        for group, used in groups.items():
+            if used > self.group_room[group] + EPSILON:
+                return False
+        return True
+
+    def violations(self, changes):
+        # Names of the constraints {item: count} crosses ("booked" when it
+        # removes more items than are on board)
+        deltas = self._deltas(changes)
+        if deltas is None:
+            return ["booked"]
+        dw, dm, groups = deltas
+        out = [name for name, a, b, c in self.rows if a * dw + b * dm > c + EPSILON]
+        out += [group for group, used in groups.items() if used > self.group_room[group] + EPSILON]
+        return out
+
+    def summary(self):
+        # Per-item maximum additions and removals, for display with the load sheet
+        return {"tail": self.tail, "valid": self.valid, "band": self.band,
+                "max_add": dict(self.max_add), "max_remove": dict(self.max_remove)}
+
+
+def lmc_window(load_sheet, settings, band=LMC_BAND):
+    # Window for a finalized FlightLoad.load_sheet()
+    return LMCWindow(load_sheet["tail"], load_sheet["pax"], load_sheet["holds"], load_sheet["fuel"],
+                     settings, band)
@@ -0,0 +1,465 @@
+import argparse
+import math
+import os
+import re
+import string
+import sys
+import textwrap
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from clp_core import check_limits, fuel_trajectory, landing_fuel_burn, settings_version
+from clp_perf import flap_key, performance_for
+from clp_registry import tail_record
+from clp_tables import envelope_limits, tables_for
+
+# Load-sheet documents: PDF and ACARS-style plain text.
+#
+#   python clp_loadsheet.py flights.csv -o sheets.zip --workers 4
+#   python clp_loadsheet.py results.csv -o sheets/ --format acars
+#
+# A sheet is built from one flight row in clp_cli's result format (input
+# columns plus RESULT_COLUMNS and the per-hold bag counts). Input flights are
+# replanned first; a file that already has the result columns is used as is.
+#
+# Both formats come from line templates using str.format fields (see
+# sheet_fields for the names). LoadSheetTemplate expands them once per
+# settings: a line containing %ZONE% or %HOLD% is repeated for every cabin
+# zone or hold (the marker becomes the padded name, {%ZONE%_...} fields the
+# zone's fields), and a line starting with "?perf " is kept only for flights
+# with takeoff conditions. The PDF's fixed objects (catalog, page, fonts) and
+# the static page graphics are serialized once with their xref offsets, so a
+# sheet costs one str.format, the text stream and the trailer.
+#
+# Bulk mode renders chunks of flights across a process pool (the template is
+# compiled once per worker) and streams the documents, in input order, into a
+# directory or a zip file as chunks complete.
+
+FORMATS = ("pdf", "acars")
+ACARS_WIDTH = 40  # characters per ACARS printer line; longer lines wrap
+ACARS_INDENT = "  "  # prefix of a wrapped line's continuation lines
+
+LOADSHEET_LINES = (
+    "LOADSHEET  {status:<10}                                  EDNO {edition}",
+    "",
+    "FLIGHT {flight:<10}  REG {tail:<10}  TYPE {type:<10}  DATE {date}",
+    "ISSUED {issued:<20}  SETTINGS {version}",
+    "-" * 74,
+    "PASSENGERS        ADULTS  CHILDREN   INFANTS     TOTAL",
+    "  ZONE %ZONE%{%ZONE%_adults:>13}  {%ZONE%_children:>8}  {%ZONE%_infants:>8}  {%ZONE%_total:>8}",
+    "  TOTAL{pax_adults:>17}  {pax_children:>8}  {pax_infants:>8}  {pax_total:>8}",
+    "",
+    "HOLDS           STANDARD     HEAVY    WEIGHT",
+    "  %HOLD%{%HOLD%_standard:>18}  {%HOLD%_heavy:>8}  {%HOLD%_weight:>8}",
+    "  TOTAL{bags_standard:>17}  {bags_heavy:>8}  {bags_weight:>8}",
+    "-" * 74,
+    "                        ACTUAL       MAX",
+    "DRY OPERATING WEIGHT  {dow:>8}",
+    "ZERO FUEL WEIGHT      {zfw:>8}  {max_zfw:>8}",
+    "TAKEOFF FUEL          {fuel:>8}",
+    "TAKEOFF WEIGHT        {tow:>8}  {max_tow:>8}",
+    "BURN TO LANDING       {burn:>8}",
+    "LANDING WEIGHT        {law:>8}  {max_law:>8}",
+    "",
+    "ALLOWED TAKEOFF WEIGHT {allowed_tow:>7}  LIMITED BY {limited_by}",
+    "UNDERLOAD BEFORE LMC  {underload:>8}",
+    "-" * 74,
+    "TAKEOFF CG (FT)       {cg:>8}  LIMITS {cg_fwd} - {cg_aft}",
+    "STAB TRIM             {stab:>8}",
+    "?perf -" + "-" * 73,
+    "?perf TAKEOFF   RWY {runway_length} FT  OAT {oat} C  PA {pressure_altitude} FT  FLAP {flap}",
+    "?perf PERF LIMITED TOW {tow_limit:>7}  REQUIRED RUNWAY {required_runway} FT",
+    "-" * 74,
+    "{limits}",
+)
+
+ACARS_LINES = (
+    "LOADSHEET {status} EDNO {edition}",
+    "{flight} {tail} {date}",
+    "ZFW {zfw:>7} MAX {max_zfw:>7}",
+    "TOF {fuel:>7}",
+    "TOW {tow:>7} MAX {max_tow:>7}",
+    "BRN {burn:>7}",
+    "LAW {law:>7} MAX {max_law:>7}",
+    "UNDLD {underload} LIM {limited_by}",
+    "PAX {pax_adults}/{pax_children}/{pax_infants} TTL {pax_total}",
+    "ZONE %ZONE%{%ZONE%_total:>4}",
+    "HOLD %HOLD%{%HOLD%_weight:>6}",
+    "CG {cg} LIM {cg_fwd}-{cg_aft}",
+    "STAB {stab}",
+    "?perf RWY {runway_length} OAT {oat} PA {pressure_altitude}",
+    "?perf FLAP {flap} PERF TOW {tow_limit}",
+    "?perf RWY REQ {required_runway}",
+    "{limits}",
+    "END",
+)
+
+CHECK_LABELS = {"mtow_ok": "MTOW", "zfw_ok": "MZFW", "landing_ok": "MLW", "cg_ok": "CG", "stab_ok": "STAB",
+                "trajectory_ok": "INFLIGHT CG", "takeoff_ok": "TAKEOFF PERF"}
+
+
+def _whole(value):
+    return "-----" if value is None or value != value else f"{value:.0f}"
+
+
+def sheet_fields(row, settings, issued="", status="FINAL"):
+    # Formatted template fields for one flight row (clp_cli result format)
+    tail = row["tail"]
+    record = tail_record(settings, tail)
+    tables = tables_for(settings)
+    fuel = float(row["fuel"])
+    tow = float(row["total_weight"])
+    cg = float(row["cg"])
+    burn = fuel * landing_fuel_burn(settings)
+    law = tow - burn
+    cg_fwd, cg_aft = envelope_limits(tables, tow)
+
+    fields = {
+        "status": status,
+        "edition": row.get("edition", 1),
+        "flight": row.get("flight", "") or "",
+        "tail": tail,
+        "type": record.type,
+        "date": row.get("date", "") or "",
+        "issued": issued,
+        "version": settings_version(settings),
+        "dow": _whole(record.oew),
+        "zfw": _whole(row["zfw"]),
+        "max_zfw": _whole(record.zfw_limit),
+        "fuel": _whole(fuel),
+        "tow": _whole(tow),
+        "burn": _whole(burn),
+        "law": _whole(law),
+        "max_law": _whole(record.landing_limit),
+        "cg": f"{cg:.2f}",
+        "cg_fwd": f"{cg_fwd:.2f}",
+        "cg_aft": f"{cg_aft:.2f}",
+        "stab": f"{float(row['stab']):+.1f}",
+    }
+
+    totals = {"adults": 0, "children": 0, "infants": 0}
+    for zone in settings["zone_arms"]:
+        zone_total = 0
+        for pax_class in totals:
+            count = int(row.get(f"{zone}_{pax_class}", 0) or 0)
+            fields[f"{zone}_{pax_class}"] = count
+            totals[pax_class] += count
+            zone_total += count
+        fields[f"{zone}_total"] = zone_total
+    for pax_class, count in totals.items():
+        fields[f"pax_{pax_class}"] = count
+    fields["pax_total"] = sum(totals.values())
+
+    bag_weights = settings["bag_weights"]
+    hold_limits = settings.get("compartment_limits", {})
+    over_cap = []
+    bags = {"standard": 0, "heavy": 0, "weight": 0.0}
+    for hold in settings["compartment_arms"]:
+        counts = {bag_type: int(row.get(f"{hold}_{bag_type}", 0) or 0) for bag_type in ("standard", "heavy")}
+        weight = sum(count * bag_weights[bag_type] for bag_type, count in counts.items())
+        fields[f"{hold}_standard"], fields[f"{hold}_heavy"] = counts["standard"], counts["heavy"]
+        fields[f"{hold}_weight"] = _whole(weight)
+        # Same effective cap as clp_holds: the lower of the weight and running-load limits
+        limit = hold_limits.get(hold)
+        if limit and weight > min(limit["max_weight"], limit["max_running_load"] * limit["length"]):
+            over_cap.append(f"{hold.upper()} HOLD")
+        bags["standard"] += counts["standard"]
+        bags["heavy"] += counts["heavy"]
+        bags["weight"] += weight
+    fields["bags_standard"], fields["bags_heavy"] = bags["standard"], bags["heavy"]
+    fields["bags_weight"] = _whole(bags["weight"])
+
+    # Allowed TOW is the lowest of the takeoff, ZFW + fuel and landing + burn
+    # limits; the underload is what is left of it for last-minute changes
+    performance = None
+    max_tow = record.mtow_limit
+    candidates = [(record.mtow_limit, "MTOW")]
+    if _has_takeoff(row):
+        tow_limit = float(row["tow_limit"])
+        performance = {"takeoff_ok": bool(row["takeoff_ok"])}
+        max_tow = min(max_tow, tow_limit)
+        candidates.append((tow_limit, "TAKEOFF PERF"))
+        required = float(row["required_runway"])
+        flap = row.get("flap")
+        fields.update({
+            "runway_length": _whole(float(row["runway_length"])),
+            "oat": f"{float(row['oat']):.0f}",
+            "pressure_altitude": _whole(float(row["pressure_altitude"])),
+            "flap": flap_key(flap) if flap not in (None, "") and flap == flap
+                    else performance_for(settings)["default_flap"],
+            "tow_limit": _whole(tow_limit),
+            "required_runway": _whole(required) if math.isfinite(required) else "BEYOND TABLE",
+        })
+    if record.zfw_limit:
+        candidates.append((record.zfw_limit + fuel, "MZFW"))
+    if record.landing_limit:
+        candidates.append((record.landing_limit + burn, "MLW"))
+    allowed, limited_by = min(candidates, key=lambda c: c[0])
+    fields["max_tow"] = _whole(max_tow)
+    fields["allowed_tow"] = _whole(allowed)
+    fields["limited_by"] = limited_by
+    fields["underload"] = _whole(allowed - tow)
+
+    trajectory = fuel_trajectory(settings, tail, tow, cg * tow, fuel)
+    checks = check_limits(settings, tail, float(row["zfw"]), tow, law, cg, trajectory, performance)
+    failed = [label for key, label in CHECK_LABELS.items() if checks.get(key) is False] + over_cap
+    fields["limits"] = "LIMITS EXCEEDED: " + ", ".join(failed) if failed else "ALL LIMITS WITHIN RANGE"
+    return fields
+
+
+def row_from_result(tail, pax_zones, fuel, result, conditions=None, flight=""):
+    # Sheet row for one calculate_wab result (the app's single flight)
+    row = {"tail": tail, "flight": flight, "fuel": fuel}
+    row.update({key: result[key] for key in ("zfw", "total_weight", "cg", "stab")})
+    for zone, counts in pax_zones.items():
+        row.update({f"{zone}_{pax_class}": count for pax_class, count in counts.items()})
+    for hold, allocation in result["bag_allocation"].items():
+        row.update({f"{hold}_{bag_type}": allocation[bag_type] for bag_type in ("standard", "heavy")})
+    if result.get("performance") is not None:
+        row.update(conditions)
+        row.update({key: result["performance"][key] for key in ("flap", "tow_limit", "required_runway", "takeoff_ok")})
+    return row
+
+
+def _has_takeoff(row):
+    value = row.get("tow_limit")
+    return value is not None and value == value
+
+
+# PDF output
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4, points
+FONT_SIZE = 9
+LEADING = 12
+MARGIN = 48
+
+
+def _pdf_escape(text):
+    return (text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            .encode("latin-1", errors="replace"))
+
+
+class LoadSheetTemplate:
+    # Line templates compiled for one settings version
+
+    def __init__(self, settings, lines=LOADSHEET_LINES, acars_lines=ACARS_LINES, title="LOAD AND TRIM SHEET"):
+        self.zones = list(settings["zone_arms"])
+        self.holds = list(settings["compartment_arms"])
+        self._text = {perf: self._expand(lines, perf) for perf in (False, True)}
+        self._acars = {perf: self._expand(acars_lines, perf) for perf in (False, True)}
+        self._pdf_prefix, self._pdf_xref = self._pdf_skeleton()
+        # Static page graphics: header band with the title, frame, then the
+        # text object the sheet lines are written into
+        top = PAGE_HEIGHT - MARGIN
+        self._pdf_head = (
+            f"q 0.88 g {MARGIN - 8} {top - 22} {PAGE_WIDTH - 2 * MARGIN + 16} 26 re f Q\n"
+            f"q 0.6 w {MARGIN - 8} {MARGIN - 8} {PAGE_WIDTH - 2 * MARGIN + 16} {top - MARGIN + 12} re S Q\n"
+            f"BT /F2 13 Tf {MARGIN} {top - 14} Td ("
+        ).encode() + _pdf_escape(title) + (
+            f") Tj ET\nBT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {top - 34} Td\n"
+        ).encode()
+
+    def _expand(self, lines, perf):
+        # One str.format string with zone/hold lines repeated and ?perf lines
+        # kept only for flights with takeoff conditions
+        out = []
+        for line in lines:
+            if line.startswith("?perf "):
+                if not perf:
+                    continue
+                line = line[len("?perf "):]
+            if "%ZONE%" in line:
+                out.extend(line.replace("{%ZONE%", "{" + zone).replace("%ZONE%", f"{zone.upper():<4}")
+                           for zone in self.zones)
+            elif "%HOLD%" in line:
+                out.extend(line.replace("{%HOLD%", "{" + hold).replace("%HOLD%", f"{hold.upper():<4}")
+                           for hold in self.holds)
+            else:
+                out.append(line)
+        text = "\n".join(out)
+        # Fail on a malformed template now rather than on the first sheet
+        list(string.Formatter().parse(text))
+        return text
+
+    def _pdf_skeleton(self):
+        # Header and every object except the page content stream, plus the
+        # xref table and trailer. The stream (5 0 obj) always starts right
+        # after the prefix, so only startxref depends on the sheet
+        objects = {
+            1: "<< /Type /Catalog /Pages 2 0 R >>",
+            2: "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            3: (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                "/Resources << /Font << /F1 4 0 R /F2 6 0 R >> >> /Contents 5 0 R >>"),
+            4: "<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+            6: "<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>",
+        }
+        prefix = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        offsets = {}
+        for number, body in objects.items():
+            offsets[number] = len(prefix)
+            prefix += f"{number} 0 obj\n{body}\nendobj\n".encode()
+        offsets[5] = len(prefix)
+        xref = (b"xref\n0 7\n0000000000 65535 f \n"
+                + b"".join(b"%010d 00000 n \n" % offsets[number] for number in range(1, 7))
+                + b"trailer\n<< /Size 7 /Root 1 0 R >>\n")
+        return prefix, xref
+
+    def text(self, fields, perf=False):
+        return self._text[perf].format(**fields)
+
+    def acars(self, fields, perf=False):
+        text = self._acars[perf].format(**fields).upper()
+        lines = []
+        for line in text.split("\n"):
+            line = line.strip()
+            if len(line) <= ACARS_WIDTH:
+                lines.append(line)
+            else:
+                lines.extend(textwrap.wrap(line, ACARS_WIDTH, subsequent_indent=ACARS_INDENT))
+        return "\n".join(lines) + "\n"
+
+    def pdf(self, fields, perf=False):
+        lines = self.text(fields, perf).split("\n")
+        content = self._pdf_head + b"".join(b"(" + _pdf_escape(line) + b") '\n" for line in lines) + b"ET\n"
+        stream = b"5 0 obj\n<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream\nendobj\n"
+        startxref = len(self._pdf_prefix) + len(stream)
+        return self._pdf_prefix + stream + self._pdf_xref + b"startxref\n%d\n%%%%EOF\n" % startxref
+
+    def render(self, row, settings, formats=FORMATS, issued="", status="FINAL"):
+        # {extension: bytes} for one flight row
+        fields = sheet_fields(row, settings, issued, status)
+        perf = _has_takeoff(row)
+        out = {}
+        if "pdf" in formats:
+            out["pdf"] = self.pdf(fields, perf)
+        if "acars" in formats:
+            out["txt"] = self.acars(fields, perf).encode("ascii", errors="replace")
+        return out
+
+
+_templates = {}
+
+
+def template_for(settings):
+    # Compiled template for these settings' zones and holds
+    key = (tuple(settings["zone_arms"]), tuple(settings["compartment_arms"]))
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = LoadSheetTemplate(settings)
+    return template
+
+
+def sheet_name(row, i):
+    # File name stem: date_flight_tail, or the row number without a flight column
+    flight = row.get("flight")
+    parts = [row.get("date"), flight if flight not in (None, "") else f"{i + 1:04d}", row["tail"]]
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", "_".join(str(part) for part in parts if part not in (None, "")))
+
+
+# Bulk rendering
+
+# Worker process state, set once by _init_worker
+_worker = None
+
+
+def _init_worker(settings, formats, issued, status):
+    global _worker
+    _worker = (settings, template_for(settings), formats, issued, status)
+
+
+def _render_chunk(chunk):
+    settings, template, formats, issued, status = _worker
+    out = []
+    for i, row in chunk:
+        stem = sheet_name(row, i)
+        for extension, data in template.render(row, settings, formats, issued, status).items():
+            out.append((f"{stem}.{extension}", data))
+    return out
+
+
+def _sink(out):
+    # (write(name, data), close()) for a directory or a .zip file
+    if out.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED)
+        return archive.writestr, archive.close
+    os.makedirs(out, exist_ok=True)
+
+    def write(name, data):
+        with open(os.path.join(out, name), "wb") as f:
+            f.write(data)
+
+    return write, lambda: None
+
+
+def render_day(frame, settings, out, formats=FORMATS, workers=None, chunk_size=25, date=None, status="FINAL"):
+    # Render a sheet per flight into the directory or zip file `out`; frame
+    # holds input flights or clp_cli results. Returns the number of files.
+    from clp_cli import RESULT_COLUMNS, replan
+
+    if not all(column in frame for column in RESULT_COLUMNS + ["aft_heavy"]):
+        frame = replan(frame, settings, workers=workers)
+    if date is not None or "date" not in frame:
+        frame = frame.assign(date=date or time.strftime("%Y-%m-%d"))
+    rows = list(enumerate(frame.to_dict("records")))
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    issued = time.strftime("%Y-%m-%d %H:%MZ", time.gmtime())
+    initargs = (settings, tuple(formats), issued, status)
+
+    write, close = _sink(out)
+    try:
+        if workers == 1 or len(chunks) <= 1:
+            _init_worker(*initargs)
+            return _write_parts(map(_render_chunk, chunks), write)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            # map yields in chunk order, so documents are written in input
+            # order while later chunks are still rendering
+            return _write_parts(pool.map(_render_chunk, chunks), write)
+    finally:
+        close()
+
+
+def _write_parts(parts, write):
+    written = 0
+    for part in parts:
+        for name, data in part:
+            write(name, data)
+            written += 1
+    return written
+
+
+def main(argv=None):
+    from clp_cli import read_flights
+    from clp_config import apply_changes, load_settings_file, parse_overrides
+    from clp_core import default_settings
+
+    parser = argparse.ArgumentParser(description="Bulk load-sheet documents (PDF and ACARS text)")
+    parser.add_argument("flights", help="input flights or clp_cli results (.csv, .parquet, .jsonl)")
+    parser.add_argument("-o", "--output", required=True, help="output directory, or a .zip file")
+    parser.add_argument("--format", dest="formats", action="append", choices=FORMATS,
+                        help="document format (repeatable; default: pdf and acars)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=25, help="flights per worker task")
+    parser.add_argument("--date", help="flight date (default: date column, else today)")
+    parser.add_argument("--status", default="FINAL", help="load sheet status line, e.g. PRELIM or FINAL")
+    parser.add_argument("--settings", help="JSON settings (or shared config store file) to merge over the defaults")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting (repeatable)")
+    args = parser.parse_args(argv)
+
+    settings = default_settings()
+    if args.settings:
+        settings.update(load_settings_file(args.settings))
+    settings = apply_changes(settings, parse_overrides(args.overrides))
+
+    start = time.perf_counter()
+    frame = read_flights(args.flights)
+    written = render_day(frame, settings, args.output, formats=args.formats or FORMATS, workers=args.workers,
+                         chunk_size=args.chunk_size, date=args.date, status=args.status.upper())
+    print(f"{written} documents for {len(frame)} flights in {time.perf_counter() - start:.2f} s -> {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
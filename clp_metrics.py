@@ -0,0 +1,220 @@
+import bisect
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+# Hot-path instrumentation: per-stage timers, counters and a one-rerun profiler.
+#
+#   with metrics.stage("calculate_wab"):
+#       ...
+#   metrics.count("reruns")
+#
+# Stage durations go into fixed-bucket histograms (BUCKETS_MS), so memory is
+# constant however long the process runs and percentiles are bucket upper
+# bounds. metrics.prometheus() renders everything in the Prometheus text
+# format (durations in seconds, as Prometheus expects). It is served by
+# clp_service.py at GET /metrics and, for the Streamlit app, by
+# serve_metrics() on CLP_METRICS_PORT.
+#
+# Instrumentation is on unless CLP_METRICS=0. When off, stage() returns one
+# shared no-op context manager and count() returns at once, so the
+# instrumented code pays one attribute check per call site.
+#
+# metrics.profiler captures a single Streamlit rerun with cProfile: arm() it,
+# and the next rerun that calls begin()/end() is profiled (only the thread
+# running that script), with the top functions kept as text in last_report.
+
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0)
+PROFILE_LINES = 40
+
+_NULL = contextlib.nullcontext()
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class Profiler:
+    # cProfile for one rerun at a time
+
+    def __init__(self, lines=PROFILE_LINES):
+        self.lines = lines
+        self.armed = False
+        self.last_report = None
+        self._profile = None
+        self._owner = None
+        self._lock = threading.Lock()
+
+    def arm(self):
+        self.armed = True
+
+    def begin(self):
+        # Start profiling if armed; the calling thread owns the capture
+        with self._lock:
+            self._discard_stale()
+            if not self.armed or self._profile is not None:
+                return False
+            self.armed = False
+            self._profile = cProfile.Profile()
+            self._owner = threading.get_ident()
+        self._profile.enable()
+        return True
+
+    def _discard_stale(self):
+        # A capture whose rerun never reached end() (st.rerun(), a widget
+        # rerun or an exception): the next rerun on the owner thread turns
+        # it off, and one left by a finished thread is dropped
+        if self._profile is None:
+            return
+        if self._owner == threading.get_ident():
+            self._profile.disable()
+        elif any(thread.ident == self._owner for thread in threading.enumerate()):
+            return  # still running in another session
+        self._profile = None
+
+    def end(self):
+        # Stop and keep the report, if this thread began a capture
+        profile = self._profile
+        if profile is None or self._owner != threading.get_ident():
+            return None
+        profile.disable()
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.lines)
+        self.last_report = out.getvalue()
+        self._profile = None
+        return self.last_report
+
+
+class Metrics:
+    # Process-wide stage histograms and counters, shared by every session
+
+    def __init__(self, enabled=True, buckets=BUCKETS_MS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self.profiler = Profiler()
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+
+    def stage(self, name):
+        # Context manager timing one execution of the named stage
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def observe(self, name, ms):
+        i = bisect.bisect_left(self.buckets, ms)
+        with self._lock:
+            hist = self._stages.get(name)
+            if hist is None:
+                hist = self._stages[name] = {"buckets": [0] * (len(self.buckets) + 1), "count": 0, "sum_ms": 0.0}
+            hist["buckets"][i] += 1
+            hist["count"] += 1
+            hist["sum_ms"] += ms
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def _quantile(self, counts, total, q):
+        # Upper bound of the bucket holding the q-th quantile (inf past the last)
+        rank = q * total
+        seen = 0
+        for le, n in zip(self.buckets + (float("inf"),), counts):
+            seen += n
+            if seen >= rank:
+                return le
+        return float("inf")
+
+    def snapshot(self):
+        # {"stages": {name: count, sum/mean/p50/p95/p99 ms, buckets}, "counters": {...}}
+        with self._lock:
+            stages = {name: {"count": h["count"], "sum_ms": h["sum_ms"], "buckets": list(h["buckets"])}
+                      for name, h in self._stages.items()}
+            counters = dict(self._counters)
+        for h in stages.values():
+            h["mean_ms"] = h["sum_ms"] / h["count"]
+            for q in (50, 95, 99):
+                h[f"p{q}_ms"] = self._quantile(h["buckets"], h["count"], q / 100)
+        return {"enabled": self.enabled, "stages": stages, "counters": counters}
+
+    def prometheus(self, prefix="clp"):
+        # Prometheus text exposition format
+        snap = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_duration_seconds Time spent in each instrumented stage.",
+                 f"# TYPE {prefix}_stage_duration_seconds histogram"]
+        for name, h in sorted(snap["stages"].items()):
+            cumulative = 0
+            for le, n in zip(self.buckets, h["buckets"]):
+                cumulative += n
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="{le / 1000:g}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {h["count"]}')
+            lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{name}"}} {h["sum_ms"] / 1000:.9g}')
+            lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{name}"}} {h["count"]}')
+        lines.append(f"# HELP {prefix}_events_total Instrumented event counts.")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, n in sorted(snap["counters"].items()):
+            lines.append(f'{prefix}_events_total{{event="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide instance
+metrics = Metrics(enabled=os.environ.get("CLP_METRICS", "1") != "0")
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port=None, host="127.0.0.1"):
+    # Serve GET /metrics from a background thread, once per process. Without
+    # a port, CLP_METRICS_PORT is used; if that isn't set either, no server
+    # is started. Returns the server (or None).
+    global _server
+    port = port or os.environ.get("CLP_METRICS_PORT")
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?", 1)[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            _server = ThreadingHTTPServer((host, int(port)), Handler)
+            threading.Thread(target=_server.serve_forever, name="clp-metrics", daemon=True).start()
+    return _server
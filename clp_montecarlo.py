@@ -0,0 +1,160 @@
+import numpy as np
+
+from clp_batch import calculate_wab_batch, tail_constants
+from clp_fuel import landing_fuel_burn
+from clp_tables import envelope_limits_batch, tables_for
+
+# Monte Carlo weight uncertainty for planned flights.
+#
+# calculate_wab uses standard weights (PAX_WEIGHT_ADULT, bag_weights), which
+# are averages. Here each passenger and bag weight is drawn from a normal
+# distribution around its standard weight (standard deviations in
+# WEIGHT_SPREAD), and every flight is evaluated for `draws` samples to give
+# TOW and CG percentiles plus the probability of breaching each limit.
+#
+# Sums of independent normal weights are normal, and the flight's total
+# weight and moment are both linear in them, so (weight, moment) is exactly a
+# bivariate normal whose covariance follows from the per-zone and per-hold
+# variances and arms. Each draw therefore takes two standard normals (mixed
+# through the covariance's Cholesky factor) instead of one per passenger and
+# bag. Fuel and the bag loading plan (the optimizer's fwd/aft split at
+# standard weights) stay fixed.
+#
+# MonteCarlo keeps its draw buffers between flights and between calls, so a
+# day's schedule is evaluated without per-flight allocations. Each flight
+# gets its own generator seeded from (seed, flight index), so a flight's
+# results don't depend on which other flights were run with it.
+
+# Standard deviation of one passenger or bag weight, lbs (mock values)
+WEIGHT_SPREAD = {
+    "adults": 30.0,
+    "children": 15.0,
+    "infants": 5.0,
+    "standard": 12.0,
+    "heavy": 10.0,
+}
+
+PERCENTILES = (1, 5, 50, 95, 99)
+
+BREACHES = ("cg_fwd", "cg_aft", "mtow", "zfw", "landing")
+
+
+class MonteCarlo:
+
+    def __init__(self, draws=100_000, seed=0, spread=None, percentiles=PERCENTILES):
+        self.draws = draws
+        self.seed = seed
+        self.spread = {**WEIGHT_SPREAD, **(spread or {})}
+        self.percentiles = tuple(percentiles)
+
+        # Per-draw buffers, reused across flights and calls
+        self._z = np.empty((draws, 2))
+        self._weight = np.empty(draws)
+        self._moment = np.empty(draws)
+        self._cg = np.empty(draws)
+        self._flag = np.empty(draws, dtype=bool)
+        self._any = np.empty(draws, dtype=bool)
+
+    def run(self, settings, tail_idx, adults, children, infants, standard_bags, heavy_bags, fuel,
+            tails=None, plan=None):
+        # Percentiles and breach probabilities for each flight. Columns are
+        # those of calculate_wab_batch; plan is its result for the same
+        # columns if already computed.
+        tail_idx = np.asarray(tail_idx, dtype=np.int64)
+        adults = np.asarray(adults, dtype=float)
+        children = np.asarray(children, dtype=float)
+        infants = np.asarray(infants, dtype=float)
+        standard_bags = np.asarray(standard_bags, dtype=float)
+        heavy_bags = np.asarray(heavy_bags, dtype=float)
+        fuel = np.asarray(fuel, dtype=float)
+        if plan is None:
+            plan = calculate_wab_batch(settings, tail_idx, adults, children, infants,
+                                       standard_bags, heavy_bags, fuel, tails=tails)
+        consts = tail_constants(settings, tails)
+
+        n = len(fuel)
+        sd = self.spread
+        # Variance of the summed weights per group: each zone, fwd hold, aft hold
+        fwd_std = standard_bags - plan["std_aft"]
+        fwd_heavy = heavy_bags - plan["heavy_aft"]
+        group_var = np.column_stack([
+            adults * sd["adults"] ** 2 + children * sd["children"] ** 2 + infants * sd["infants"] ** 2,
+            fwd_std * sd["standard"] ** 2 + fwd_heavy * sd["heavy"] ** 2,
+            plan["std_aft"] * sd["standard"] ** 2 + plan["heavy_aft"] * sd["heavy"] ** 2,
+        ])
+        arms = np.array(list(settings["zone_arms"].values())
+                        + [settings["compartment_arms"]["fwd"], settings["compartment_arms"]["aft"]])
+
+        # Cholesky factor of the (weight, moment) covariance, as matmul columns:
+        # weight = z @ mix[:, 0], moment = z @ mix[:, 1]
+        var_weight = group_var.sum(axis=1)
+        var_moment = group_var @ arms ** 2
+        cov = group_var @ arms
+        sd_weight = np.sqrt(var_weight)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            along = np.where(sd_weight > 0, cov / sd_weight, 0.0)
+        mix = np.zeros((n, 2, 2))
+        mix[:, 0, 0] = sd_weight
+        mix[:, 0, 1] = along
+        mix[:, 1, 1] = np.sqrt(np.maximum(var_moment - along ** 2, 0.0))
+
+        base_weight = plan["total_weight"]
+        base_moment = plan["cg"] * plan["total_weight"]
+        mtow_limit = consts["mtow_limit"][tail_idx]
+        # Breach thresholds on total weight; NaN limits never breach
+        zfw_threshold = consts["zfw_limit"][tail_idx] + fuel
+        landing_threshold = consts["landing_limit"][tail_idx] + fuel * landing_fuel_burn(settings)
+        tables = tables_for(settings)
+        env = tables["envelope"]
+
+        z, weight, moment, cg, flag, any_breach = (
+            self._z, self._weight, self._moment, self._cg, self._flag, self._any)
+        out = {
+            "tow_pct": np.empty((n, len(self.percentiles))),
+            "cg_pct": np.empty((n, len(self.percentiles))),
+            "p_unsafe": np.empty(n),
+        }
+        for name in BREACHES:
+            out[f"p_{name}"] = np.empty(n)
+
+        def record(name, i):
+            # flag holds this limit's per-draw breaches
+            np.logical_or(any_breach, flag, out=any_breach)
+            out[f"p_{name}"][i] = np.count_nonzero(flag) / self.draws
+
+        for i in range(n):
+            np.random.default_rng((self.seed, i)).standard_normal(out=z)
+            np.matmul(z, mix[i, :, 0], out=weight)
+            np.matmul(z, mix[i, :, 1], out=moment)
+            weight += base_weight[i]
+            moment += base_moment[i]
+            np.divide(moment, weight, out=cg)
+
+            any_breach.fill(False)
+            if env["n_w"] == 1:
+                fwd, aft = env["forward"][0], env["aft"][0]
+            else:
+                fwd, aft = envelope_limits_batch(tables, weight)
+            np.less(cg, fwd, out=flag)
+            record("cg_fwd", i)
+            np.greater(cg, aft, out=flag)
+            record("cg_aft", i)
+            np.greater(weight, mtow_limit[i], out=flag)
+            record("mtow", i)
+            np.greater(weight, zfw_threshold[i], out=flag)
+            record("zfw", i)
+            np.greater(weight, landing_threshold[i], out=flag)
+            record("landing", i)
+            out["p_unsafe"][i] = np.count_nonzero(any_breach) / self.draws
+
+            # Percentiles last: they partially sort the buffers in place
+            out["cg_pct"][i] = np.percentile(cg, self.percentiles, overwrite_input=True)
+            out["tow_pct"][i] = np.percentile(weight, self.percentiles, overwrite_input=True)
+        return out
+
+
+def monte_carlo_batch(settings, tail_idx, adults, children, infants, standard_bags, heavy_bags, fuel,
+                      tails=None, draws=100_000, seed=0, spread=None, percentiles=PERCENTILES):
+    # One-off run; keep a MonteCarlo instance to reuse buffers across calls
+    return MonteCarlo(draws, seed, spread, percentiles).run(
+        settings, tail_idx, adults, children, infants, standard_bags, heavy_bags, fuel, tails=tails)
@@ -0,0 +1,412 @@
+import csv
+import math
+
+from clp_tables import _axis, _cell, _cell_batch, _interp
+
+# Takeoff performance: performance-limited TOW and required runway.
+#
+# Source data is the AFM-style TOW-limit table, one per takeoff flap setting,
+# over runway length (ft), OAT (deg C), pressure altitude (ft) and CG (ft):
+#   settings["takeoff_performance"] = {
+#       "default_flap": "2",
+#       "runway": [...], "oat": [...], "altitude": [...], "cg": [...],
+#       "flaps": {"1": [[[[tow per cg] per altitude] per oat] per runway], ...}}
+# Axes are ascending and shared by every flap; the TOW limit must not
+# decrease with runway length. Without the key the mock table built by
+# mock_takeoff_performance() is used. load_performance_csv reads the same
+# table from long-form CSV rows (flap, runway, oat, altitude, cg, tow).
+#
+# compile_performance resamples each flap's table onto a regular grid with
+# the clp_tables interpolation helpers, so a lookup is O(1) index
+# arithmetic plus a multilinear blend of the 16 surrounding grid points.
+# Source breakpoints on multiples of the *_STEP values compile exactly.
+# Flap is a discrete setting, so it selects a table rather than being
+# interpolated.
+#
+# The required runway for a weight is the inverse along the runway axis: with
+# the other three axes fixed the limit is piecewise linear in runway length,
+# so a binary search over the runway grid points and one linear solve give it
+# exactly. It is inf when even the longest runway in the table is too short.
+#
+# Outside the table the lookups clamp to the edge and in_table is False,
+# except for runways longer than the table covers, where the clamped limit
+# is conservative. A flight outside the table is not takeoff_ok.
+#
+# The scalar functions use only the standard library (so clp_core stays
+# NumPy-free); the *_batch functions apply the same formulas to NumPy arrays
+# and give identical results.
+
+AXES = ("runway", "oat", "altitude", "cg")
+RUNWAY_STEP = 500.0  # ft between grid points
+OAT_STEP = 5.0  # deg C
+ALTITUDE_STEP = 1000.0  # ft
+CG_STEP = 0.5  # ft
+STEPS = (RUNWAY_STEP, OAT_STEP, ALTITUDE_STEP, CG_STEP)
+CHUNK = 1 << 14  # flights per vectorized pass in takeoff_performance_batch
+
+_cache = {}
+
+
+def mock_takeoff_performance():
+    # Mock TOW-limit table (lbs): longer runways and aft CGs allow more
+    # weight, hot/high less; flap 1 needs more runway but climbs better,
+    # flap 3 the reverse. Replace with real AFM data.
+    runways = [4000.0, 5000.0, 6000.0, 7000.0, 8000.0, 9000.0, 10000.0, 11000.0, 12000.0]
+    oats = [-30.0, -15.0, 0.0, 15.0, 30.0, 40.0, 50.0]
+    altitudes = [0.0, 2000.0, 4000.0, 6000.0, 8000.0, 10000.0]
+    cgs = [58.0, 60.0, 62.0, 64.0, 66.0, 68.0]
+    flap_factors = {"1": (0.92, 2500.0), "2": (1.0, 0.0), "3": (1.08, -2500.0)}
+
+    def tow(runway, oat, altitude, cg, runway_factor, climb):
+        field = 98000.0 + 58000.0 * (1.0 - math.exp(-(runway * runway_factor - 4000.0) / 4000.0))
+        flat_rate = 30.0 - 2.0 * altitude / 1000.0  # ISA+15
+        temperature = 450.0 * max(0.0, oat - flat_rate) - 60.0 * max(0.0, flat_rate - oat)
+        return round(field + climb - temperature - 2.2 * altitude + 600.0 * (cg - 58.0), -1)
+
+    return {
+        "default_flap": "2",
+        "runway": runways, "oat": oats, "altitude": altitudes, "cg": cgs,
+        "flaps": {flap: [[[[tow(r, t, a, c, factor, climb) for c in cgs] for a in altitudes] for t in oats]
+                         for r in runways]
+                  for flap, (factor, climb) in flap_factors.items()},
+    }
+
+
+def load_performance_csv(path):
+    # Source table from long-form CSV rows with a header of
+    # flap, runway, oat, altitude, cg, tow; every flap must cover the full grid
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"{path}: no rows")
+    missing = [name for name in ("flap",) + AXES + ("tow",) if name not in rows[0]]
+    if missing:
+        raise ValueError(f"{path}: missing column(s) {', '.join(missing)}")
+    axes = {name: sorted({float(row[name]) for row in rows}) for name in AXES}
+    values = {}
+    for row in rows:
+        values[(flap_key(row["flap"]),) + tuple(float(row[name]) for name in AXES)] = float(row["tow"])
+    flaps = list(dict.fromkeys(flap_key(row["flap"]) for row in rows))
+    table = {name: axes[name] for name in AXES}
+    table["default_flap"] = flaps[0]
+    table["flaps"] = {}
+    for flap in flaps:
+        try:
+            table["flaps"][flap] = [[[[values[(flap, r, t, a, c)] for c in axes["cg"]] for a in axes["altitude"]]
+                                     for t in axes["oat"]] for r in axes["runway"]]
+        except KeyError as e:
+            raise ValueError(f"{path}: flap {flap} has no row for runway/oat/altitude/cg {e.args[0][1:]}") from None
+    return table
+
+
+def flap_key(flap):
+    # Table key for a flap setting given as "2", 2 or 2.0
+    if isinstance(flap, float) and flap.is_integer():
+        flap = int(flap)
+    return str(flap).strip()
+
+
+def _resample(flat, shape, d, xs, grid):
+    # Resample a row-major flat array along axis d from breakpoints xs onto grid
+    inner = 1
+    for n in shape[d + 1:]:
+        inner *= n
+    outer = len(flat) // (shape[d] * inner)
+    out = []
+    for o in range(outer):
+        block = flat[o * shape[d] * inner:(o + 1) * shape[d] * inner]
+        columns = [block[i::inner] for i in range(inner)]
+        resampled = [[_interp(x, xs, column) for x in grid] for column in columns]
+        for k in range(len(grid)):
+            out.extend(column[k] for column in resampled)
+    return out
+
+
+def compile_performance(source):
+    axes = [[float(x) for x in source[name]] for name in AXES]
+    for name, xs in zip(AXES, axes):
+        if not xs or any(b <= a for a, b in zip(xs, xs[1:])):
+            raise ValueError(f"takeoff_performance: {name} axis must be non-empty and strictly ascending")
+    shape = [len(xs) for xs in axes]
+
+    compiled_axes = [_axis(xs, step) for xs, step in zip(axes, STEPS)]
+    grid_shape = [n for _, _, n in compiled_axes]
+    strides = [grid_shape[1] * grid_shape[2] * grid_shape[3], grid_shape[2] * grid_shape[3], grid_shape[3], 1]
+
+    flaps = list(source["flaps"])
+    grids = []
+    for flap in flaps:
+        flat = [float(v) for oat_rows in source["flaps"][flap] for alt_rows in oat_rows
+                for cg_row in alt_rows for v in cg_row]
+        if len(flat) != shape[0] * shape[1] * shape[2] * shape[3]:
+            raise ValueError(f"takeoff_performance: flap {flap} table is not {' x '.join(map(str, shape))}")
+        per_runway = len(flat) // shape[0]
+        if any(flat[k + per_runway] < flat[k] for k in range(len(flat) - per_runway)):
+            raise ValueError(f"takeoff_performance: flap {flap} TOW limit decreases with runway length")
+        current = list(shape)
+        for d, ((x0, step, n), xs) in enumerate(zip(compiled_axes, axes)):
+            flat = _resample(flat, current, d, xs, [x0 + k * step for k in range(n)])
+            current[d] = n
+        grids.append(flat)
+
+    default_flap = flap_key(source.get("default_flap", flaps[0]))
+    if default_flap not in flaps:
+        raise ValueError(f"takeoff_performance: default_flap {default_flap!r} has no table")
+    return {
+        "flaps": flaps,
+        "flap_index": {flap: k for k, flap in enumerate(flaps)},
+        "default_flap": default_flap,
+        "axes": compiled_axes,
+        "ranges": [(xs[0], xs[-1]) for xs in axes],
+        "strides": strides,
+        "size": grid_shape[0] * strides[0],
+        "grids": grids,
+    }
+
+
+_MOCK = None
+
+
+def performance_for(settings):
+    # Compiled performance tables for these settings. Keyed by the identity of
+    # the source table (settings are copy-on-write, see clp_registry), so
+    # the table is compiled once per settings version.
+    global _MOCK
+    source = settings.get("takeoff_performance")
+    if source is None:
+        if _MOCK is None:
+            _MOCK = mock_takeoff_performance()
+        source = _MOCK
+    entry = _cache.get(id(source))
+    # The entry keeps source alive, so its id can't be reused meanwhile
+    if entry is None or entry[0] is not source:
+        if len(_cache) > 32:
+            _cache.clear()
+        entry = _cache[id(source)] = (source, compile_performance(source))
+    return entry[1]
+
+
+def _flap(tables, flap):
+    key = tables["default_flap"] if flap is None else flap_key(flap)
+    try:
+        return tables["flap_index"][key]
+    except KeyError:
+        raise KeyError(f"No takeoff performance table for flap {key!r}") from None
+
+
+def _cells(tables, values, first=0):
+    # (base offset, [(neighbour offset, fraction)] per axis) for axes first..3
+    offset = 0
+    cells = []
+    for d in range(first, 4):
+        x0, step, n = tables["axes"][d]
+        i, t = _cell(values[d - first], x0, step, n)
+        offset += i * tables["strides"][d]
+        cells.append((tables["strides"][d] if n > 1 else 0, t))
+    return offset, cells
+
+
+def _blend(grid, offset, cells, d=0):
+    # Multilinear blend of the cell at offset, innermost axis first
+    if d == len(cells):
+        return grid[offset]
+    step, t = cells[d]
+    lo = _blend(grid, offset, cells, d + 1)
+    hi = _blend(grid, offset + step, cells, d + 1)
+    return lo + (hi - lo) * t
+
+
+def _in_table(tables, runway, oat, altitude, cg):
+    (r_lo, _), (t_lo, t_hi), (a_lo, a_hi), (c_lo, c_hi) = tables["ranges"]
+    return r_lo <= runway and t_lo <= oat <= t_hi and a_lo <= altitude <= a_hi and c_lo <= cg <= c_hi
+
+
+def takeoff_limit(tables, runway, oat, altitude, cg, flap=None):
+    # Returns (performance-limited TOW, in_table)
+    grid = tables["grids"][_flap(tables, flap)]
+    offset, cells = _cells(tables, (runway, oat, altitude, cg))
+    return _blend(grid, offset, cells), _in_table(tables, runway, oat, altitude, cg)
+
+
+def required_runway(tables, weight, oat, altitude, cg, flap=None):
+    # Shortest runway (ft) whose limit covers weight: the table's shortest
+    # runway if that already does, inf if even the longest doesn't
+    grid = tables["grids"][_flap(tables, flap)]
+    r0, r_step, n_r = tables["axes"][0]
+    stride = tables["strides"][0]
+    offset, cells = _cells(tables, (oat, altitude, cg), first=1)
+    lo, hi = 0, n_r - 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _blend(grid, offset + mid * stride, cells) >= weight:
+            hi = mid
+        else:
+            lo = mid + 1
+    at = _blend(grid, offset + lo * stride, cells)
+    if at < weight:
+        return math.inf
+    if lo == 0:
+        return r0
+    below = _blend(grid, offset + (lo - 1) * stride, cells)
+    return r0 + (lo - 1 + (weight - below) / (at - below)) * r_step
+
+
+def takeoff_performance(settings, conditions, weight, cg):
+    # conditions: {"runway_length", "oat", "pressure_altitude", optional "flap"}
+    tables = performance_for(settings)
+    flap = conditions.get("flap")
+    runway = conditions["runway_length"]
+    oat, altitude = conditions["oat"], conditions["pressure_altitude"]
+    limit, in_table = takeoff_limit(tables, runway, oat, altitude, cg, flap)
+    return {
+        "flap": tables["default_flap"] if flap is None else flap_key(flap),
+        "tow_limit": limit,
+        "required_runway": required_runway(tables, weight, oat, altitude, cg, flap),
+        "in_table": in_table,
+        "takeoff_ok": in_table and weight <= limit,
+    }
+
+
+# Vectorized lookups
+
+
+def _arrays(tables):
+    # All flaps' grids in one flat array, so a lookup is one gather at
+    # flap * size + offset
+    arrays = tables.get("_arrays")
+    if arrays is None:
+        import numpy as np
+        arrays = tables["_arrays"] = {"grid": np.array(tables["grids"]).ravel()}
+    return arrays
+
+
+def flap_index_batch(tables, flap):
+    # Per-flight flap table index; None means the default flap everywhere
+    import numpy as np
+    if flap is None:
+        return np.int64(_flap(tables, None))
+    flap = np.asarray(flap)
+    values, inverse = np.unique(flap, return_inverse=True)
+    index = np.array([_flap(tables, v.item()) for v in values], dtype=np.int64)
+    return index[inverse.reshape(flap.shape)]
+
+
+def _cells_batch(tables, values, first=0):
+    import numpy as np
+    offset = 0
+    cells = []
+    for d in range(first, 4):
+        x0, step, n = tables["axes"][d]
+        i, t = _cell_batch(np.asarray(values[d - first], dtype=float), x0, step, n)
+        offset = offset + i * tables["strides"][d]
+        cells.append((tables["strides"][d] if n > 1 else 0, t))
+    return offset, cells
+
+
+def _blend_batch(grid, offset, cells, d=0):
+    # _blend for arrays; the neighbour is gathered from a shifted view of the
+    # grid rather than at offset + step, saving an index array per corner
+    if d == len(cells):
+        return grid[offset]
+    step, t = cells[d]
+    lo = _blend_batch(grid, offset, cells, d + 1)
+    hi = _blend_batch(grid[step:], offset, cells, d + 1)
+    return lo + (hi - lo) * t
+
+
+def _in_table_batch(tables, runway, oat, altitude, cg):
+    (r_lo, _), (t_lo, t_hi), (a_lo, a_hi), (c_lo, c_hi) = tables["ranges"]
+    return ((r_lo <= runway) & (t_lo <= oat) & (oat <= t_hi)
+            & (a_lo <= altitude) & (altitude <= a_hi) & (c_lo <= cg) & (cg <= c_hi))
+
+
+def _search_runway(tables, grid, offset, cells, weight, lo, hi, at, below):
+    # Vectorized lower bound over runway grid points in [lo, hi): the first
+    # point whose limit covers weight (hi if none), tracking the limits at the
+    # answer (at) and the point before it (below); then the linear solve
+    import numpy as np
+    r0, r_step, n_r = tables["axes"][0]
+    stride = tables["strides"][0]
+    for _ in range(int(np.max(hi - lo, initial=0)).bit_length()):
+        searching = lo < hi
+        mid = (lo + hi) // 2
+        value = _blend_batch(grid, offset + np.minimum(mid, n_r - 1) * stride, cells)
+        covers = value >= weight
+        raise_hi = searching & covers
+        raise_lo = searching & ~covers
+        hi = np.where(raise_hi, mid, hi)
+        at = np.where(raise_hi, value, at)
+        lo = np.where(raise_lo, mid + 1, lo)
+        below = np.where(raise_lo, value, below)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        runway = r0 + (lo - 1 + (weight - below) / (at - below)) * r_step
+    runway = np.where(lo == 0, r0, runway)
+    return np.where(lo >= n_r, np.inf, runway)
+
+
+def takeoff_limit_batch(tables, runway, oat, altitude, cg, flap=None):
+    import numpy as np
+    runway, oat, altitude, cg = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (runway, oat, altitude, cg)))
+    offset, cells = _cells_batch(tables, (runway, oat, altitude, cg))
+    offset = offset + flap_index_batch(tables, flap) * tables["size"]
+    return _blend_batch(_arrays(tables)["grid"], offset, cells), _in_table_batch(tables, runway, oat, altitude, cg)
+
+
+def required_runway_batch(tables, weight, oat, altitude, cg, flap=None):
+    import numpy as np
+    weight, oat, altitude, cg = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (weight, oat, altitude, cg)))
+    offset, cells = _cells_batch(tables, (oat, altitude, cg), first=1)
+    offset = offset + flap_index_batch(tables, flap) * tables["size"]
+    nan = np.full(weight.shape, np.nan)
+    return _search_runway(tables, _arrays(tables)["grid"], offset, cells, weight,
+                          np.zeros(weight.shape, dtype=np.int64),
+                          np.full(weight.shape, tables["axes"][0][2], dtype=np.int64), nan, nan)
+
+
+def _performance_chunk(tables, grid, weight, cg, runway, oat, altitude, flap_idx):
+    # The limit is the blend of the limits at the two runway grid points
+    # around the flight's runway, which also bracket the required runway search
+    import numpy as np
+    offset, cells = _cells_batch(tables, (runway, oat, altitude, cg))
+    offset = offset + flap_idx * tables["size"]
+    step, t = cells[0]
+    left = _blend_batch(grid, offset, cells[1:])
+    right = _blend_batch(grid[step:], offset, cells[1:])
+    limit = left + (right - left) * t
+
+    # Runway grid point of left; right is the next one
+    i = offset % tables["size"] // tables["strides"][0]
+    n_r = tables["axes"][0][2]
+    offset = offset - i * tables["strides"][0]
+    j = i + (1 if step else 0)
+    in_cell = (left < weight) & (weight <= right)
+    shorter = weight <= left
+    lo = np.where(shorter, 0, np.where(in_cell, j, j + 1))
+    hi = np.where(shorter, i, np.where(in_cell, j, n_r))
+    at = np.where(shorter, left, right)
+    below = np.where(in_cell, left, right)
+    return limit, _search_runway(tables, grid, offset, cells[1:], weight, lo, hi, at, below)
+
+
+def takeoff_performance_batch(settings, weight, cg, runway_length, oat, pressure_altitude, flap=None):
+    # Columns tow_limit, required_runway, in_table and takeoff_ok, computed
+    # CHUNK flights at a time so the temporaries stay in cache
+    import numpy as np
+    tables = performance_for(settings)
+    grid = _arrays(tables)["grid"]
+    weight, cg, runway, oat, altitude = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (weight, cg, runway_length, oat, pressure_altitude)))
+    flap_idx = np.broadcast_to(flap_index_batch(tables, flap), weight.shape)
+    limit = np.empty(weight.shape)
+    required = np.empty(weight.shape)
+    for start in range(0, weight.shape[0], CHUNK):
+        part = slice(start, start + CHUNK)
+        limit[part], required[part] = _performance_chunk(
+            tables, grid, weight[part], cg[part], runway[part], oat[part], altitude[part], flap_idx[part])
+    in_table = _in_table_batch(tables, runway, oat, altitude, cg)
+    return {
+        "tow_limit": limit,
+        "required_runway": required,
+        "in_table": in_table,
+        "takeoff_ok": in_table & (weight <= limit),
+    }
@@ -0,0 +1,141 @@
+import math
+
+# Compiled tail registry.
+#
+# settings["aircraft_data"] is a dict of per-tail dicts. compile_registry
+# validates every tail once and compiles it into a TailRecord (__slots__, for
+# the scalar path) holding the precomputed dry operating moment (OEW x
+# OEW_ARM), the limits and an integer type ID. Tails get an integer index in
+# aircraft_data order; tail_array gives the same data as a NumPy record array
+# so the batch path gathers every per-tail constant with one fancy-index.
+#
+# Per-tail fields:
+#   OEW, OEW_ARM                          required
+#   MTOW_LIMIT, ZFW_LIMIT, LANDING_LIMIT  all three or none; a tail without
+#       them is checked against the fleet settings["MTOW"] only (mock tails)
+#   TYPE                                  optional, DEFAULT_TYPE if absent
+# A missing, non-numeric or partial field raises RegistryError naming the
+# tail and field, instead of falling back silently.
+#
+# Settings are copy-on-write (clp_config.apply_changes copies every dict on
+# the changed path), so a registry is cached by the identity of its
+# aircraft_data dict and compiled once per settings version. Code that edits
+# aircraft_data in place must build a new dict instead.
+
+TAIL_FIELDS = ("OEW", "OEW_ARM")
+LIMIT_FIELDS = ("MTOW_LIMIT", "ZFW_LIMIT", "LANDING_LIMIT")
+DEFAULT_TYPE = "A220-300"
+
+_cache = {}
+
+
+class RegistryError(ValueError):
+    pass
+
+
+class TailRecord:
+    __slots__ = ("index", "tail", "type", "type_id", "oew", "oew_arm", "dow_moment",
+                 "mtow_limit", "zfw_limit", "landing_limit")
+
+    def __init__(self, index, tail, type_name, type_id, oew, oew_arm, mtow_limit, zfw_limit, landing_limit):
+        self.index = index
+        self.tail = tail
+        self.type = type_name
+        self.type_id = type_id
+        self.oew = oew
+        self.oew_arm = oew_arm
+        self.dow_moment = oew * oew_arm
+        self.mtow_limit = mtow_limit
+        # None when the tail has no structural limits of its own
+        self.zfw_limit = zfw_limit
+        self.landing_limit = landing_limit
+
+    def __repr__(self):
+        return f"TailRecord({self.index}, {self.tail!r}, OEW={self.oew}, OEW_ARM={self.oew_arm})"
+
+
+def _number(tail, data, field, errors):
+    value = data.get(field)
+    if value is None:
+        errors.append(f"{tail}: missing {field}")
+    elif isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        errors.append(f"{tail}: {field} must be a finite number, got {value!r}")
+    elif value <= 0 and field != "OEW_ARM":
+        errors.append(f"{tail}: {field} must be positive, got {value!r}")
+    else:
+        return float(value)
+    return None
+
+
+def compile_registry(settings):
+    # Validated TailRecords for every tail; raises RegistryError listing all problems
+    errors = []
+    fleet_mtow = _number("settings", settings, "MTOW", errors)
+    tails = list(settings["aircraft_data"])
+    types = []
+    records = []
+    for index, tail in enumerate(tails):
+        data = settings["aircraft_data"][tail]
+        if not isinstance(data, dict):
+            errors.append(f"{tail}: expected a dict of fields, got {type(data).__name__}")
+            continue
+        oew, oew_arm = (_number(tail, data, field, errors) for field in TAIL_FIELDS)
+        present = [field for field in LIMIT_FIELDS if field in data]
+        if present and len(present) < len(LIMIT_FIELDS):
+            missing = ", ".join(field for field in LIMIT_FIELDS if field not in data)
+            errors.append(f"{tail}: has {', '.join(present)} but is missing {missing}")
+            continue
+        limits = [_number(tail, data, field, errors) for field in present] or [fleet_mtow, None, None]
+        type_name = data.get("TYPE", DEFAULT_TYPE)
+        if type_name not in types:
+            types.append(type_name)
+        records.append(TailRecord(index, tail, type_name, types.index(type_name), oew, oew_arm, *limits))
+    if errors:
+        raise RegistryError("Invalid aircraft data:\n  " + "\n  ".join(errors))
+    return {
+        "tails": tails,
+        "index": {tail: k for k, tail in enumerate(tails)},
+        "types": types,
+        "records": records,
+    }
+
+
+def registry_for(settings):
+    # Compiled registry for these settings, rebuilt only for a new aircraft_data
+    aircraft_data = settings["aircraft_data"]
+    key = (id(aircraft_data), settings["MTOW"])
+    entry = _cache.get(key)
+    # The entry keeps aircraft_data alive, so its id can't be reused meanwhile
+    if entry is None or entry[0] is not aircraft_data:
+        if len(_cache) > 32:
+            _cache.clear()
+        entry = _cache[key] = (aircraft_data, compile_registry(settings))
+    return entry[1]
+
+
+def tail_record(settings, tail):
+    # TailRecord by tail name or integer index
+    registry = registry_for(settings)
+    if isinstance(tail, int):
+        return registry["records"][tail]
+    try:
+        return registry["records"][registry["index"][tail]]
+    except KeyError:
+        raise KeyError(f"Unknown tail {tail!r}") from None
+
+
+def tail_array(registry):
+    # NumPy record array of the registry, one row per tail index; missing
+    # ZFW/landing limits are NaN so comparisons against them never fail
+    array = registry.get("_array")
+    if array is None:
+        import numpy as np
+        dtype = [("oew", "f8"), ("oew_arm", "f8"), ("dow_moment", "f8"), ("mtow_limit", "f8"),
+                 ("zfw_limit", "f8"), ("landing_limit", "f8"), ("type_id", "i4")]
+        nan = float("nan")
+        array = registry["_array"] = np.array(
+            [(r.oew, r.oew_arm, r.dow_moment, r.mtow_limit,
+              nan if r.zfw_limit is None else r.zfw_limit,
+              nan if r.landing_limit is None else r.landing_limit, r.type_id)
+             for r in registry["records"]], dtype=dtype)
+    return array
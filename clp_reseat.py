@@ -0,0 +1,133 @@
+import itertools
+
+import numpy as np
+
+from clp_core import base_load, calculate_wab
+from clp_seats import ADULT, zone_capacity
+from clp_tables import envelope_limits, tables_for
+
+# Passenger reseating recommendations.
+#
+# When moving bags alone can't bring the CG to target_cg (or inside the CG
+# limits), suggest the fewest adult moves between zones that let it. Children
+# and lap infants stay where they are booked.
+#
+# Reseating doesn't change weight, only moment: each adult moved from zone i
+# to zone j adds PAX_WEIGHT_ADULT * (arm_j - arm_i). A plan is the vector of
+# per-zone changes (summing to zero, within each zone's adults and free
+# seats), and its moment shift is one dot product with the per-zone adult
+# moments. Bags then cover any remaining shift between all forward (0) and all
+# aft (bag weight x arm delta). So for each candidate plan:
+#   limits: the shift must leave some bag split with the CG inside the envelope
+#   target: the shift must leave some bag split that puts the CG on target_cg
+# All plans within max_moves are scored at once in NumPy. The ranking is limit
+# violation first, then whether the target is reachable, then fewest moves,
+# then distance from target. The chosen plan is re-run through calculate_wab
+# for the exact whole-bag result.
+
+MAX_MOVES = 20
+TOLERANCE = 1.0  # lb-ft of moment, far below any CG rounding
+
+
+def _plans(adults, free, max_moves):
+    # Every per-zone change vector with at most max_moves adults moved;
+    # rows of shape (plans, zones)
+    ranges = [np.arange(-min(a, max_moves), min(f, max_moves) + 1) for a, f in zip(adults[:-1], free[:-1])]
+    grid = np.array(list(itertools.product(*ranges)), dtype=float).reshape(-1, len(ranges))
+    last = -grid.sum(axis=1)
+    plans = np.column_stack([grid, last])
+    keep = (last >= -adults[-1]) & (last <= free[-1])
+    plans = plans[keep]
+    moves = np.maximum(plans, 0.0).sum(axis=1)
+    keep = moves <= max_moves
+    return plans[keep], moves[keep]
+
+
+def _pairs(delta, zones):
+    # Per-zone changes as (from, to, count) moves, sources and destinations
+    # matched in zone order
+    sources = [[zones[i], -int(d)] for i, d in enumerate(delta) if d < 0]
+    targets = [[zones[i], int(d)] for i, d in enumerate(delta) if d > 0]
+    moves = []
+    while sources and targets:
+        count = min(sources[0][1], targets[0][1])
+        moves.append({"from": sources[0][0], "to": targets[0][0], "count": count})
+        sources[0][1] -= count
+        targets[0][1] -= count
+        if not sources[0][1]:
+            sources.pop(0)
+        if not targets[0][1]:
+            targets.pop(0)
+    return moves
+
+
+def _seat_moves(seat_map, moves, settings):
+    # Concrete seats for zone moves: adults (without lap infants) from the
+    # seats farthest from the destination, into the free seats farthest along
+    occupancy = seat_map.occupancy.copy()
+    zones = np.array(seat_map.zones)
+    arms = seat_map.arms
+    seat_moves = []
+    for move in moves:
+        aft = settings["zone_arms"][move["to"]] > settings["zone_arms"][move["from"]]
+        order = np.argsort(arms if aft else -arms, kind="stable")
+        sources = [i for i in order if zones[i] == move["from"] and occupancy[i] == ADULT]
+        targets = [i for i in order[::-1] if zones[i] == move["to"] and occupancy[i] == 0]
+        for i, j in zip(sources[:move["count"]], targets[:move["count"]]):
+            occupancy[i], occupancy[j] = 0, ADULT
+            seat_moves.append({"from": seat_map.labels[i], "to": seat_map.labels[j]})
+    return seat_moves
+
+
+def recommend_reseating(tail, pax_zones, bags, fuel, settings, max_moves=MAX_MOVES, seat_map=None):
+    # Fewest adult zone moves that let bag loading reach target_cg (or at
+    # least the CG limits). With a SeatMap, pax_zones may be None and seat
+    # moves are suggested too.
+    s = settings
+    if seat_map is not None and pax_zones is None:
+        pax_zones = seat_map.zone_counts()
+    zones = list(s["zone_arms"])
+    adults = np.array([pax_zones.get(z, {}).get("adults", 0) for z in zones], dtype=float)
+    children = np.array([pax_zones.get(z, {}).get("children", 0) for z in zones], dtype=float)
+    free = np.maximum(zone_capacity(s) - adults - children, 0.0)
+    adult_moment = s["PAX_WEIGHT_ADULT"] * np.array([s["zone_arms"][z] for z in zones])
+
+    # Moment with all bags forward, and the shift bags can add on top of it
+    bag_weight = bags["standard"] * s["bag_weights"]["standard"] + bags["heavy"] * s["bag_weights"]["heavy"]
+    weight, moment = base_load(tail, pax_zones, fuel, s)
+    weight += bag_weight
+    moment += bag_weight * s["compartment_arms"]["fwd"]
+    bag_range = bag_weight * (s["compartment_arms"]["aft"] - s["compartment_arms"]["fwd"])
+    cg_fwd, cg_aft = envelope_limits(tables_for(s), weight)
+
+    def gap(shift, lo, hi):
+        # How far the shifts fall outside the window bags can cover to [lo, hi]
+        return np.maximum(np.maximum(0.0, lo - bag_range - shift), shift - hi)
+
+    plans, moves = _plans(adults, free, max_moves)
+    shift = plans @ adult_moment
+    violation = gap(shift, cg_fwd * weight - moment, cg_aft * weight - moment)
+    target = s["target_cg"] * weight - moment
+    target_error = gap(shift, target, target)
+    order = np.lexsort((target_error, moves, target_error > TOLERANCE, np.where(violation > TOLERANCE, violation, 0.0)))
+    best = plans[order[0]]
+
+    recommended = _pairs(best, zones)
+    new_zones = {z: dict(pax_zones.get(z, {})) for z in zones}
+    for z, d in zip(zones, best):
+        new_zones[z]["adults"] = int(adults[zones.index(z)] + d)
+    before = calculate_wab(tail, pax_zones, bags, fuel, s)
+    after = calculate_wab(tail, new_zones, bags, fuel, s) if recommended else before
+    result = {
+        "moves": recommended,
+        "pax_moves": int(moves[order[0]]),
+        "pax_zones": new_zones,
+        "cg_before": before["cg"],
+        "cg": after["cg"],
+        "within_limits": bool(violation[order[0]] <= TOLERANCE),
+        "target_reachable": bool(target_error[order[0]] <= TOLERANCE),
+        "result": after,
+    }
+    if seat_map is not None:
+        result["seat_moves"] = _seat_moves(seat_map, recommended, s)
+    return result
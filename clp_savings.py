@@ -0,0 +1,218 @@
+import numpy as np
+
+from clp_batch import calculate_wab_batch, flights_to_columns, tail_constants
+from clp_fuel import fuel_trajectory_batch, landing_fuel_burn
+from clp_holds import compartment_table
+from clp_seats import zone_capacity
+from clp_tables import envelope_limits_batch, tables_for
+
+# Fuel-savings load optimizer.
+#
+# settings["fuel_cg_model"] maps takeoff CG to a trip fuel factor (1.0 = the
+# fuel plan's trip fuel), either as a table or a polynomial regression:
+#   {"cgs": [...], "trip_fuel_factor": [...]}              piecewise linear
+#   {"reference_cg": 62.0, "coefficients": [c0, c1, ...]}  sum c_k (cg - ref)^k
+# Trip fuel is the fuel burned before landing (see clp_fuel.landing_fuel_burn).
+#
+# The optimizer moves bags between the fwd and aft holds, and optionally
+# reseats adults, to minimize estimated trip fuel. Every limit that depends
+# on the distribution is linear in the moment shift, so for each flight they
+# reduce to one feasible CG interval: the envelope at takeoff and at every
+# fuel trajectory point, and the stab trim table's CG range. The best CG in
+# that interval is found on a candidate grid (interval ends, table
+# breakpoints and evenly spaced points), and the whole bags that land closest
+# to it within the hold weight caps are loaded aft. With reseat=True, if the
+# holds alone can't reach it, adults move between the front and rear zones
+# (the largest moment per move) into free seats. Weights don't change, so MTOW/ZFW/landing checks
+# are unaffected by the choice.
+#
+# Savings are reported against the all-forward loading (fuel_saved) and
+# against the standard target_cg plan from calculate_wab (fuel_saved_vs_plan).
+
+CANDIDATES = 33  # evenly spaced CG candidates per flight, including both ends
+
+
+def trip_fuel_factor(model, cg):
+    # Trip fuel multiplier at these takeoff CGs
+    cg = np.asarray(cg, dtype=float)
+    if "coefficients" in model:
+        x = cg - model["reference_cg"]
+        factor = np.zeros_like(x)
+        for c in reversed(model["coefficients"]):
+            factor = factor * x + c
+        return factor
+    return np.interp(cg, model["cgs"], model["trip_fuel_factor"])
+
+
+def _whole_bags(n_std, n_heavy, ideal, lo, hi, settings):
+    # Whole heavy/standard counts whose aft weight is closest to ideal, ranked
+    # like optimize_bag_load_batch: window violation, distance, bags moved
+    std_w = settings["bag_weights"]["standard"]
+    heavy_w = settings["bag_weights"]["heavy"]
+    n = ideal.shape[0]
+    best_viol = np.full(n, np.inf)
+    best_err = np.full(n, np.inf)
+    best_count = np.full(n, np.inf)
+    best_heavy = np.zeros(n)
+    best_std = np.zeros(n)
+    for heavy_aft in range(int(n_heavy.max()) + 1 if n else 0):
+        valid = heavy_aft <= n_heavy
+        remaining = (ideal - heavy_aft * heavy_w) / std_w
+        floor_std = np.minimum(n_std, np.maximum(0.0, np.floor(remaining)))
+        ceil_std = np.minimum(n_std, floor_std + 1)
+        for std_aft in (floor_std, ceil_std):
+            aft_weight = heavy_aft * heavy_w + std_aft * std_w
+            viol = np.maximum(np.maximum(0.0, lo - aft_weight), aft_weight - hi)
+            err = np.abs(aft_weight - ideal)
+            count = heavy_aft + std_aft
+            better = valid & ((viol < best_viol)
+                              | ((viol == best_viol) & ((err < best_err)
+                                                        | ((err == best_err) & (count < best_count)))))
+            np.copyto(best_viol, viol, where=better)
+            np.copyto(best_err, err, where=better)
+            np.copyto(best_count, count, where=better)
+            np.copyto(best_heavy, heavy_aft, where=better)
+            np.copyto(best_std, std_aft, where=better)
+    return best_heavy, best_std, best_viol
+
+
+def optimize_fuel_batch(settings, tail_idx, adults, children, infants, standard_bags, heavy_bags, fuel,
+                        tails=None, reseat=False, plan=None, min_saving_per_move=5.0):
+    # Fuel-optimal loading for every flight. Columns are those of
+    # calculate_wab_batch; plan is its result for the same columns if
+    # already computed. Reseating must save at least min_saving_per_move
+    # lbs of fuel per passenger moved (unless it's the only safe option).
+    adults = np.asarray(adults, dtype=float)
+    children = np.asarray(children, dtype=float)
+    n_std = np.asarray(standard_bags, dtype=float)
+    n_heavy = np.asarray(heavy_bags, dtype=float)
+    fuel = np.asarray(fuel, dtype=float)
+    if plan is None:
+        plan = calculate_wab_batch(settings, tail_idx, adults, children, infants,
+                                   n_std, n_heavy, fuel, tails=tails)
+    model = settings["fuel_cg_model"]
+    tables = tables_for(settings)
+    arm_delta = settings["compartment_arms"]["aft"] - settings["compartment_arms"]["fwd"]
+
+    # All bags forward: the moment the optimizer shifts from
+    weight = plan["total_weight"]
+    base_moment = plan["initial_cg"] * weight
+
+    # Feasible CG interval from the envelope along the fuel trajectory...
+    points = fuel_trajectory_batch(settings, tail_idx, weight, base_moment, fuel, tails)
+    point_fwd, point_aft = envelope_limits_batch(tables, points["weight"])
+    # ...as a range of moment shift (same shift at every point), then CG at takeoff
+    shift_lo = ((point_fwd - points["cg"]) * points["weight"]).max(axis=1)
+    shift_hi = ((point_aft - points["cg"]) * points["weight"]).min(axis=1)
+    # ...and the envelope at takeoff (the ramp point, checked explicitly)
+    takeoff_fwd, takeoff_aft = envelope_limits_batch(tables, weight)
+    shift_lo = np.maximum(shift_lo, takeoff_fwd * weight - base_moment)
+    shift_hi = np.minimum(shift_hi, takeoff_aft * weight - base_moment)
+    stab = tables["stab"][tables["default_flap"]]
+    shift_lo = np.maximum(shift_lo, stab["cg_range"][0] * weight - base_moment)
+    shift_hi = np.minimum(shift_hi, stab["cg_range"][1] * weight - base_moment)
+    cg_lo = (base_moment + shift_lo) / weight
+    cg_hi = (base_moment + shift_hi) / weight
+    feasible = cg_lo <= cg_hi
+
+    t = np.linspace(0.0, 1.0, CANDIDATES)
+    candidates = cg_lo[:, None] + (cg_hi - cg_lo)[:, None] * t
+    if "cgs" in model:
+        breakpoints = np.clip(np.asarray(model["cgs"], dtype=float), cg_lo[:, None], cg_hi[:, None])
+        candidates = np.concatenate([candidates, breakpoints], axis=1)
+    # Best CG in the interval; among equally good CGs, the one needing the
+    # smallest shift from the all-forward loading
+    factor = trip_fuel_factor(model, candidates)
+    tied = factor <= factor.min(axis=1, keepdims=True) + 1e-12
+    best = np.argmin(np.where(tied, np.abs(candidates - plan["initial_cg"][:, None]), np.inf), axis=1)
+    target_shift = candidates[np.arange(len(weight)), best] * weight - base_moment
+
+    # Hold caps as a window on aft bag weight
+    holds = compartment_table(settings, ["fwd", "aft"])
+    bag_weight = n_std * settings["bag_weights"]["standard"] + n_heavy * settings["bag_weights"]["heavy"]
+    hold_lo = np.maximum(0.0, bag_weight - holds["caps"][0])
+    hold_hi = np.minimum(bag_weight, holds["caps"][1])
+
+    def load(pax_shift):
+        # Whole bags closest to the remaining shift, within holds and CG limits
+        lo = np.maximum(hold_lo, (shift_lo - pax_shift) / arm_delta)
+        hi = np.minimum(hold_hi, (shift_hi - pax_shift) / arm_delta)
+        ideal = np.clip((target_shift - pax_shift) / arm_delta, lo, hi)
+        heavy_aft, std_aft, viol = _whole_bags(n_std, n_heavy, ideal, lo, hi, settings)
+        aft_weight = heavy_aft * settings["bag_weights"]["heavy"] + std_aft * settings["bag_weights"]["standard"]
+        cg = (base_moment + pax_shift + aft_weight * arm_delta) / weight
+        return heavy_aft, std_aft, cg, feasible & (viol <= 1e-6)
+
+    trip_fuel = fuel * landing_fuel_burn(settings)
+    moves = np.zeros(len(weight))
+    heavy_aft, std_aft, cg, ok = load(moves)
+    if reseat:
+        # Adults moved front zone -> rear zone (negative: rear -> front), the
+        # largest moment per move, into free seats; kept where the holds alone
+        # can't make the flight safe or the moves save enough fuel
+        arms = list(settings["zone_arms"].values())
+        per_move = settings["PAX_WEIGHT_ADULT"] * (arms[-1] - arms[0])
+        free = zone_capacity(settings) - adults - children
+        needed = target_shift - np.clip(target_shift / arm_delta, hold_lo, hold_hi) * arm_delta
+        aft_moves = np.minimum(np.ceil(np.maximum(needed, 0.0) / per_move), np.minimum(adults[:, 0], free[:, -1]))
+        fwd_moves = np.minimum(np.ceil(np.maximum(-needed, 0.0) / per_move), np.minimum(adults[:, -1], free[:, 0]))
+        reseated = aft_moves - fwd_moves
+        r_heavy, r_std, r_cg, r_ok = load(reseated * per_move)
+        gain = trip_fuel * (trip_fuel_factor(model, cg) - trip_fuel_factor(model, r_cg))
+        use = (reseated != 0) & r_ok & (~ok | (gain >= min_saving_per_move * np.abs(reseated)))
+        moves = np.where(use, reseated, 0.0)
+        heavy_aft = np.where(use, r_heavy, heavy_aft)
+        std_aft = np.where(use, r_std, std_aft)
+        cg = np.where(use, r_cg, cg)
+        ok = ok | use
+
+    # Flights no distribution can make safe within the hold caps keep the
+    # standard plan and its own safe flag (calculate_wab doesn't check hold
+    # caps, so a plan-safe flight may still be infeasible here); they have no
+    # savings (NaN) and are counted separately by savings_summary
+    feasible = ok
+    cg = np.where(feasible, cg, plan["cg"])
+
+    optimized = np.where(feasible, trip_fuel * trip_fuel_factor(model, cg), np.nan)
+    consts = tail_constants(settings, tails)
+    tail_idx = np.asarray(tail_idx, dtype=np.int64)
+    zfw_limit = consts["zfw_limit"][tail_idx]
+    landing_limit = consts["landing_limit"][tail_idx]
+    weights_ok = ((weight <= consts["mtow_limit"][tail_idx])
+                  & ~(plan["zfw"] > zfw_limit)
+                  & ~(weight - trip_fuel > landing_limit))
+    return {
+        "heavy_aft": np.where(feasible, heavy_aft, plan["heavy_aft"]),
+        "std_aft": np.where(feasible, std_aft, plan["std_aft"]),
+        "reseat_aft": np.where(feasible, moves, 0.0),
+        "cg": cg,
+        "cg_range": np.column_stack([cg_lo, cg_hi]),
+        "trip_fuel": optimized,
+        "fuel_saved": trip_fuel * trip_fuel_factor(model, plan["initial_cg"]) - optimized,
+        "fuel_saved_vs_plan": trip_fuel * trip_fuel_factor(model, plan["cg"]) - optimized,
+        "feasible": feasible,
+        "safe": np.where(feasible, weights_ok, plan["safe"]),
+    }
+
+
+def optimize_fuel(tail, pax_zones, bags, fuel, settings, reseat=False):
+    # Single-flight convenience wrapper; returns plain Python values
+    columns = flights_to_columns([{"tail": tail, "pax_zones": pax_zones, "bags": bags, "fuel": fuel}], settings)
+    result = optimize_fuel_batch(settings, reseat=reseat, **columns)
+    return {key: value[0].tolist() for key, value in result.items()}
+
+
+def savings_summary(result):
+    # Day totals from an optimize_fuel_batch result; savings cover feasible
+    # flights only, and infeasible flights the standard plan calls safe (its
+    # loading exceeds a hold cap) are counted on their own
+    feasible = result["feasible"]
+    return {
+        "flights": int(len(feasible)),
+        "feasible": int(feasible.sum()),
+        "infeasible": int((~feasible).sum()),
+        "infeasible_plan_safe": int((~feasible & result["safe"]).sum()),
+        "fuel_saved": float(result["fuel_saved"][feasible].sum()),
+        "fuel_saved_vs_plan": float(result["fuel_saved_vs_plan"][feasible].sum()),
+        "pax_moves": int(np.abs(result["reseat_aft"]).sum()),
+    }
@@ -0,0 +1,142 @@
+import numpy as np
+
+from clp_core import check_limits, fuel_trajectory, landing_fuel_burn, lookup_stab, optimize_bag_load
+from clp_fuel import loaded_fuel_arm
+from clp_registry import tail_record
+
+# Seat-level passenger moment model.
+#
+# Each seat has its own arm (from settings["seat_layout"]) and an occupancy
+# code. Pax moment is one dot product of per-seat weights and arms, and a
+# single seat change updates the running weight and moment in O(1).
+
+# Occupancy codes stored per seat (int8)
+EMPTY = 0
+ADULT = 1
+CHILD = 2
+ADULT_WITH_INFANT = 3  # adult with a lap infant
+
+PAX_CLASSES = {"empty": EMPTY, "adult": ADULT, "child": CHILD, "adult_infant": ADULT_WITH_INFANT}
+
+
+def seat_arms(settings):
+    # Returns (labels, arms, zones) for every seat, ordered row by row
+    layout = settings["seat_layout"]
+    row_zone = {}
+    for zone, (first, last) in layout["zones"].items():
+        for row in range(first, last + 1):
+            row_zone[row] = zone
+
+    labels, arms, zones = [], [], []
+    for row in range(1, layout["rows"] + 1):
+        arm = layout["first_row_arm"] + (row - 1) * layout["row_pitch"]
+        for letter in layout["seat_letters"]:
+            labels.append(f"{row}{letter}")
+            arms.append(arm)
+            zones.append(row_zone[row])
+    return labels, np.array(arms, dtype=float), zones
+
+
+def zone_capacity(settings):
+    # Seats per zone, in settings["zone_arms"] order
+    layout = settings["seat_layout"]
+    seats = len(layout["seat_letters"])
+    return np.array([(layout["zones"][zone][1] - layout["zones"][zone][0] + 1) * seats
+                     for zone in settings["zone_arms"]], dtype=float)
+
+
+def class_weights(settings):
+    # Weight of each occupancy code, indexable by the occupancy array
+    return np.array([
+        0.0,
+        settings["PAX_WEIGHT_ADULT"],
+        settings["PAX_WEIGHT_CHILD"],
+        settings["PAX_WEIGHT_ADULT"] + settings["PAX_WEIGHT_INFANT"],
+    ])
+
+
+class SeatMap:
+    # Occupancy of one aircraft with running pax weight and moment
+
+    def __init__(self, settings):
+        self.labels, self.arms, self.zones = seat_arms(settings)
+        self.index = {label: i for i, label in enumerate(self.labels)}
+        self.class_weights = class_weights(settings)
+        self.occupancy = np.zeros(len(self.labels), dtype=np.int8)
+        # Plain-float copies keep the per-event path free of NumPy scalars
+        self._arm_list = self.arms.tolist()
+        self._weight_list = self.class_weights.tolist()
+        self.weight = 0.0
+        self.moment = 0.0
+
+    def _seat(self, seat):
+        return self.index[seat] if isinstance(seat, str) else seat
+
+    def assign(self, seat, pax_class):
+        # Set a seat's occupancy; O(1) update of running weight and moment
+        i = self._seat(seat)
+        code = PAX_CLASSES[pax_class] if isinstance(pax_class, str) else pax_class
+        delta = self._weight_list[code] - self._weight_list[self.occupancy[i]]
+        self.occupancy[i] = code
+        self.weight += delta
+        self.moment += delta * self._arm_list[i]
+
+    def vacate(self, seat):
+        self.assign(seat, EMPTY)
+
+    def load(self, occupancy):
+        # Replace the whole map (e.g. a reservation snapshot) and recompute
+        self.occupancy[:] = occupancy
+        return self.recompute()
+
+    def recompute(self):
+        # Full recompute as one dot product; also clears accumulated rounding
+        seat_weights = self.class_weights[self.occupancy]
+        self.weight = float(seat_weights.sum())
+        self.moment = float(np.dot(seat_weights, self.arms))
+        return self.weight, self.moment
+
+    def zone_counts(self):
+        # Equivalent pax_zones input for calculate_wab
+        counts = {zone: {"adults": 0, "children": 0, "infants": 0} for zone in dict.fromkeys(self.zones)}
+        for zone, code in zip(self.zones, self.occupancy.tolist()):
+            if code in (ADULT, ADULT_WITH_INFANT):
+                counts[zone]["adults"] += 1
+            if code == ADULT_WITH_INFANT:
+                counts[zone]["infants"] += 1
+            if code == CHILD:
+                counts[zone]["children"] += 1
+        return counts
+
+
+def seat_map_wab(tail, seat_map, bags, fuel, settings):
+    # W&B using the seat map's pax weight and moment instead of zone arms
+    s = settings
+    record = tail_record(s, tail)
+    oew = record.oew
+    bag_weight = bags["standard"] * s["bag_weights"]["standard"] + bags["heavy"] * s["bag_weights"]["heavy"]
+
+    zfw = oew + seat_map.weight + bag_weight
+    total_weight = zfw + fuel
+    total_moment = (record.dow_moment + fuel * loaded_fuel_arm(s, tail, fuel)
+                    + seat_map.moment + bag_weight * s["compartment_arms"]["fwd"])
+
+    load = optimize_bag_load(bags, total_moment, total_weight, s)
+    cg = load["cg"]
+    landing_weight = total_weight - fuel * landing_fuel_burn(s)
+    moved_moment = total_moment + load["aft_weight"] * (s["compartment_arms"]["aft"] - s["compartment_arms"]["fwd"])
+    trajectory = fuel_trajectory(s, tail, total_weight, moved_moment, fuel)
+    landing_limit = record.landing_limit
+    checks = check_limits(s, tail, zfw, total_weight, landing_weight, cg, trajectory)
+
+    return {
+        "zfw": zfw,
+        "total_weight": total_weight,
+        "cg": cg,
+        "initial_cg": total_moment / total_weight,
+        "stab": lookup_stab(s, cg, total_weight),
+        "heavy_aft": load["heavy_aft"],
+        "std_aft": load["std_aft"],
+        "landing_weight": landing_weight if landing_limit else None,
+        "safe": checks["safe"],
+    }
@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import collections
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from clp_batch import calculate_wab_batch, flights_to_columns
+from clp_config import fleet_config
+from clp_fuel import fuel_capacity
+from clp_metrics import metrics
+
+# W&B as a JSON/HTTP service (asyncio, standard library only).
+#
+#   POST /wab        {"tail", "pax_zones", "bags", "fuel"}   -> one result
+#   POST /wab/bulk   {"flights": [...]}                      -> {"results": [...]}
+#   GET  /stats      latency percentiles, batch sizes, rejections
+#   GET  /metrics    Prometheus text format (see clp_metrics)
+#   GET  /health
+#
+# Requests arriving within window_ms of each other are micro-batched: the
+# batcher collects them (up to max_batch flights) and evaluates the whole
+# batch with one calculate_wab_batch call on a worker thread, so the event
+# loop keeps accepting requests while a batch computes and the next batch
+# fills up meanwhile. Each batch uses the current fleet config snapshot.
+#
+# Backpressure: once max_pending flights are queued or computing, new
+# requests get 503 with Retry-After instead of growing the queue. A single
+# request with more than max_pending flights could never be accepted, so it
+# gets 413 instead.
+#
+#   python clp_service.py --port 8633 --window-ms 2 --max-batch 1024
+
+PAX_CLASSES = ("adults", "children", "infants")
+MAX_BODY = 16 * 2 ** 20
+MAX_BAGS = 2000  # per bag type; far beyond any hold's volume
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+class TooLarge(Exception):
+    pass
+
+
+def _count(value, what, maximum):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0 or value != int(value):
+        raise ValueError(f"{what} must be a non-negative whole number")
+    if value > maximum:
+        raise ValueError(f"{what} must be at most {maximum}")
+    return int(value)
+
+
+def parse_flight(data, settings):
+    # Validated flight dict in the shape flights_to_columns expects; counts
+    # and fuel beyond what the aircraft can physically hold are rejected
+    if not isinstance(data, dict):
+        raise ValueError("flight must be a JSON object")
+    tail = data.get("tail")
+    if tail not in settings["aircraft_data"]:
+        raise ValueError(f"Unknown tail {tail!r}")
+    pax_zones = {}
+    if not isinstance(data.get("pax_zones") or {}, dict):
+        raise ValueError("pax_zones must be a JSON object")
+    for zone, counts in (data.get("pax_zones") or {}).items():
+        if zone not in settings["zone_arms"]:
+            raise ValueError(f"Unknown zone {zone!r}")
+        if not isinstance(counts, dict):
+            raise ValueError(f"pax_zones.{zone} must be a JSON object")
+        first_row, last_row = settings["seat_layout"]["zones"][zone]
+        seats = (last_row - first_row + 1) * len(settings["seat_layout"]["seat_letters"])
+        pax_zones[zone] = {c: _count(counts.get(c, 0), f"{zone}.{c}", seats) for c in PAX_CLASSES}
+        if pax_zones[zone]["adults"] + pax_zones[zone]["children"] > seats:
+            raise ValueError(f"Zone {zone} has only {seats} seats")
+    bags = data.get("bags") or {}
+    if not isinstance(bags, dict):
+        raise ValueError("bags must be a JSON object")
+    fuel = data.get("fuel")
+    if isinstance(fuel, bool) or not isinstance(fuel, (int, float)) or not fuel >= 0 or math.isinf(fuel):
+        raise ValueError("fuel must be a non-negative number")
+    capacity = fuel_capacity(settings, tail)
+    if fuel > capacity:
+        raise ValueError(f"fuel exceeds the {capacity:,.0f} lbs tank capacity of {tail}")
+    return {
+        "tail": tail,
+        "pax_zones": pax_zones,
+        "bags": {"standard": _count(bags.get("standard", 0), "bags.standard", MAX_BAGS),
+                 "heavy": _count(bags.get("heavy", 0), "bags.heavy", MAX_BAGS)},
+        "fuel": float(fuel),
+    }
+
+
+def evaluate_flights(flights, snapshot):
+    # One vectorized W&B pass over validated flights -> list of result dicts
+    settings = snapshot.settings
+    tails = list(settings["aircraft_data"])
+    with metrics.stage("service.columns"):
+        columns = flights_to_columns(flights, settings, tails)
+    with metrics.stage("service.calculate_wab_batch"):
+        result = calculate_wab_batch(settings, tails=tails, **columns)
+    metrics.count("service.flights", len(flights))
+    cols = {key: result[key].tolist() for key in
+            ("zfw", "total_weight", "landing_weight", "initial_cg", "cg", "stab", "safe", "heavy_aft", "std_aft")}
+    out = []
+    for i, flight in enumerate(flights):
+        heavy_aft, std_aft = int(cols["heavy_aft"][i]), int(cols["std_aft"][i])
+        landing_weight = cols["landing_weight"][i]
+        out.append({
+            "tail": flight["tail"],
+            "zfw": cols["zfw"][i],
+            "total_weight": cols["total_weight"][i],
+            "landing_weight": None if math.isnan(landing_weight) else landing_weight,
+            "initial_cg": cols["initial_cg"][i],
+            "cg": cols["cg"][i],
+            "stab": cols["stab"][i],
+            "safe": cols["safe"][i],
+            "bag_allocation": {
+                "fwd": {"standard": flight["bags"]["standard"] - std_aft, "heavy": flight["bags"]["heavy"] - heavy_aft},
+                "aft": {"standard": std_aft, "heavy": heavy_aft},
+            },
+            "settings_version": snapshot.version,
+        })
+    return out
+
+
+class MicroBatcher:
+    # Collects flight groups from concurrent requests and evaluates them
+    # together; each submit() resolves to the results for its own flights
+
+    def __init__(self, window_ms=2.0, max_batch=1024, max_pending=20000):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batch_sizes = collections.deque(maxlen=1000)
+        self._queue = collections.deque()
+        self._wakeup = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="wab-batch")
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        return asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, flights):
+        if len(flights) > self.max_pending:
+            raise TooLarge(f"{len(flights)} flights in one request; at most {self.max_pending}")
+        if self.pending + len(flights) > self.max_pending:
+            raise Overloaded(f"{self.pending} flights pending")
+        future = asyncio.get_running_loop().create_future()
+        self.pending += len(flights)
+        self._queue.append((flights, future))
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            self.pending -= len(flights)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if self.window:
+                # Let concurrent requests join this batch
+                await asyncio.sleep(self.window)
+            while self._queue:
+                groups, flights = [], []
+                while self._queue and (not flights or len(flights) + len(self._queue[0][0]) <= self.max_batch):
+                    group, future = self._queue.popleft()
+                    groups.append((group, future))
+                    flights.extend(group)
+                self.batch_sizes.append(len(flights))
+                snapshot = fleet_config.current()
+                try:
+                    results = await loop.run_in_executor(self._executor, evaluate_flights, flights, snapshot)
+                except Exception:
+                    # Re-evaluate each request on its own so only the one
+                    # that broke the batch fails
+                    for group, future in groups:
+                        try:
+                            result = await loop.run_in_executor(self._executor, evaluate_flights, group, snapshot)
+                        except Exception as error:
+                            if not future.done():
+                                future.set_exception(error)
+                        else:
+                            if not future.done():
+                                future.set_result(result)
+                    continue
+                start = 0
+                for group, future in groups:
+                    if not future.done():
+                        future.set_result(results[start:start + len(group)])
+                    start += len(group)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+class WabService:
+
+    def __init__(self, window_ms=2.0, max_batch=1024, max_pending=20000, p99_target_ms=25.0):
+        self.batcher = MicroBatcher(window_ms, max_batch, max_pending)
+        self.p99_target_ms = p99_target_ms
+        self.latency_ms = {"/wab": collections.deque(maxlen=10000), "/wab/bulk": collections.deque(maxlen=10000)}
+        self.requests = collections.Counter()
+        self.rejected = 0
+
+    async def handle_request(self, method, path, body):
+        # (status, payload) for one request
+        if path == "/health":
+            return 200, {"status": "ok", "pending": self.batcher.pending}
+        if path == "/stats":
+            return 200, self.stats()
+        if path == "/metrics":
+            return 200, metrics.prometheus()
+        if path not in self.latency_ms:
+            return 404, {"error": f"No route {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        start = time.perf_counter()
+        settings = fleet_config.current().settings
+        try:
+            data = json.loads(body or b"null")
+            if path == "/wab":
+                flights = [parse_flight(data, settings)]
+            else:
+                if not isinstance(data, dict) or not isinstance(data.get("flights"), list):
+                    raise ValueError('bulk body must be {"flights": [...]}')
+                flights = [parse_flight(flight, settings) for flight in data["flights"]]
+        except ValueError as error:
+            return 400, {"error": str(error)}
+        except RecursionError:
+            return 400, {"error": "JSON body nested too deeply"}
+
+        try:
+            results = await self.batcher.submit(flights) if flights else []
+        except TooLarge as error:
+            return 413, {"error": str(error)}
+        except Overloaded as error:
+            self.rejected += 1
+            return 503, {"error": f"Overloaded: {error}"}
+        except Exception as error:
+            metrics.count("service.errors")
+            return 500, {"error": f"{type(error).__name__}: {error}"}
+        self.requests[path] += 1
+        elapsed = (time.perf_counter() - start) * 1000
+        self.latency_ms[path].append(elapsed)
+        if metrics.enabled:
+            metrics.observe("service" + path.replace("/", "."), elapsed)
+        return 200, results[0] if path == "/wab" else {"results": results}
+
+    def stats(self):
+        out = {"requests": dict(self.requests), "rejected": self.rejected, "pending": self.batcher.pending,
+               "p99_target_ms": self.p99_target_ms}
+        for path, samples in self.latency_ms.items():
+            values = sorted(samples)
+            p99 = _percentile(values, 99)
+            out[path] = {"p50_ms": _percentile(values, 50), "p99_ms": p99,
+                         "p99_ok": None if p99 is None else p99 <= self.p99_target_ms}
+        sizes = list(self.batcher.batch_sizes)
+        out["batches"] = {"recent": len(sizes), "mean_flights": sum(sizes) / len(sizes) if sizes else None,
+                          "max_flights": max(sizes) if sizes else None}
+        return out
+
+    async def handle_connection(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, payload = 413, {"error": f"Body larger than {MAX_BODY} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.handle_request(method, path.split("?", 1)[0], body)
+                    except Exception as error:
+                        # Whatever went wrong, the request still gets a response
+                        metrics.count("service.errors")
+                        status, payload = 500, {"error": f"{type(error).__name__}: {error}"}
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                if isinstance(payload, str):
+                    data, content_type = payload.encode(), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(payload).encode(), "application/json"
+                extra = "Retry-After: 1\r\n" if status == 503 else ""
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                              f"Content-Length: {len(data)}\r\n{extra}"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8633, ready=None):
+        batch_task = self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="W&B JSON/HTTP service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8633)
+    parser.add_argument("--window-ms", type=float, default=2.0, help="micro-batch collection window")
+    parser.add_argument("--max-batch", type=int, default=1024, help="flights per vectorized batch")
+    parser.add_argument("--max-pending", type=int, default=20000, help="queued flights before returning 503")
+    parser.add_argument("--p99-target-ms", type=float, default=25.0, help="p99 latency target reported by /stats")
+    args = parser.parse_args(argv)
+
+    service = WabService(args.window_ms, args.max_batch, args.max_pending, args.p99_target_ms)
+    print(f"W&B service on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
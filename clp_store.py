@@ -0,0 +1,242 @@
+import datetime
+import os
+import time
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from clp_core import settings_version
+
+# Columnar store for planned and final W&B results.
+#
+# Results are appended to a Parquet dataset partitioned by month, with rows
+# in each file sorted by tail and date:
+#
+#   <root>/month=2026-10/part-<id>.parquet
+#
+# A year of flights is ~70k rows, so per-day/per-tail directories would hold
+# only a handful of rows per file and file overhead would dominate reads.
+# Month directories prune date ranges before any file is opened; tail, date
+# and other filters are then evaluated inside the Parquet scan. Each file is
+# a single row group: at these sizes per-row-group overhead costs more than
+# statistics-based skipping saves.
+#
+# append_batch takes the arrays returned by calculate_wab_batch and wraps the
+# float columns as Arrow arrays without copying; append/flush buffer single
+# results (calculate_wab output or a FlightLoad load sheet) and write them in
+# one batch. Every append writes a new file; compact() merges a month's files
+# into one.
+
+KINDS = ("planned", "actual")
+
+SCHEMA = pa.schema([
+    ("date", pa.string()),
+    ("tail", pa.string()),
+    ("flight", pa.string()),
+    ("kind", pa.string()),
+    ("settings_version", pa.string()),
+    ("recorded_at", pa.timestamp("ms")),
+    ("zfw", pa.float64()),
+    ("total_weight", pa.float64()),
+    ("landing_weight", pa.float64()),  # NaN when the tail has no landing limit
+    ("initial_cg", pa.float64()),
+    ("cg", pa.float64()),
+    ("stab", pa.float64()),
+    ("bag_move", pa.float64()),
+    ("fwd", pa.float64()),  # bag weight per hold
+    ("aft", pa.float64()),
+    ("heavy_aft", pa.int32()),
+    ("std_aft", pa.int32()),
+    ("safe", pa.bool_()),
+])
+
+# Engine result arrays stored as-is (float64, so Arrow wraps them without copying)
+FLOAT_COLUMNS = ("zfw", "total_weight", "landing_weight", "initial_cg", "cg", "stab", "bag_move", "fwd", "aft")
+
+SORT_KEYS = [("tail", "ascending"), ("date", "ascending")]
+
+
+def _date_key(date):
+    if date is None:
+        return None
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.strftime("%Y-%m-%d")
+    return str(date)
+
+
+class ResultStore:
+
+    def __init__(self, root, buffer_size=500):
+        self.root = root
+        self.buffer_size = buffer_size
+        self._buffer = []
+        os.makedirs(root, exist_ok=True)
+
+    # Writing
+
+    def append_batch(self, result, tails, tail_idx, date, settings, kind="planned", flights=None):
+        # Append calculate_wab_batch output. tails/tail_idx are the batch's
+        # tail list and per-flight index; date is one date for the whole batch
+        # or a per-flight sequence; flights is an optional per-flight label.
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        n = len(result["cg"])
+        if n == 0:
+            return 0
+        tail_idx = np.asarray(tail_idx, dtype=np.int64)
+        dates = (pa.array([_date_key(d) for d in date], pa.string()) if not isinstance(date, (str, datetime.date))
+                 else pa.array(np.full(n, _date_key(date), dtype=object), pa.string()))
+
+        columns = {
+            "date": dates,
+            "tail": pa.array(np.asarray(tails, dtype=object)[tail_idx], pa.string()),
+            "flight": pa.array(list(flights) if flights is not None else [None] * n, pa.string()),
+            "kind": pa.array(np.full(n, kind, dtype=object), pa.string()),
+            "settings_version": pa.array(np.full(n, settings_version(settings), dtype=object), pa.string()),
+            "recorded_at": pa.array(np.full(n, int(time.time() * 1000), dtype=np.int64), pa.timestamp("ms")),
+        }
+        for name in FLOAT_COLUMNS:
+            columns[name] = pa.array(np.ascontiguousarray(result[name], dtype=np.float64))
+        columns["heavy_aft"] = pa.array(np.asarray(result["heavy_aft"]).astype(np.int32))
+        columns["std_aft"] = pa.array(np.asarray(result["std_aft"]).astype(np.int32))
+        columns["safe"] = pa.array(np.asarray(result["safe"], dtype=bool))
+
+        self._write(pa.table(columns, schema=SCHEMA))
+        return n
+
+    def append(self, tail, result, date, settings, kind="planned", flight=None):
+        # Buffer one calculate_wab result or FlightLoad.load_sheet(); written
+        # on flush() or once buffer_size results are waiting
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        if "distrib" in result:
+            steps = result["steps"]
+            fwd, aft = result["distrib"]["fwd"], result["distrib"]["aft"]
+            initial_cg, bag_move = steps["initial_cg"], steps["bag_move"]
+            heavy_aft, std_aft = steps["heavy_aft"], steps["std_aft"]
+        else:
+            # Load sheet: hold contents are bag counts
+            bag_weights = settings["bag_weights"]
+            holds = result["holds"]
+            fwd = sum(holds["fwd"][b] * bag_weights[b] for b in bag_weights)
+            aft = sum(holds["aft"][b] * bag_weights[b] for b in bag_weights)
+            initial_cg, bag_move = np.nan, aft
+            heavy_aft, std_aft = holds["aft"]["heavy"], holds["aft"]["standard"]
+
+        landing_weight = result["landing_weight"]
+        self._buffer.append({
+            "date": _date_key(date),
+            "tail": tail,
+            "flight": flight,
+            "kind": kind,
+            "settings_version": settings_version(settings),
+            "recorded_at": datetime.datetime.now(),
+            "zfw": result["zfw"],
+            "total_weight": result["total_weight"],
+            "landing_weight": np.nan if landing_weight is None else landing_weight,
+            "initial_cg": initial_cg,
+            "cg": result["cg"],
+            "stab": result["stab"],
+            "bag_move": bag_move,
+            "fwd": fwd,
+            "aft": aft,
+            "heavy_aft": heavy_aft,
+            "std_aft": std_aft,
+            "safe": bool(result["safe"]),
+        })
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return 0
+        rows, self._buffer = self._buffer, []
+        self._write(pa.Table.from_pylist(rows, schema=SCHEMA))
+        return len(rows)
+
+    def _write(self, table):
+        months = pc.utf8_slice_codeunits(table["date"], 0, 7)
+        for month in pc.unique(months).to_pylist():
+            part = table.filter(pc.equal(months, month))
+            self._write_file(part, os.path.join(self.root, f"month={month}", f"part-{uuid.uuid4().hex}.parquet"))
+
+    def _write_file(self, table, path):
+        # Written under a temporary name and renamed so readers never see a
+        # partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table.sort_by(SORT_KEYS), path + ".tmp", row_group_size=max(1, len(table)))
+        os.replace(path + ".tmp", path)
+
+    def compact(self, month=None):
+        # Merge each month's part files into one; returns the months rewritten.
+        # Run between query bursts: a reader listing files mid-compaction may
+        # see the merged file alongside the parts it replaces.
+        merged = []
+        for month_dir, files in self._months(month, month):
+            if len(files) < 2:
+                continue
+            table = pq.ParquetDataset(files, schema=SCHEMA).read()
+            self._write_file(table, os.path.join(self.root, month_dir, f"part-{uuid.uuid4().hex}.parquet"))
+            for path in files:
+                os.remove(path)
+            merged.append(month_dir[len("month="):])
+        return merged
+
+    # Reading
+
+    def _months(self, start, end):
+        # (month directory, parquet files) for months overlapping start..end,
+        # found from the directory names alone
+        start = start[:7] if start else None
+        end = end[:7] if end else None
+        months = []
+        for entry in sorted(os.scandir(self.root), key=lambda e: e.name):
+            if not (entry.is_dir() and entry.name.startswith("month=")):
+                continue
+            month = entry.name[len("month="):]
+            if (start is not None and month < start) or (end is not None and month > end):
+                continue
+            files = sorted(os.path.join(entry.path, name) for name in os.listdir(entry.path)
+                           if name.endswith(".parquet"))
+            months.append((entry.name, files))
+        return months
+
+    def read(self, date=None, start=None, end=None, tails=None, kind=None, columns=None, filter=None):
+        # Results as an Arrow table. date selects one day, start/end an
+        # inclusive range; tails is a list of registrations; filter is an
+        # optional extra pyarrow.compute expression on the row columns.
+        if date is not None:
+            start = end = date
+        if isinstance(tails, str):
+            tails = [tails]
+        start, end = _date_key(start), _date_key(end)
+        files = [path for _, paths in self._months(start, end) for path in paths]
+        if not files:
+            empty = SCHEMA.empty_table()
+            return empty.select(columns) if columns else empty
+
+        # Remaining filters are evaluated inside the Parquet scan
+        conditions = []
+        if start is not None:
+            conditions.append(pc.field("date") >= start)
+        if end is not None:
+            conditions.append(pc.field("date") <= end)
+        if tails is not None:
+            conditions.append(pc.field("tail").isin(list(tails)))
+        if kind is not None:
+            conditions.append(pc.field("kind") == kind)
+        if filter is not None:
+            conditions.append(filter)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        dataset = ds.dataset(files, schema=SCHEMA, format="parquet")
+        return dataset.to_table(columns=columns, filter=expression)
+
+    def read_frame(self, **kwargs):
+        return self.read(**kwargs).to_pandas()
@@ -0,0 +1,194 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from clp_batch import calculate_wab_batch, synthetic_columns
+from clp_config import apply_changes, load_settings_file, parse_overrides
+from clp_core import default_settings
+from clp_fuel import tank_moments_batch
+from clp_tables import envelope_limits_batch, tables_for
+
+# What-if parameter sweeps.
+#
+# A sweep evaluates one flight or a whole day over the Cartesian product of
+# value grids for some settings, e.g. 100 adult weights x 100 target CGs x 200
+# flights = 2M evaluations, and reports for every grid point and flight
+# whether it is safe and its CG margin: the distance from the takeoff CG to
+# the nearer envelope limit (negative when outside).
+#
+# The grid is flattened together with the flights into one long column set,
+# and each swept setting becomes a per-evaluation array in an otherwise
+# unchanged settings dict. calculate_wab_batch accepts array values for the
+# settings in SWEEPABLE, so the whole product goes through the batch engine
+# (bag optimizer, stab, fuel trajectory, limits) in chunks of whole grid
+# points, about CHUNK evaluations each, with identical results to running it
+# once per grid point. Every chunk holds the same flights, so their columns
+# are tiled once, and unless fuel is swept the tank moments along each
+# flight's fuel trajectory are computed once per flight rather than per
+# evaluation.
+#
+#   python clp_sweep.py flights.csv --axis PAX_WEIGHT_ADULT=180:240:100 \
+#       --axis target_cg=61.5:63:100 -o sweep.png
+
+SWEEPABLE = (
+    "PAX_WEIGHT_ADULT", "PAX_WEIGHT_CHILD", "PAX_WEIGHT_INFANT",
+    "bag_weights.standard", "bag_weights.heavy",
+    "compartment_arms.fwd", "compartment_arms.aft",
+    "target_cg",
+    "fuel",        # fuel load (lbs) for every flight
+    "fuel_scale",  # multiplier on each flight's planned fuel
+)
+CHUNK = 1 << 13  # evaluations per batch call; small enough for the working arrays to stay in cache
+
+
+def parse_axis(spec):
+    # "KEY=start:stop:count" (evenly spaced, both ends included) or
+    # "KEY=v1,v2,..." -> (key, values)
+    key, _, values = spec.partition("=")
+    if key not in SWEEPABLE:
+        raise ValueError(f"Can't sweep {key!r}; choose from {', '.join(SWEEPABLE)}")
+    if ":" in values:
+        start, stop, count = values.split(":")
+        return key, np.linspace(float(start), float(stop), int(count))
+    return key, np.array([float(v) for v in values.split(",")])
+
+
+def sweep(settings, columns, axes, tails=None):
+    # axes: {key: values} in grid order. Returns the axes plus arrays of shape
+    # (*grid, flights): safe, cg, cg_margin, total_weight
+    for key in axes:
+        if key not in SWEEPABLE:
+            raise ValueError(f"Can't sweep {key!r}; choose from {', '.join(SWEEPABLE)}")
+    keys = list(axes)
+    values = [np.asarray(axes[key], dtype=float) for key in keys]
+    grid_shape = tuple(len(v) for v in values)
+    n = len(columns["fuel"])
+    points = int(np.prod(grid_shape))
+    total = points * n
+    tables = tables_for(settings)
+
+    out = {name: np.empty(total, dtype=bool if name == "safe" else float)
+           for name in ("safe", "cg", "cg_margin", "total_weight")}
+    # Grid coordinates of every grid point, flattened grid-major
+    flat_grid = [g.ravel() for g in np.meshgrid(*values, indexing="ij")]
+
+    # Flight columns for a full chunk of grid points, sliced for the last one
+    per_chunk = max(1, CHUNK // n)
+    flights = {name: np.asarray(col) for name, col in columns.items()}
+    if "fuel" not in axes and "fuel_scale" not in axes:
+        flights["tank_moments"] = tank_moments_batch(settings, flights["tail_idx"], flights["fuel"], tails)
+    tiled = {name: np.tile(col, (per_chunk,) + (1,) * (col.ndim - 1)) for name, col in flights.items()}
+
+    for first in range(0, points, per_chunk):
+        last = min(first + per_chunk, points)
+        start, stop = first * n, last * n
+        chunk = {name: col[:stop - start] for name, col in tiled.items()}
+        changes = {}
+        for key, grid in zip(keys, flat_grid):
+            grid = np.repeat(grid[first:last], n)
+            if key == "fuel":
+                chunk["fuel"] = grid
+            elif key == "fuel_scale":
+                chunk["fuel"] = chunk["fuel"] * grid
+            else:
+                changes[key] = grid
+        result = calculate_wab_batch(apply_changes(settings, changes), tails=tails, **chunk)
+        fwd, aft = envelope_limits_batch(tables, result["total_weight"])
+        out["safe"][start:stop] = result["safe"]
+        out["cg"][start:stop] = result["cg"]
+        out["cg_margin"][start:stop] = np.minimum(result["cg"] - fwd, aft - result["cg"])
+        out["total_weight"][start:stop] = result["total_weight"]
+
+    shaped = {name: array.reshape(grid_shape + (n,)) for name, array in out.items()}
+    return {"axes": dict(zip(keys, values)), **shaped}
+
+
+def sweep_summary(result):
+    # Per grid point over the flights: fraction safe and the smallest CG margin
+    return {"safe_fraction": result["safe"].mean(axis=-1),
+            "min_cg_margin": result["cg_margin"].min(axis=-1)}
+
+
+def draw_sweep_heatmaps(result, x=None, y=None):
+    # Figure with safe-fraction and minimum-CG-margin heatmaps over two swept
+    # keys (default: the first two); any other axes are reduced (worst case)
+    import matplotlib.pyplot as plt
+
+    keys = list(result["axes"])
+    if len(keys) < 2:
+        raise ValueError("Heatmaps need at least two swept keys")
+    x = x or keys[1]
+    y = y or keys[0]
+    summary = sweep_summary(result)
+    others = tuple(i for i, key in enumerate(keys) if key not in (x, y))
+    safe = summary["safe_fraction"].min(axis=others) if others else summary["safe_fraction"]
+    margin = summary["min_cg_margin"].min(axis=others) if others else summary["min_cg_margin"]
+    if keys.index(y) > keys.index(x):
+        safe, margin = safe.T, margin.T
+    xs, ys = result["axes"][x], result["axes"][y]
+    extent = (xs[0], xs[-1], ys[0], ys[-1])
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4.5))
+    image = axes[0].imshow(safe, origin="lower", aspect="auto", extent=extent, cmap="RdYlGn", vmin=0.0, vmax=1.0)
+    fig.colorbar(image, ax=axes[0], label="Fraction of flights safe")
+    axes[0].set_title("Safe / Unsafe")
+    limit = max(abs(float(margin.min())), abs(float(margin.max())), 1e-6)
+    image = axes[1].imshow(margin, origin="lower", aspect="auto", extent=extent, cmap="RdBu", vmin=-limit, vmax=limit)
+    fig.colorbar(image, ax=axes[1], label="Smallest CG margin (ft)")
+    axes[1].contour(xs, ys, margin, levels=[0.0], colors="black", linewidths=1.0)
+    axes[1].set_title("CG Margin (worst flight)")
+    for ax in axes:
+        ax.set_xlabel(x)
+        ax.set_ylabel(y)
+    fig.tight_layout()
+    return fig
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="What-if parameter sweep with heatmaps")
+    parser.add_argument("flights", nargs="?", help="input flights (.csv, .parquet, .jsonl) as for clp_cli.py")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="sweep N synthetic flights instead of a file")
+    parser.add_argument("--axis", action="append", required=True, metavar="KEY=start:stop:count",
+                        help="swept setting and its values (repeatable), e.g. target_cg=61.5:63:100")
+    parser.add_argument("-o", "--output", help="heatmap image (.png) for the first two axes")
+    parser.add_argument("--npz", help="save the full result arrays to this .npz file")
+    parser.add_argument("--settings", help="JSON settings (or shared config store file) to merge over the defaults")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="KEY=VALUE",
+                        help="override a setting before sweeping (repeatable)")
+    args = parser.parse_args(argv)
+
+    settings = default_settings()
+    if args.settings:
+        settings.update(load_settings_file(args.settings))
+    settings = apply_changes(settings, parse_overrides(args.overrides))
+    axes = dict(parse_axis(spec) for spec in args.axis)
+
+    if args.flights:
+        from clp_cli import frame_to_columns, read_flights
+        columns = frame_to_columns(read_flights(args.flights), settings, list(settings["aircraft_data"]))
+    else:
+        columns = synthetic_columns(args.synthetic or 200, settings)
+
+    start = time.perf_counter()
+    result = sweep(settings, columns, axes)
+    elapsed = time.perf_counter() - start
+    evaluations = result["safe"].size
+    summary = sweep_summary(result)
+    print(f"{evaluations:,} evaluations in {elapsed:.2f} s; "
+          f"{summary['safe_fraction'].mean():.1%} safe overall, "
+          f"{int((summary['safe_fraction'] == 1.0).sum())} of {summary['safe_fraction'].size} grid points "
+          f"safe for every flight", file=sys.stderr)
+
+    if args.npz:
+        np.savez_compressed(args.npz, **{f"axis_{k}": v for k, v in result["axes"].items()},
+                            **{k: v for k, v in result.items() if k != "axes"})
+    if args.output:
+        fig = draw_sweep_heatmaps(result)
+        fig.savefig(args.output, dpi=100)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import bisect
+import math
+
+# Precompiled stab trim and CG envelope lookup tables.
+#
+# Source tables are piecewise-linear:
+#   settings["cg_envelope"] = {"weights": [...], "forward": [...], "aft": [...]}
+#       forward/aft CG limit (ft) at each weight (lbs), weights ascending
+#   settings["stab_curves"] = {"default_flap": "1",
+#                              "flaps": {"1": {"cgs": [...], "weights": [...],
+#                                              "trim": [[...per cg...] per weight]}}}
+# When either is missing the flat CG_MIN/CG_MAX limits and the 1-D stab_table
+# are used instead, so existing settings keep working.
+#
+# compile_tables resamples them onto regular grids so each lookup is O(1)
+# index arithmetic plus a linear/bilinear blend. The scalar functions use only
+# the standard library (so clp_core stays NumPy-free); the *_batch functions
+# apply the same formulas to NumPy arrays and give identical results.
+
+CG_STEP = 0.05  # ft between stab grid points
+WEIGHT_STEP = 100.0  # lbs between grid points
+
+_cache = {}
+
+
+def _interp(x, xs, ys):
+    # Piecewise-linear interpolation, clamped at both ends
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    k = bisect.bisect_right(xs, x) - 1
+    t = (x - xs[k]) / (xs[k + 1] - xs[k])
+    return ys[k] + (ys[k + 1] - ys[k]) * t
+
+
+def _axis(values, step):
+    # Regular axis covering the source breakpoints: (start, step, count)
+    lo, hi = values[0], values[-1]
+    if hi <= lo:
+        return lo, step, 1
+    count = int(math.ceil((hi - lo) / step)) + 1
+    return lo, (hi - lo) / (count - 1), count
+
+
+def _source_tables(settings):
+    envelope = settings.get("cg_envelope") or {
+        "weights": [0.0], "forward": [settings["CG_MIN"]], "aft": [settings["CG_MAX"]]}
+    curves = settings.get("stab_curves")
+    if not curves:
+        cgs = sorted(settings["stab_table"])
+        curves = {"default_flap": "default",
+                  "flaps": {"default": {"cgs": [float(c) for c in cgs], "weights": [0.0],
+                                        "trim": [[float(settings["stab_table"][c]) for c in cgs]]}}}
+    return envelope, curves
+
+
+def compile_tables(settings):
+    envelope, curves = _source_tables(settings)
+
+    w0, w_step, n_w = _axis(envelope["weights"], WEIGHT_STEP)
+    grid_w = [w0 + k * w_step for k in range(n_w)]
+    compiled_envelope = {
+        "w0": w0, "w_step": w_step, "n_w": n_w,
+        "forward": [_interp(w, envelope["weights"], envelope["forward"]) for w in grid_w],
+        "aft": [_interp(w, envelope["weights"], envelope["aft"]) for w in grid_w],
+    }
+
+    compiled_stab = {}
+    for flap, curve in curves["flaps"].items():
+        cg0, cg_step, n_cg = _axis(curve["cgs"], CG_STEP)
+        sw0, sw_step, n_sw = _axis(curve["weights"], WEIGHT_STEP)
+        grid_cg = [cg0 + k * cg_step for k in range(n_cg)]
+        # Resample each source row along CG, then each grid column along weight
+        rows = [[_interp(cg, curve["cgs"], row) for cg in grid_cg] for row in curve["trim"]]
+        grid = []
+        for k in range(n_sw):
+            w = sw0 + k * sw_step
+            grid.append([_interp(w, curve["weights"], [row[i] for row in rows]) for i in range(n_cg)])
+        compiled_stab[flap] = {
+            "cg0": cg0, "cg_step": cg_step, "n_cg": n_cg,
+            "w0": sw0, "w_step": sw_step, "n_w": n_sw,
+            "cg_range": (curve["cgs"][0], curve["cgs"][-1]),
+            "grid": grid,
+        }
+
+    return {"envelope": compiled_envelope, "stab": compiled_stab,
+            "default_flap": curves.get("default_flap", next(iter(compiled_stab)))}
+
+
+def tables_for(settings):
+    # Compiled tables for these settings, rebuilt only when a source table changes
+    key = repr((settings["stab_table"], settings.get("stab_curves"), settings.get("cg_envelope"),
+                settings["CG_MIN"], settings["CG_MAX"]))
+    tables = _cache.get(key)
+    if tables is None:
+        if len(_cache) > 32:
+            _cache.clear()
+        tables = _cache[key] = compile_tables(settings)
+    return tables
+
+
+def _cell(x, x0, step, n):
+    # Grid cell index and blend fraction for x, clamped to the grid
+    if n == 1:
+        return 0, 0.0
+    f = (x - x0) / step
+    if f < 0.0:
+        f = 0.0
+    elif f > n - 1:
+        f = float(n - 1)
+    i = int(f)
+    if i > n - 2:
+        i = n - 2
+    return i, f - i
+
+
+def envelope_limits(tables, weight):
+    # Forward and aft CG limits at this weight
+    env = tables["envelope"]
+    i, t = _cell(weight, env["w0"], env["w_step"], env["n_w"])
+    if env["n_w"] == 1:
+        return env["forward"][0], env["aft"][0]
+    fwd = env["forward"][i] + (env["forward"][i + 1] - env["forward"][i]) * t
+    aft = env["aft"][i] + (env["aft"][i + 1] - env["aft"][i]) * t
+    return fwd, aft
+
+
+def in_envelope(tables, cg, weight):
+    fwd, aft = envelope_limits(tables, weight)
+    return fwd <= cg <= aft
+
+
+def stab_trim(tables, cg, weight, flap=None):
+    # Returns (trim, in_table); outside the table the edge value is used and
+    # in_table is False instead of silently returning 0
+    table = tables["stab"][flap or tables["default_flap"]]
+    grid = table["grid"]
+    i, tx = _cell(cg, table["cg0"], table["cg_step"], table["n_cg"])
+    j, ty = _cell(weight, table["w0"], table["w_step"], table["n_w"])
+    if table["n_cg"] == 1:
+        row = [r[0] for r in grid]
+    else:
+        row = [r[i] + (r[i + 1] - r[i]) * tx for r in grid[j:j + 2]]
+    trim = row[0] if table["n_w"] == 1 else row[0] + (row[1] - row[0]) * ty
+    lo, hi = table["cg_range"]
+    return trim, lo <= cg <= hi
+
+
+# Vectorized lookups
+
+
+def _arrays(tables):
+    # NumPy copies of the compiled grids, built once per compiled table set
+    arrays = tables.get("_arrays")
+    if arrays is None:
+        import numpy as np
+        arrays = {
+            "forward": np.array(tables["envelope"]["forward"]),
+            "aft": np.array(tables["envelope"]["aft"]),
+            "stab": {flap: np.array(t["grid"]) for flap, t in tables["stab"].items()},
+        }
+        tables["_arrays"] = arrays
+    return arrays
+
+
+def _cell_batch(x, x0, step, n):
+    import numpy as np
+    if n == 1:
+        return np.zeros(x.shape, dtype=np.int64), np.zeros(x.shape)
+    f = np.clip((x - x0) / step, 0.0, float(n - 1))
+    i = np.minimum(f.astype(np.int64), n - 2)
+    return i, f - i
+
+
+def envelope_limits_batch(tables, weight):
+    import numpy as np
+    env = tables["envelope"]
+    arrays = _arrays(tables)
+    weight = np.asarray(weight, dtype=float)
+    if env["n_w"] == 1:
+        return np.full(weight.shape, env["forward"][0]), np.full(weight.shape, env["aft"][0])
+    i, t = _cell_batch(weight, env["w0"], env["w_step"], env["n_w"])
+    fwd = arrays["forward"][i] + (arrays["forward"][i + 1] - arrays["forward"][i]) * t
+    aft = arrays["aft"][i] + (arrays["aft"][i + 1] - arrays["aft"][i]) * t
+    return fwd, aft
+
+
+def in_envelope_batch(tables, cg, weight):
+    fwd, aft = envelope_limits_batch(tables, weight)
+    return (fwd <= cg) & (cg <= aft)
+
+
+def stab_trim_batch(tables, cg, weight, flap=None):
+    import numpy as np
+    table = tables["stab"][flap or tables["default_flap"]]
+    grid = _arrays(tables)["stab"][flap or tables["default_flap"]]
+    cg = np.asarray(cg, dtype=float)
+    weight = np.broadcast_to(np.asarray(weight, dtype=float), cg.shape)
+    i, tx = _cell_batch(cg, table["cg0"], table["cg_step"], table["n_cg"])
+    j, ty = _cell_batch(weight, table["w0"], table["w_step"], table["n_w"])
+
+    def row(jj):
+        if table["n_cg"] == 1:
+            return grid[jj, 0]
+        return grid[jj, i] + (grid[jj, i + 1] - grid[jj, i]) * tx
+
+    trim = row(j) if table["n_w"] == 1 else row(j) + (row(j + 1) - row(j)) * ty
+    lo, hi = table["cg_range"]
+    return trim, (lo <= cg) & (cg <= hi)
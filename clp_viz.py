@@ -0,0 +1,370 @@
+import io
+import threading
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+# Aircraft diagram rendering for the Streamlit app
+#
+# The diagram has a static layer (airframe, datum, arm lines and labels, CG
+# limit band) that depends only on the view, the arm positions and the CG
+# limits, and a dynamic overlay (the current CG). render_aircraft_png draws
+# the static layer once per (view, arm set, limits), keeps its pixels, and
+# per request only restores them and draws the current CG on top. Figures
+# are created with matplotlib.figure.Figure rather than pyplot, so nothing is
+# registered in pyplot's global figure manager and long-lived servers don't
+# accumulate figures.
+
+TOP_WING_SPAN = 45  # top-view wing half-span, also used to place labels and the CG band
+MAX_BACKGROUNDS = 32
+
+_backgrounds = {}
+_render_lock = threading.Lock()
+
+
+def draw_aircraft_visualization(zone_arms, compartment_arms, fuel_arm, oew_arm, view='side', cg=None, cg_min=None, cg_max=None):
+    # Full diagram as a standalone Figure (not tracked by pyplot)
+    fig = Figure(figsize=(12, 5))
+    ax = fig.add_subplot()
+    arm_scale_factor = _draw_airframe(fig, ax, zone_arms, compartment_arms, fuel_arm, oew_arm, view)
+    _draw_cg_overlay(ax, view, arm_scale_factor, cg, cg_min, cg_max)
+    return fig
+
+
+def _draw_airframe(fig, ax, zone_arms, compartment_arms, fuel_arm, oew_arm, view):
+    # Static layer; returns the scale applied to arm positions
+    # Set the datum point (at the nose)
+    datum_x = 0
+    
+    # Define a more stylized aircraft shape
+    if view == 'side':
+        # Simplified but recognizable side profile
+        fuselage_length = 100  # Use a standardized length for better visibility
+        
+        # Define points for a more stylized aircraft
+        nose_x = datum_x
+        nose_y = 0
+        
+        fuselage_bottom = [
+            (nose_x, nose_y),
+            (nose_x + 10, nose_y - 2),
+            (nose_x + 20, nose_y - 3),
+            (nose_x + fuselage_length - 20, nose_y - 3),
+            (nose_x + fuselage_length - 10, nose_y - 1),
+            (nose_x + fuselage_length, nose_y)
+        ]
+        
+        fuselage_top = [
+            (nose_x, nose_y),
+            (nose_x + 10, nose_y + 5),
+            (nose_x + 20, nose_y + 8),
+            (nose_x + fuselage_length - 50, nose_y + 8),
+            (nose_x + fuselage_length - 40, nose_y + 12),  # Tail height
+            (nose_x + fuselage_length - 25, nose_y + 12),  # Tail top
+            (nose_x + fuselage_length - 10, nose_y + 3),
+            (nose_x + fuselage_length, nose_y)
+        ]
+        
+        # Draw the fuselage as a polygon
+        fuselage_x_bottom, fuselage_y_bottom = zip(*fuselage_bottom)
+        fuselage_x_top, fuselage_y_top = zip(*fuselage_top)
+        
+        # Complete the fuselage polygon
+        fuselage_x = list(fuselage_x_top) + list(fuselage_x_bottom[::-1])
+        fuselage_y = list(fuselage_y_top) + list(fuselage_y_bottom[::-1])
+        
+        # Draw the main fuselage
+        ax.fill(fuselage_x, fuselage_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Draw the wing
+        wing_front = nose_x + 35
+        wing_length = 25
+        wing_height = -2
+        wing_thickness = 2
+        
+        wing_x = [wing_front, wing_front + wing_length, wing_front + wing_length, wing_front]
+        wing_y = [wing_height, wing_height - 1, wing_height + wing_thickness, wing_height + wing_thickness]
+        ax.fill(wing_x, wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Set axis limits for side view
+        ax.set_ylim(-10, 20)
+        
+    else:  # top view
+        # Simplified but recognizable top view
+        fuselage_length = 100  # Use a standardized length
+        
+        # Define key points
+        nose_x = datum_x
+        center_y = 0
+        
+        # Create fuselage shape - smoother curves for the top view
+        fuselage_width = 8
+        
+        # Create a stylized top view with curved fuselage and wings
+        fuselage_outline = []
+        
+        # Top half
+        fuselage_outline.append((nose_x, center_y))  # Nose tip
+        fuselage_outline.append((nose_x + 10, center_y + 2))  # Nose curve
+        fuselage_outline.append((nose_x + 20, center_y + 3.5))  # Forward fuselage
+        fuselage_outline.append((nose_x + 40, center_y + fuselage_width/2))  # Mid fuselage
+        fuselage_outline.append((nose_x + fuselage_length - 30, center_y + fuselage_width/2))  # Aft fuselage
+        fuselage_outline.append((nose_x + fuselage_length - 20, center_y + 3))  # Tail taper
+        fuselage_outline.append((nose_x + fuselage_length - 10, center_y + 1.5))  # Tail taper
+        fuselage_outline.append((nose_x + fuselage_length, center_y))  # Tail tip
+        
+        # Bottom half (mirror of top)
+        fuselage_outline.append((nose_x + fuselage_length - 10, center_y - 1.5))
+        fuselage_outline.append((nose_x + fuselage_length - 20, center_y - 3))
+        fuselage_outline.append((nose_x + fuselage_length - 30, center_y - fuselage_width/2))
+        fuselage_outline.append((nose_x + 40, center_y - fuselage_width/2))
+        fuselage_outline.append((nose_x + 20, center_y - 3.5))
+        fuselage_outline.append((nose_x + 10, center_y - 2))
+        fuselage_outline.append((nose_x, center_y))  # Back to nose tip
+        
+        fuselage_x, fuselage_y = zip(*fuselage_outline)
+        ax.fill(fuselage_x, fuselage_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Draw the wings
+        wing_root_x = nose_x + 40
+        wing_span = TOP_WING_SPAN
+        wing_chord_root = 15
+        wing_chord_tip = 10
+        wing_sweep = 15  # Wing sweep angle for a more realistic shape
+        
+        # Left wing
+        left_wing = [
+            (wing_root_x, center_y - fuselage_width/2),
+            (wing_root_x + wing_sweep, center_y - wing_span),
+            (wing_root_x + wing_sweep + wing_chord_tip, center_y - wing_span),
+            (wing_root_x + wing_chord_root, center_y - fuselage_width/2)
+        ]
+        left_wing_x, left_wing_y = zip(*left_wing)
+        ax.fill(left_wing_x, left_wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Right wing
+        right_wing = [
+            (wing_root_x, center_y + fuselage_width/2),
+            (wing_root_x + wing_sweep, center_y + wing_span),
+            (wing_root_x + wing_sweep + wing_chord_tip, center_y + wing_span),
+            (wing_root_x + wing_chord_root, center_y + fuselage_width/2)
+        ]
+        right_wing_x, right_wing_y = zip(*right_wing)
+        ax.fill(right_wing_x, right_wing_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Horizontal stabilizer
+        h_stab_root_x = nose_x + fuselage_length - 25
+        h_stab_span = 20
+        h_stab_chord_root = 8
+        h_stab_chord_tip = 5
+        h_stab_sweep = 10
+        
+        # Left horizontal stabilizer
+        left_h_stab = [
+            (h_stab_root_x, center_y - fuselage_width/4),
+            (h_stab_root_x + h_stab_sweep, center_y - h_stab_span),
+            (h_stab_root_x + h_stab_sweep + h_stab_chord_tip, center_y - h_stab_span),
+            (h_stab_root_x + h_stab_chord_root, center_y - fuselage_width/4)
+        ]
+        left_h_stab_x, left_h_stab_y = zip(*left_h_stab)
+        ax.fill(left_h_stab_x, left_h_stab_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Right horizontal stabilizer
+        right_h_stab = [
+            (h_stab_root_x, center_y + fuselage_width/4),
+            (h_stab_root_x + h_stab_sweep, center_y + h_stab_span),
+            (h_stab_root_x + h_stab_sweep + h_stab_chord_tip, center_y + h_stab_span),
+            (h_stab_root_x + h_stab_chord_root, center_y + fuselage_width/4)
+        ]
+        right_h_stab_x, right_h_stab_y = zip(*right_h_stab)
+        ax.fill(right_h_stab_x, right_h_stab_y, color='lightgray', alpha=0.7, edgecolor='black', linewidth=1.5)
+        
+        # Set axis limits for top view - wider to show the wings
+        ax.set_ylim(-wing_span - 5, wing_span + 5)
+    
+    # Mark datum point
+    datum_y = 0 if view == 'top' else 0
+    ax.plot(datum_x, datum_y, 'ro', markersize=8, label='Datum Point')
+    ax.text(datum_x, datum_y - 3, 'Datum', ha='center', va='top', fontweight='bold')
+    
+    # Set the x-axis range - use a standardized length with some padding
+    ax.set_xlim(-10, fuselage_length + 10)
+    
+    # Create reference scale for measurement
+    scale_positions = range(0, int(fuselage_length) + 20, 20)
+    ax.set_xticks(scale_positions)
+    ax.grid(True, linestyle='--', alpha=0.3)
+    
+    # Mark and label arm positions
+    arms = {
+        'OEW': oew_arm,
+        'Fuel': fuel_arm,
+        'Zone A': zone_arms['A'],
+        'Zone B': zone_arms['B'],
+        'Zone C': zone_arms['C'],
+        'Fwd Cargo': compartment_arms['fwd'],
+        'Aft Cargo': compartment_arms['aft']
+    }
+    
+    # Colors for different zones - use a more distinct color palette
+    colors = ['red', 'blue', 'green', 'purple', 'orange', 'brown', 'magenta']
+    
+    # Calculate adjusted arm positions - map actual arms to our standardized fuselage length
+    # This keeps all the important points visible while making the diagram more readable
+    max_real_arm = max(arms.values())
+    if max_real_arm > 0:
+        arm_scale_factor = (fuselage_length * 0.9) / max_real_arm
+    else:
+        arm_scale_factor = 1
+    
+    # Plot each arm position with scaled positions to fit our diagram
+    for (label, arm), color in zip(arms.items(), colors):
+        # Scale the arm position
+        scaled_arm = arm * arm_scale_factor
+        
+        # Draw vertical reference line
+        ax.axvline(x=scaled_arm, color=color, linestyle='--', alpha=0.6)
+        
+        # Plot point on aircraft
+        y_pos = 0 if view == 'top' else 2
+        ax.plot(scaled_arm, y_pos, 'o', color=color, markersize=8)
+        
+        # Add label - position differently for side vs top view
+        if view == 'side':
+            # On side view, stagger the labels to prevent overlap
+            vertical_offset = 12 + (list(arms.keys()).index(label) % 3) * 2
+            ax.text(scaled_arm, vertical_offset, label, ha='center', va='bottom', color=color, 
+                    fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.2'))
+            ax.text(scaled_arm, vertical_offset - 1.5, f"({arm} ft)", ha='center', va='top', color=color, 
+                    fontsize=8, bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.1'))
+        else:
+            # On top view, alternate labels above and below
+            if list(arms.keys()).index(label) % 2 == 0:
+                vertical_offset = wing_span * 0.6
+                va_align = 'bottom'
+            else:
+                vertical_offset = -wing_span * 0.6
+                va_align = 'top'
+            
+            ax.text(scaled_arm, vertical_offset, f"{label}\n({arm} ft)", ha='center', va=va_align, color=color, 
+                    fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
+    
+    # Add a note about scaled representation
+    note_text = "Note: Arm positions are shown to scale relative to each other, but aircraft dimensions are stylized for clarity."
+    fig.text(0.5, 0.01, note_text, ha='center', fontsize=8, style='italic')
+    
+    # Add title and labels
+    view_title = 'Top' if view == 'top' else 'Side'
+    ax.set_title(f'A220-300 {view_title} View with Weight & Balance Points', pad=20, fontsize=14, fontweight='bold')
+    ax.set_xlabel('Distance from Datum (ft)', fontsize=12)
+    
+    if view == 'top':
+        ax.set_ylabel('Width (ft)', fontsize=12)
+    else:
+        ax.set_ylabel('Height (ft)', fontsize=12)
+    
+    # Remove the legend as we're now adding labels directly to the diagram
+    # This makes the visualization cleaner and more readable
+    
+    return arm_scale_factor
+
+
+
+def _draw_cg_limits(ax, view, arm_scale_factor, cg_min, cg_max):
+    # CG limit lines, labels and safe band
+    # Scale CG limits to match our diagram
+    scaled_cg_min = cg_min * arm_scale_factor
+    scaled_cg_max = cg_max * arm_scale_factor
+    
+    # Draw CG limit lines
+    ax.axvline(x=scaled_cg_min, color='red', linestyle=':', linewidth=2.5)
+    ax.axvline(x=scaled_cg_max, color='red', linestyle=':', linewidth=2.5)
+    
+    # Add labels for CG limits
+    limit_y = -5
+    ax.text(scaled_cg_min, limit_y, f"Min CG\n{cg_min} ft", ha='center', va='top', color='red', 
+            fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
+    ax.text(scaled_cg_max, limit_y, f"Max CG\n{cg_max} ft", ha='center', va='top', color='red', 
+            fontweight='bold', bbox=dict(facecolor='white', alpha=0.7, boxstyle='round,pad=0.3'))
+    
+    # Fill the safe CG range
+    y_bottom = -TOP_WING_SPAN if view == 'top' else -7
+    y_top = TOP_WING_SPAN if view == 'top' else 15
+    ax.fill_between([scaled_cg_min, scaled_cg_max], [y_bottom, y_bottom], [y_top, y_top], 
+                    color='green', alpha=0.1)
+
+
+def _draw_current_cg(ax, view, animated=False):
+    # Current CG line, marker and label, placed later by _place_current_cg.
+    # Animated artists are skipped by canvas.draw(), so they stay out of the
+    # cached static layer.
+    line = ax.axvline(x=0, color='blue', linewidth=2.5, animated=animated)
+    marker, = ax.plot([0], [0], 'o', color='blue', markersize=10, animated=animated)
+    label = ax.text(0, 0, "", ha='center', va='center', color='blue', fontweight='bold', animated=animated,
+                    bbox=dict(facecolor='white', alpha=0.8, boxstyle='round,pad=0.3'))
+    return line, marker, label
+
+
+def _place_current_cg(artists, view, arm_scale_factor, cg):
+    line, marker, label = artists
+    # Scale the CG position
+    scaled_cg = cg * arm_scale_factor
+    line.set_xdata([scaled_cg, scaled_cg])
+    
+    # Marker at the CG point, label above it
+    cg_y_pos = 0 if view == 'top' else 5
+    marker.set_data([scaled_cg], [cg_y_pos])
+    cg_label_y = 10 if view == 'top' else 8
+    label.set_position((scaled_cg, cg_label_y))
+    label.set_text(f"Current CG\n{cg:.2f} ft")
+
+
+def _draw_cg_overlay(ax, view, arm_scale_factor, cg=None, cg_min=None, cg_max=None):
+    # Add CG limits and current CG if provided
+    if cg_min is not None and cg_max is not None:
+        _draw_cg_limits(ax, view, arm_scale_factor, cg_min, cg_max)
+    if cg is not None:
+        _place_current_cg(_draw_current_cg(ax, view), view, arm_scale_factor, cg)
+
+
+def _background(zone_arms, compartment_arms, fuel_arm, oew_arm, view, cg_min, cg_max, dpi):
+    # Static layer (airframe, arms and CG limits) drawn once per key: the
+    # canvas, its saved pixels, the arm scale and the current-CG artists
+    key = (view, dpi, oew_arm, fuel_arm, tuple(zone_arms.items()), tuple(compartment_arms.items()), cg_min, cg_max)
+    background = _backgrounds.get(key)
+    if background is None:
+        if len(_backgrounds) >= MAX_BACKGROUNDS:
+            _backgrounds.clear()
+        fig = Figure(figsize=(12, 5), dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        arm_scale_factor = _draw_airframe(fig, ax, zone_arms, compartment_arms, fuel_arm, oew_arm, view)
+        if cg_min is not None and cg_max is not None:
+            _draw_cg_limits(ax, view, arm_scale_factor, cg_min, cg_max)
+        current_cg = _draw_current_cg(ax, view, animated=True)
+        canvas.draw()
+        background = _backgrounds[key] = {
+            "canvas": canvas, "ax": ax, "pixels": canvas.copy_from_bbox(fig.bbox),
+            "scale": arm_scale_factor, "current_cg": current_cg,
+        }
+    return background
+
+
+def render_aircraft_png(zone_arms, compartment_arms, fuel_arm, oew_arm, view='side', cg=None, cg_min=None, cg_max=None, dpi=100):
+    # Same diagram as draw_aircraft_visualization, as PNG bytes: restores the
+    # cached static layer and draws only the current CG on top of it
+    with _render_lock:
+        background = _background(zone_arms, compartment_arms, fuel_arm, oew_arm, view, cg_min, cg_max, dpi)
+        canvas, ax = background["canvas"], background["ax"]
+        canvas.restore_region(background["pixels"])
+        if cg is not None:
+            _place_current_cg(background["current_cg"], view, background["scale"], cg)
+            for artist in background["current_cg"]:
+                ax.draw_artist(artist)
+        # Copy the pixels so PNG encoding can run outside the lock
+        image = Image.fromarray(np.asarray(canvas.buffer_rgba()).copy())
+    buffer = io.BytesIO()
+    image.save(buffer, format="png", compress_level=1)
+    return buffer.getvalue()
@@ -0,0 +1,65 @@
+import random
+
+from clp_config import apply_changes
+from clp_core import calculate_wab, default_settings
+from clp_lmc import LMCWindow
+
+# Every change the LMC window accepts must be one calculate_wab accepts too.
+# Flights carry no bags, so calculate_wab has no bags to re-optimize and sees
+# exactly the load the window was built for.
+
+ZONES = ("A", "B", "C")
+PAX_CLASSES = ("adults", "children", "infants")
+
+
+def _settings(oew_arm):
+    s = default_settings()
+    return apply_changes(s, {f"aircraft_data.{tail}.OEW_ARM": oew_arm for tail in s["aircraft_data"]})
+
+
+def _accepted_changes(seed, flights=150, tries=40):
+    # (settings, tail, pax_zones, fuel, changed pax_zones) for every change
+    # a window accepted, over random flights and changes
+    rng = random.Random(seed)
+    out = []
+    for _ in range(flights):
+        s = _settings(rng.uniform(59.5, 61.0))
+        tail = rng.choice(list(s["aircraft_data"]))
+        fuel = float(rng.randrange(8000, 30000, 500))
+        pax = {zone: {"adults": rng.randint(10, 40), "children": rng.randint(0, 4), "infants": rng.randint(0, 2)}
+               for zone in ZONES}
+        window = LMCWindow(tail, pax, {}, fuel, s)
+        for _ in range(tries):
+            changes = {f"{zone}.{pax_class}": rng.randint(-6, 12)
+                       for zone in rng.sample(ZONES, 2) for pax_class in rng.sample(PAX_CLASSES, 1)}
+            if not window.check(changes):
+                continue
+            changed = {zone: dict(counts) for zone, counts in pax.items()}
+            for item, count in changes.items():
+                zone, pax_class = item.split(".")
+                changed[zone][pax_class] += count
+            out.append((s, tail, pax, fuel, changed))
+    return out
+
+
+def test_window_accepts_only_changes_calculate_wab_accepts():
+    accepted = _accepted_changes(seed=1)
+    assert len(accepted) > 200  # the fuzz reaches the window's edges, not just its inside
+    bags = {"standard": 0, "heavy": 0}
+    for s, tail, pax, fuel, changed in accepted:
+        result = calculate_wab(tail, changed, bags, fuel, s)
+        assert result["safe"], (tail, pax, fuel, changed, result["cg"])
+
+
+def test_window_rejects_takeoff_cg_outside_limits():
+    # A valid sheet whose change puts the takeoff CG aft of the envelope
+    s = _settings(60.0)
+    tail = next(iter(s["aircraft_data"]))
+    fuel = 20000.0
+    window = LMCWindow(tail, {"A": {"adults": 40}, "B": {"adults": 30}, "C": {"adults": 30}}, {}, fuel, s)
+    changed = {"A": {"adults": 40}, "B": {"adults": 30}, "C": {"adults": 39}}
+    result = calculate_wab(tail, changed, {"standard": 0, "heavy": 0}, fuel, s)
+    assert window.valid
+    assert not result["safe"]
+    assert not window.check({"C.adults": 9})
+    assert "cg_aft.takeoff" in window.violations({"C.adults": 9})
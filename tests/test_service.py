@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from clp_core import default_settings
+from clp_service import WabService
+
+
+def _flight(tail):
+    return {"tail": tail, "pax_zones": {"A": {"adults": 20}}, "bags": {"standard": 10, "heavy": 2}, "fuel": 15000}
+
+
+def _handle(service, path, body):
+    async def run():
+        task = service.batcher.start()
+        try:
+            return await service.handle_request("POST", path, body)
+        finally:
+            task.cancel()
+    return asyncio.run(run())
+
+
+def test_bulk_request_larger_than_queue_is_rejected_for_good():
+    service = WabService(window_ms=0.0, max_pending=10)
+    tail = next(iter(default_settings()["aircraft_data"]))
+    body = json.dumps({"flights": [_flight(tail)] * 11}).encode()
+    status, payload = _handle(service, "/wab/bulk", body)
+    assert status == 413, payload
+    assert service.rejected == 0
+
+    status, payload = _handle(service, "/wab/bulk", json.dumps({"flights": [_flight(tail)] * 10}).encode())
+    assert status == 200 and len(payload["results"]) == 10
+
+
+def test_deeply_nested_body_is_a_bad_request():
+    service = WabService(window_ms=0.0)
+    body = b"[" * 200000 + b"]" * 200000
+    status, payload = _handle(service, "/wab", body)
+    assert status == 400, payload
+
+
+def _http(service, request):
+    # Raw response to one request over a real connection
+    async def run():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+    return asyncio.run(run())
+
+
+def test_every_request_gets_a_response():
+    service = WabService(window_ms=0.0)
+
+    async def broken(method, path, body):
+        raise RuntimeError("boom")
+
+    service.handle_request = broken
+    response = _http(service, b"POST /wab HTTP/1.1\r\nContent-Length: 2\r\nConnection: close\r\n\r\n{}")
+    assert response.startswith(b"HTTP/1.1 500 "), response
+    assert b"boom" in response
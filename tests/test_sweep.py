@@ -0,0 +1,30 @@
+import numpy as np
+
+from clp_batch import calculate_wab_batch, synthetic_columns
+from clp_config import apply_changes
+from clp_core import default_settings
+from clp_sweep import sweep
+
+# A sweep must give the same results as one batch run per grid point.
+
+
+def _forward_fleet():
+    # OEW arm far enough forward that most flights need bags moved aft
+    s = default_settings()
+    return apply_changes(s, {f"aircraft_data.{tail}.OEW_ARM": 59.0 for tail in s["aircraft_data"]})
+
+
+def test_bag_weight_sweep_matches_batch_per_grid_point():
+    s = _forward_fleet()
+    columns = synthetic_columns(300, s, seed=4)
+    assert (calculate_wab_batch(s, **columns)["bag_move"] > 0).mean() > 0.5
+
+    axes = {"bag_weights.heavy": np.array([60.0, 70.0, 85.0]), "bag_weights.standard": np.array([40.0, 50.0])}
+    result = sweep(s, columns, axes)
+    for i, heavy in enumerate(axes["bag_weights.heavy"]):
+        for j, standard in enumerate(axes["bag_weights.standard"]):
+            changed = apply_changes(s, {"bag_weights.heavy": heavy, "bag_weights.standard": standard})
+            expected = calculate_wab_batch(changed, **columns)
+            np.testing.assert_array_equal(result["cg"][i, j], expected["cg"])
+            np.testing.assert_array_equal(result["safe"][i, j], expected["safe"])
+            np.testing.assert_array_equal(result["total_weight"][i, j], expected["total_weight"])